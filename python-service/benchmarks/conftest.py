@@ -0,0 +1,204 @@
+"""Per-stage micro-benchmarks with stored baselines and regression budgets
+
+Each benchmark times one pipeline stage on the bundled fixtures over at
+least MIN_ROUNDS rounds of MIN_ROUND_MS and MIN_SECONDS in total, and
+reports the median round against the stored baseline. With --gate (or
+BENCH_GATE=1) a stage fails when its median exceeds
+
+    baseline median x budget + SPREAD_FACTOR x baseline spread
+
+where the spread is the interquartile range of the rounds measured with
+the baseline, so a stage that is noisy on this machine gets a wider
+allowance than a steady one. The budget comes from --budget, BENCH_BUDGET
+or a per-stage "budget" in baselines.json. Without --gate the suite only
+reports: regressions are flagged in the summary, and only the correctness
+checks next to the timings can fail.
+
+Usage (from python-service/):
+    python -m pytest                       # Report against baselines.json
+    python -m pytest --gate                # Fail stages over their allowance
+    python -m pytest --update-baselines    # Record this machine's timings
+    python -m pytest --gate --budget=1.2 -k ocr
+
+Baselines are machine-specific: record them on the machine (or CI runner
+class) the checks run on.
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('SAVE_SNAPSHOTS', 'false')  # Benchmarks that save use a tmp_path store
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+BASELINES_FILE = Path(__file__).parent / 'baselines.json'
+
+MIN_ROUNDS = 20
+MIN_SECONDS = 1.0
+MIN_ROUND_MS = 5.0  # Fast stages are looped so a round averages out scheduler noise
+SPREAD_FACTOR = 3.0
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--update-baselines', action='store_true',
+                    help='Write the measured medians to baselines.json instead of checking them')
+    group.addoption('--gate', action='store_true', default=os.getenv('BENCH_GATE', '') in ('1', 'true'),
+                    help='Fail stages whose median exceeds their allowance (default: report only)')
+    group.addoption('--budget', type=float, default=float(os.getenv('BENCH_BUDGET', '1.5')),
+                    help='Allowed slowdown factor over the baseline (default 1.5)')
+
+
+def load_baselines():
+    if not BASELINES_FILE.exists():
+        return {'machine': None, 'benchmarks': {}}
+    with open(BASELINES_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Bench:
+    """Times a callable and checks its median round against the stored baseline"""
+
+    def __init__(self, config):
+        self.update = config.getoption('--update-baselines')
+        self.gate = config.getoption('--gate')
+        self.budget = config.getoption('--budget')
+        self.baselines = load_baselines()
+        self.results = {}
+
+    def __call__(self, name, func, *args):
+        # Warm-up (lazy imports, allocator, OpenCV thread pool) doubles as calibration
+        number = 1
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(number):
+                func(*args)
+            if (time.perf_counter() - t0) * 1000.0 >= MIN_ROUND_MS or number >= 1_000_000:
+                break
+            number *= 10
+
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < MIN_ROUNDS or time.perf_counter() - started < MIN_SECONDS:
+            t0 = time.perf_counter()
+            for _ in range(number):
+                func(*args)
+            timings.append((time.perf_counter() - t0) * 1000.0 / number)
+        median = statistics.median(timings)
+        quartiles = statistics.quantiles(timings, n=4)
+
+        baseline = self.baselines['benchmarks'].get(name)
+        result = self.results[name] = {'median_ms': round(median, 4),
+                                       'spread_ms': round(quartiles[2] - quartiles[0], 4),
+                                       'calls': len(timings) * number, 'baseline': baseline, 'limit_ms': None}
+        if self.update or baseline is None or 'median_ms' not in baseline:
+            return median
+
+        budget = baseline.get('budget', self.budget)
+        limit = result['limit_ms'] = baseline['median_ms'] * budget + SPREAD_FACTOR * baseline.get('spread_ms', 0.0)
+        if self.gate:
+            assert median <= limit, (f"{name} regressed: median {median:.3f} ms > {limit:.3f} ms "
+                                     f"(baseline {baseline['median_ms']:.3f} ms x {budget:g} "
+                                     f"+ {SPREAD_FACTOR:g} x {baseline.get('spread_ms', 0.0):.3f} ms spread)")
+        return median
+
+    def save(self):
+        benchmarks = self.baselines['benchmarks']
+        for name, result in self.results.items():
+            entry = benchmarks.setdefault(name, {})
+            entry.pop('best_ms', None)
+            entry['median_ms'] = result['median_ms']
+            entry['spread_ms'] = result['spread_ms']
+        self.baselines['machine'] = {
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(BASELINES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def pytest_configure(config):
+    config._bench = Bench(config)
+
+
+def pytest_sessionfinish(session):
+    bench = session.config._bench
+    if bench.update and bench.results:
+        bench.save()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    bench = config._bench
+    if not bench.results:
+        return
+    terminalreporter.section('benchmarks')
+    over = 0
+    for name, result in sorted(bench.results.items()):
+        baseline = result['baseline']
+        if not baseline or 'median_ms' not in baseline:
+            compared = 'no baseline'
+        else:
+            compared = f"{result['median_ms'] / baseline['median_ms']:.2f}x baseline"
+            if result['limit_ms'] is not None and result['median_ms'] > result['limit_ms']:
+                compared += f"  OVER {result['limit_ms']:.3f} ms"
+                over += 1
+        terminalreporter.write_line(f"{name:<36} {result['median_ms']:>10.3f} ms  "
+                                    f"(spread {result['spread_ms']:.3f})  {compared}")
+    if over and not bench.gate:
+        terminalreporter.write_line(f"{over} stage(s) over their allowance (report only; use --gate to fail)")
+    if bench.update:
+        terminalreporter.write_line(f"Baselines saved: {BASELINES_FILE}")
+
+
+@pytest.fixture
+def bench(request):
+    return request.config._bench
+
+
+@pytest.fixture(scope='session')
+def labels():
+    with open(FIXTURES / 'labels.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='session')
+def scene(labels):
+    return cv2.imread(str(FIXTURES / labels['scene']))
+
+
+@pytest.fixture(scope='session')
+def plate_crops(labels):
+    return [cv2.imread(str(FIXTURES / crop['file'])) for crop in labels['crops']]
+
+
+@pytest.fixture(scope='session')
+def detector():
+    from detector import LicensePlateDetector
+    detector = LicensePlateDetector()  # Configured profile; YOLO is used when installed
+    yield detector
+    if detector.remote_ocr is not None:
+        detector.remote_ocr.close()
+
+
+@pytest.fixture(scope='session')
+def tesseract():
+    """Skips Tesseract stages on machines without the binary"""
+    import pytesseract
+    from config import TESSERACT_CMD
+    if not (os.path.exists(TESSERACT_CMD) or shutil.which(TESSERACT_CMD)):
+        pytest.skip(f"Tesseract not found: {TESSERACT_CMD}")
+    return pytesseract
@@ -0,0 +1,46 @@
+"""Regenerate the bundled benchmark fixtures from a fixed synthetic seed
+
+The fixtures are committed so timings don't move when synthetic.py
+changes; only rerun this (and --update-baselines) deliberately.
+
+Usage: python benchmarks/make_fixtures.py
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from synthetic import SceneGenerator
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+SEED = 43  # Both plates found by the stock contour detector (seed 42 misses one)
+PLATE_WIDTH = 200  # Source px: 100x27 in the 640 px working frame, above the default PLATE_MIN_*
+
+
+def main():
+    os.makedirs(FIXTURES, exist_ok=True)
+    generator = SceneGenerator(width=1280, height=720, formats='LLL NNNN,LLL NNN', seed=SEED)
+    image, labels = generator.scene(vehicles=2, plate_width=PLATE_WIDTH)
+    cv2.imwrite(str(FIXTURES / 'scene_720p.jpg'), image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+
+    # Plate crops as the pipeline sees them: a little context around each box
+    crops = []
+    for i, label in enumerate(label for label in labels if label['bbox']):
+        x1, y1, x2, y2 = label['bbox']
+        pad = (y2 - y1) // 6
+        crop = image[max(y1 - pad, 0):y2 + pad, max(x1 - pad, 0):x2 + pad]
+        name = f'plate_{i}.png'
+        cv2.imwrite(str(FIXTURES / name), crop)
+        crops.append({'file': name, 'plate': label['plate']})
+
+    with open(FIXTURES / 'labels.json', 'w', encoding='utf-8') as f:
+        json.dump({'scene': 'scene_720p.jpg', 'plates': labels, 'crops': crops}, f, indent=2)
+    print(f"✓ Fixtures written to {FIXTURES}: {len(crops)} plate crops")
+
+
+if __name__ == '__main__':
+    main()
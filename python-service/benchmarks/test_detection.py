@@ -0,0 +1,50 @@
+"""Plate localization stages"""
+import cv2
+import pytest
+
+from config import RESIZE_WIDTH
+from frame_context import FrameContext
+
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def assert_finds_plates(plates, labels, scale):
+    """Every labelled plate overlaps a detection (IoU >= 0.5) in frame coordinates"""
+    boxes = [plate['bbox'] for plate in plates]
+    for label in labels['plates']:
+        expected = [round(v * scale) for v in label['bbox']]
+        assert any(_iou(box, expected) >= 0.5 for box in boxes), \
+            f"{label['plate']} at {expected} not found in {boxes}"
+
+
+@pytest.fixture(scope='module')
+def scale(scene):
+    return RESIZE_WIDTH / scene.shape[1]
+
+
+@pytest.fixture(scope='module')
+def working_frame(scene, scale):
+    height = int(scene.shape[0] * scale)
+    return cv2.resize(scene, (RESIZE_WIDTH, height), interpolation=cv2.INTER_AREA)
+
+
+def test_detect_plates_contours(bench, detector, labels, scale, working_frame):
+    profile = detector.profile.scaled(scale)
+    assert_finds_plates(detector._detect_plates_contours(FrameContext(working_frame), profile), labels, scale)
+    # A fresh context per round: edge maps are memoized on the context
+    bench('detect.contours', lambda: detector._detect_plates_contours(FrameContext(working_frame), profile))
+
+
+def test_detect_plates(bench, detector, labels, scale, working_frame):
+    assert_finds_plates(detector.detect_plates(FrameContext(working_frame, scale=scale)), labels, scale)
+    bench('detect.plates', lambda: detector.detect_plates(FrameContext(working_frame, scale=scale)))
+
+
+def test_working_frame(bench, scene):
+    bench('frame.working', lambda: FrameContext(scene).working(RESIZE_WIDTH))
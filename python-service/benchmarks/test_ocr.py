@@ -0,0 +1,51 @@
+"""OCR preprocessing, recognition and text cleanup"""
+import pytest
+
+from detector import THRESHOLD_VARIANTS, TESSERACT_CONFIG
+
+VARIANT_NAMES = [name for name, _ in THRESHOLD_VARIANTS]
+
+
+@pytest.fixture(scope='module')
+def filtered_crops(detector, plate_crops):
+    return [detector._prepare_for_tesseract(crop) for crop in plate_crops]
+
+
+def test_prepare_for_tesseract(bench, detector, plate_crops):
+    bench('ocr.prepare', lambda: [detector._prepare_for_tesseract(crop) for crop in plate_crops])
+
+
+@pytest.mark.parametrize('variant', VARIANT_NAMES)
+def test_threshold_variant(bench, filtered_crops, variant):
+    threshold = dict(THRESHOLD_VARIANTS)[variant]
+    bench(f'ocr.threshold.{variant}', lambda: [threshold(crop) for crop in filtered_crops])
+
+
+@pytest.mark.parametrize('variant', VARIANT_NAMES)
+def test_tesseract_variant(bench, tesseract, filtered_crops, variant):
+    threshold = dict(THRESHOLD_VARIANTS)[variant]
+    images = [threshold(crop) for crop in filtered_crops]
+    bench(f'ocr.tesseract.{variant}',
+          lambda: [tesseract.image_to_string(image, config=TESSERACT_CONFIG) for image in images])
+
+
+def test_template_ocr(bench, detector, labels, plate_crops):
+    from char_ocr import CharTemplateOCR
+    from config import TEMPLATE_OCR_MIN_CONFIDENCE, TEMPLATE_OCR_MODEL
+    char_ocr = CharTemplateOCR.load(TEMPLATE_OCR_MODEL)
+    grays = [detector._to_gray(crop) for crop in plate_crops]
+    plates = [crop['plate'] for crop in labels['crops']]
+    results = [char_ocr.recognize(gray) for gray in grays]
+    assert [text for text, _ in results] == plates
+    # Correct reads must be accepted as they are, or every crop falls back to Tesseract
+    assert all(min(confidences) >= TEMPLATE_OCR_MIN_CONFIDENCE for _, confidences in results)
+    if detector.grammar is not None:
+        assert [detector.grammar.match(text) for text in plates] == plates
+    bench('ocr.template', lambda: [char_ocr.recognize(gray) for gray in grays])
+
+
+def test_clean_plate_text(bench, detector):
+    raw = ['NBC 1234\n', ' abc-123 ', 'N8C1234|', '\x0c', 'XY', 'ABCDEFGHIJKLMN', 'RJU 9593\n\x0c', 'snb0133']
+    assert [detector._clean_plate_text(text) for text in raw] == \
+        ['NBC1234', 'ABC123', 'N8C1234', '', '', '', 'RJU9593', 'SNB0133']
+    bench('ocr.clean_text', lambda: [detector._clean_plate_text(text) for text in raw * 16])
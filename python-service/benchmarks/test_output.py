@@ -0,0 +1,54 @@
+"""Duplicate filtering and output encoding"""
+from datetime import datetime
+
+import pytest
+
+from dedup_store import SharedDedupStore
+from snapshot_store import SnapshotStore
+
+
+CACHE_SIZES = [1_000, 10_000, 100_000]
+
+
+@pytest.fixture(params=CACHE_SIZES)
+def full_cache(request, detector):
+    now = datetime.now()
+    detector.recent_detections = {f'P{i:07d}': now for i in range(request.param)}
+    yield request.param
+    detector.recent_detections = {}
+
+
+def test_is_duplicate_miss(bench, detector, full_cache):
+    def new_plate():
+        # A miss inserts the plate; drop it again so the cache size stays fixed
+        detector.is_duplicate('NEW0001')
+        del detector.recent_detections['NEW0001']
+
+    bench(f'dedup.miss.{full_cache}', new_plate)
+
+
+def test_is_duplicate_hit(bench, detector, full_cache):
+    bench(f'dedup.hit.{full_cache}', lambda: detector.is_duplicate('P0000000'))
+
+
+def test_save_snapshot(bench, detector, scene, monkeypatch, tmp_path):
+    store = SnapshotStore(str(tmp_path), evict_interval=0)
+    monkeypatch.setattr(detector, 'snapshots', store)
+    bench('snapshot.save', lambda: detector.save_snapshot(scene.copy(), 'NBC1234', (286, 513, 459, 561)))
+    store.close()
+
+
+def test_frame_to_base64(bench, detector, scene):
+    bench('encode.base64.frame', lambda: detector.frame_to_base64(scene))
+
+
+def test_crop_to_base64(bench, detector, plate_crops):
+    bench('encode.base64.crop', lambda: detector.frame_to_base64(plate_crops[0]))
+
+
+def test_shared_dedup(bench, tmp_path):
+    store = SharedDedupStore(str(tmp_path / 'dedup.sqlite'), group='bench')
+    plates = iter(range(10**9))
+    bench('dedup.shared.miss', lambda: store.is_duplicate(f'N{next(plates):08d}'))
+    bench('dedup.shared.hit', lambda: store.is_duplicate('N00000000'))
+    store.close()
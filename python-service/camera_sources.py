@@ -1,3 +1,5 @@
+import time
+
 import cv2
 from abc import ABC, abstractmethod
 
@@ -5,6 +7,15 @@ from abc import ABC, abstractmethod
 class CameraSource(ABC):
     """Abstract base class for camera sources"""
     
+    # Optional FramePool; when set, frames are read into pooled buffers and
+    # must be handed back with release_frame() once processed
+    pool = None
+    
+    # Wall-clock times (time.time()) of the last read: when it started and
+    # when the frame was returned. Detections are timestamped with captured_at.
+    read_started_at = None
+    captured_at = None
+    
     @abstractmethod
     def get_frame(self):
         """Return the next frame from the camera"""
@@ -19,6 +30,46 @@ class CameraSource(ABC):
     def is_opened(self):
         """Check if camera is successfully opened"""
         pass
+    
+    def release_frame(self, frame):
+        """Return a frame obtained from get_frame() to the buffer pool"""
+        if self.pool is not None:
+            self.pool.release(frame)
+    
+    def skip_frame(self):
+        """Consume the next frame without returning it; False if none came
+        
+        Capture-backed sources only grab(): no colour conversion, copy or
+        pooled buffer. Used to keep a live stream drained while idle.
+        """
+        cap = getattr(self, 'cap', None)
+        if cap is not None:
+            return cap.grab()
+        frame = self.get_frame()
+        if frame is None:
+            return False
+        self.release_frame(frame)
+        return True
+    
+    def _read_frame(self):
+        """Read the next frame from self.cap, into a pooled buffer if possible"""
+        shape = getattr(self, '_frame_shape', None)
+        self.read_started_at = time.time()
+        if self.pool is None or shape is None:
+            ret, frame = self.cap.read()
+        else:
+            buffer = self.pool.acquire(shape)
+            ret, frame = self.cap.read(buffer)
+            if frame is not buffer:
+                # Stream changed resolution or the read failed
+                self.pool.release(buffer)
+        
+        if not ret or frame is None:
+            return None
+        
+        self.captured_at = time.time()
+        self._frame_shape = frame.shape
+        return frame
 
 
 class iPhoneCamera(CameraSource):
@@ -48,10 +99,7 @@ class iPhoneCamera(CameraSource):
         print(f"✓ Connected to iPhone camera at {url}")
     
     def get_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            return None
-        return frame
+        return self._read_frame()
     
     def release(self):
         self.cap.release()
@@ -76,10 +124,7 @@ class RTSPCamera(CameraSource):
         print(f"✓ Connected to RTSP camera at {rtsp_url}")
     
     def get_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            return None
-        return frame
+        return self._read_frame()
     
     def release(self):
         self.cap.release()
@@ -101,10 +146,7 @@ class WebcamCamera(CameraSource):
         print(f"✓ Connected to USB webcam (device {device_id})")
     
     def get_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            return None
-        return frame
+        return self._read_frame()
     
     def release(self):
         self.cap.release()
@@ -113,19 +155,31 @@ class WebcamCamera(CameraSource):
         return self.cap.isOpened()
 
 
-def get_camera_source(source_type, **kwargs):
+def get_camera_source(source_type, pool=None, **kwargs):
     """Factory function to get the appropriate camera source"""
     
     if source_type.lower() == "iphone":
         from config import IPHONE_URL
-        return iPhoneCamera(kwargs.get("url", IPHONE_URL))
+        camera = iPhoneCamera(kwargs.get("url", IPHONE_URL))
     
     elif source_type.lower() == "rtsp":
         from config import RTSP_URL
-        return RTSPCamera(kwargs.get("url", RTSP_URL))
+        camera = RTSPCamera(kwargs.get("url", RTSP_URL))
     
     elif source_type.lower() == "webcam":
-        return WebcamCamera(kwargs.get("device_id", 0))
+        camera = WebcamCamera(kwargs.get("device_id", 0))
+    
+    elif source_type.lower() == "replay":
+        from config import RECORD_DIR
+        from stream_recorder import ReplayCamera
+        camera = ReplayCamera(kwargs.get("path", RECORD_DIR), kwargs.get("realtime", True))
+    
+    elif source_type.lower() == "synthetic":
+        from synthetic import SyntheticCamera
+        camera = SyntheticCamera(realtime=kwargs.get("realtime", True))
     
     else:
         raise ValueError(f"Unknown camera source type: {source_type}")
+    
+    camera.pool = pool
+    return camera
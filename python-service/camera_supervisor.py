@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+
+from camera_sources import CameraSource
+from thread_budget import pin
+from config import (
+    CAMERA_STALL_TIMEOUT,
+    CAMERA_RECONNECT_MIN,
+    CAMERA_RECONNECT_MAX,
+    CAMERA_FRAME_WAIT
+)
+
+
+class CameraSupervisor(CameraSource):
+    """Keeps a camera connected: background reads, stall detection, reconnects
+
+    open_camera is a callable returning a connected CameraSource (e.g. a
+    get_camera_source partial); it may raise while the camera is down. A
+    reader thread pulls frames into a one-frame slot, so get_frame() always
+    returns the newest frame and never blocks on a dead stream for longer
+    than frame_wait. When no frame arrives for stall_timeout seconds (or the
+    capture closes) the connection is dropped and reopened in the background
+    with exponential backoff and jitter; the frame loop keeps running and
+    just sees None until frames flow again. Outages are recorded with their
+    duration.
+
+    Each capture is owned by its reader thread and released there: closing
+    a VideoCapture while another thread is blocked in read() is not safe, so
+    a stalled reader is abandoned and cleans up if its read ever returns.
+    """
+
+    def __init__(self, open_camera, pool=None, stall_timeout=CAMERA_STALL_TIMEOUT,
+                 reconnect_min=CAMERA_RECONNECT_MIN, reconnect_max=CAMERA_RECONNECT_MAX,
+                 frame_wait=CAMERA_FRAME_WAIT):
+        self.open_camera = open_camera
+        self.pool = pool
+        self.stall_timeout = stall_timeout
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.frame_wait = frame_wait
+
+        self._reader = None
+        self.idle = False  # While idle the reader only drains the stream (skip_frame)
+        self.outages = []  # {'start', 'end', 'duration', 'reason', 'attempts'}
+        self.frames = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+        self._slot = None  # (frame, read_started_at, captured_at)
+        self._generation = 0
+        self._last_frame = time.monotonic()
+        self._outage = {'start': time.time(), 'reason': 'connecting', 'attempts': 0}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        threading.Thread(target=self._supervise, name='camera-supervisor', daemon=True).start()
+
+    @property
+    def connected(self):
+        return self._outage is None
+
+    def get_frame(self):
+        """Newest frame, or None if none arrived within frame_wait seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._slot is not None or self._stop.is_set(),
+                                       timeout=self.frame_wait):
+                return None
+            if self._slot is None:
+                return None
+            frame, self.read_started_at, self.captured_at = self._slot
+            self._slot = None
+            self._cond.notify_all()
+        return frame
+
+    def release(self):
+        self._stop.set()
+        with self._cond:
+            self._generation += 1
+            if self._slot is not None:
+                self.release_frame(self._slot[0])
+                self._slot = None
+            self._cond.notify_all()
+        if self._reader is not None:
+            self._reader.join(timeout=2)
+
+    def is_opened(self):
+        return not self._stop.is_set()
+
+    def stats(self):
+        durations = [outage['duration'] for outage in self.outages]
+        return {
+            'connected': self.connected,
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'reconnects': self.reconnects,
+            'outages': len(self.outages),
+            'downtime_s': round(sum(durations), 1),
+            'longest_outage_s': round(max(durations), 1) if durations else 0.0,
+        }
+
+    def _supervise(self):
+        delay = self.reconnect_min
+        while not self._stop.is_set():
+            with self._cond:
+                self._outage['attempts'] += 1
+            try:
+                camera = self.open_camera()
+            except Exception as e:
+                # Full jitter keeps several gates from hammering a shared NVR in lockstep
+                wait = random.uniform(delay / 2, delay)
+                print(f"⚠ Camera unavailable ({e}); retrying in {wait:.1f}s")
+                self._stop.wait(wait)
+                delay = min(delay * 2, self.reconnect_max)
+                continue
+
+            camera.pool = self.pool
+            delay = self.reconnect_min
+            with self._cond:
+                self._generation += 1
+                generation = self._generation
+                self._last_frame = time.monotonic()
+            self._reader = threading.Thread(target=self._read, args=(camera, generation),
+                                            name='camera-reader', daemon=True)
+            self._reader.start()
+
+            reason = self._watch(self._reader)
+            if self._stop.is_set():
+                return
+
+            # The old reader notices the generation change and releases its capture
+            print(f"⚠ Camera {reason}; reconnecting")
+            self.reconnects += 1
+            with self._cond:
+                self._generation += 1
+                if self._outage is None:
+                    # The outage began with the last frame, not when it was noticed
+                    started = time.time() - (time.monotonic() - self._last_frame)
+                    self._outage = {'start': started, 'reason': reason, 'attempts': 0}
+
+    def _watch(self, reader):
+        """Block while the connection is healthy; returns why it is not"""
+        while not self._stop.wait(min(0.25, self.stall_timeout / 4)):
+            if not reader.is_alive():
+                return 'stream closed'
+            if time.monotonic() - self._last_frame > self.stall_timeout:
+                return f'stalled (no frame for {self.stall_timeout:g}s)'
+        return 'stopped'
+
+    def _read(self, camera, generation):
+        pin('capture')
+        try:
+            while generation == self._generation:
+                if self.idle:
+                    # A frame from before the idle spell would be stale once it ends
+                    with self._cond:
+                        if self._slot is not None:
+                            self.release_frame(self._slot[0])
+                            self._slot = None
+                    try:
+                        skipped = camera.skip_frame()
+                    except Exception:
+                        return
+                    if skipped:
+                        with self._cond:
+                            if generation != self._generation:
+                                return
+                            self._last_frame = time.monotonic()
+                            self._end_outage()  # Frames are flowing, even if none is kept
+                    elif not camera.is_opened():
+                        return
+                    else:
+                        self._stop.wait(0.1)  # Nothing to drain right now; the stall check reconnects
+                    continue
+
+                try:
+                    frame = camera.get_frame()
+                except Exception:
+                    return
+                if frame is None:
+                    if not camera.is_opened():
+                        return
+                    time.sleep(0.01)
+                    continue
+
+                with self._cond:
+                    if generation != self._generation:
+                        camera.release_frame(frame)
+                        return
+
+                    # Newest frame wins; the one the loop didn't get to goes back to the pool
+                    if self._slot is not None:
+                        self.release_frame(self._slot[0])
+                        self.dropped += 1
+                    self._slot = (frame, camera.read_started_at, camera.captured_at)
+                    self.frames += 1
+                    self._last_frame = time.monotonic()
+                    self._end_outage()
+                    self._cond.notify_all()
+        finally:
+            try:
+                camera.release()
+            except Exception as e:
+                print(f"⚠ Camera release failed: {e}")
+
+    def _end_outage(self):
+        if self._outage is None:
+            return
+        outage, self._outage = self._outage, None
+        outage['end'] = time.time()
+        outage['duration'] = outage['end'] - outage['start']
+        if outage['reason'] != 'connecting':
+            self.outages.append(outage)
+            print(f"✓ Camera recovered after {outage['duration']:.1f}s "
+                  f"({outage['reason']}, {outage['attempts']} attempts)")
+
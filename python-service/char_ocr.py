@@ -0,0 +1,338 @@
+"""Lightweight character-segmentation OCR for fixed-font plates
+
+Binarizes the plate crop, splits it into characters with connected
+components and classifies all characters in one vectorized nearest-neighbour
+pass against a template set. Templates are either built from labeled plate
+crops or rendered from OpenCV's built-in fonts.
+
+Usage:
+    python char_ocr.py build <labeled_crops_dir> <templates.npz>
+    python char_ocr.py read <templates.npz|fonts> <plate_image> [...]
+    python char_ocr.py calibrate <templates.npz|fonts> <dataset_dir> [limit]
+
+Labeled crops are named after their plate text, e.g. NBC1234.png or
+NBC1234_003.jpg. calibrate reads the plates of a labeled dataset
+(python synthetic.py dataset ..., or real crops in the same format) and
+prints how many reads each TEMPLATE_OCR_MIN_CONFIDENCE would let through,
+and how many of those are wrong.
+"""
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+CHARSET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+CALIBRATION_THRESHOLDS = (0.0, 0.02, 0.05, 0.08, 0.1, 0.12, 0.15, 0.2, 0.25, 0.35)
+GLYPH_WIDTH = 16
+GLYPH_HEIGHT = 24
+WORK_HEIGHT = 64  # Plates are resized to this height before segmentation
+
+
+def binarize(gray):
+    """Resize to WORK_HEIGHT and threshold so characters are white on black"""
+    return binarize_and_segment(gray)[0]
+
+
+def binarize_and_segment(gray):
+    """binarize() and segment() in one pass; returns (binary, boxes)
+
+    Plates come in both polarities (dark text on white or yellow, light text
+    on green), and a crop with some vehicle around the plate has no reliable
+    majority colour, so both polarities are cleaned and segmented and the
+    one that yields more characters wins.
+    """
+    scale = WORK_HEIGHT / float(gray.shape[0])
+    resized = cv2.resize(gray, (max(1, int(gray.shape[1] * scale)), WORK_HEIGHT),
+                         interpolation=cv2.INTER_LINEAR if scale > 1 else cv2.INTER_AREA)
+    _, light = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    candidates = []
+    for binary in (clear_frame(light), clear_frame(cv2.bitwise_not(light))):
+        candidates.append((binary, segment(binary)))
+    return max(candidates, key=lambda candidate: len(candidate[1]))
+
+
+def clear_frame(binary):
+    """Drop the plate frame and everything touching the crop edge
+
+    Long, thin horizontal runs (the frame's top and bottom edges) are
+    removed first so characters touching them come loose; then every
+    component reaching the edge of the crop goes: the plate background or
+    the vehicle around it, depending on the polarity.
+    """
+    height, width = binary.shape
+    runs = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                            cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 3, 1), 1)))
+    thick = cv2.morphologyEx(runs, cv2.MORPH_OPEN,
+                             cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(height // 8, 1))))
+    binary = cv2.subtract(binary, cv2.subtract(runs, thick))
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    x, y, w, h = stats[:, :4].T
+    keep = (x > 0) & (y > 0) & (x + w < width) & (y + h < height)
+    keep[0] = False  # Background
+    return np.where(keep[labels], 255, 0).astype(np.uint8)
+
+
+def segment(binary):
+    """Return left-to-right (x, y, w, h) boxes of character-like components
+
+    Characters of one plate share a height, so components far from the
+    median height (frame sides, bolts, dirt) are dropped.
+    """
+    height, width = binary.shape
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return []
+
+    stats = stats[1:]
+    x, y, w, h, area = stats.T
+    keep = (
+        (h >= 0.2 * height) & (h <= 0.95 * height) &
+        (w <= 0.25 * width) & (w >= 2) &
+        (area >= 0.01 * height * height) &
+        (x > 0) & (x + w < width)  # Plate border touches the crop edges
+    )
+    if keep.any():
+        median = np.median(h[keep])
+        keep &= (h >= 0.75 * median) & (h <= 1.25 * median)
+    boxes = []
+    for box in stats[keep, :4][np.argsort(stats[keep, 0])]:
+        boxes.extend(_split_touching(binary, *(int(v) for v in box)))
+    return boxes
+
+
+def _split_touching(binary, x, y, w, h):
+    """Split a component wider than a character (bold glyphs run together)
+
+    Cuts go at the emptiest column near each even split point.
+    """
+    parts = int(round(w / (0.8 * h)))
+    if w <= 1.2 * h or parts < 2:
+        return [(x, y, w, h)]
+    columns = (binary[y:y + h, x:x + w] > 0).sum(axis=0)
+    window = max(1, w // (4 * parts))
+    cuts = [0]
+    for i in range(1, parts):
+        centre = i * w // parts
+        lo, hi = max(cuts[-1] + 1, centre - window), min(w - 1, centre + window + 1)
+        cuts.append(lo + int(np.argmin(columns[lo:hi])) if hi > lo else centre)
+    cuts.append(w)
+    return [(x + left, y, right - left, h) for left, right in zip(cuts, cuts[1:]) if right - left >= 2]
+
+
+def normalize_glyphs(binary, boxes):
+    """Crop each box, pad to the glyph aspect ratio and resize; returns (n, d) float32"""
+    glyphs = np.zeros((len(boxes), GLYPH_HEIGHT * GLYPH_WIDTH), dtype=np.float32)
+    for i, (x, y, w, h) in enumerate(boxes):
+        crop = _deskew(_isolate(binary[y:y + h, x:x + w]))
+        h, w = crop.shape
+
+        # Keep the aspect ratio so thin glyphs (1, I) stay thin
+        target_w = max(w, int(round(h * GLYPH_WIDTH / GLYPH_HEIGHT)))
+        target_h = max(h, int(round(w * GLYPH_HEIGHT / GLYPH_WIDTH)))
+        canvas = np.zeros((target_h, target_w), dtype=np.uint8)
+        oy, ox = (target_h - h) // 2, (target_w - w) // 2
+        canvas[oy:oy + h, ox:ox + w] = crop
+
+        glyph = cv2.resize(canvas, (GLYPH_WIDTH, GLYPH_HEIGHT), interpolation=cv2.INTER_AREA)
+        glyphs[i] = glyph.reshape(-1)
+    glyphs /= 255.0
+    return glyphs
+
+
+def _isolate(crop):
+    """The character in its box without strokes of slanted neighbours reaching in
+
+    Keeps the largest component and any other piece that doesn't touch the
+    left or right side of the box, cropped to what is left.
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(crop, connectivity=8)
+    if count <= 2:
+        return crop
+    x, w, area = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_AREA]
+    keep = (x > 0) & (x + w < crop.shape[1])
+    keep[1 + np.argmax(area[1:])] = True
+    keep[0] = False
+    crop = np.where(keep[labels], 255, 0).astype(np.uint8)
+    x, y, w, h = cv2.boundingRect(crop)
+    return crop[y:y + h, x:x + w]
+
+
+def _deskew(crop):
+    """Shear the glyph upright (italic fonts, plates seen at an angle)"""
+    moments = cv2.moments(crop, binaryImage=True)
+    if moments['mu02'] < 1e-2:
+        return crop
+    skew = moments['mu11'] / moments['mu02']
+    height, width = crop.shape
+    pad = int(abs(skew) * height) + 1
+    padded = cv2.copyMakeBorder(crop, 0, 0, pad, pad, cv2.BORDER_CONSTANT, value=0)
+    shear = np.float32([[1, -skew, skew * moments['m01'] / moments['m00']], [0, 1, 0]])
+    upright = cv2.warpAffine(padded, shear, (width + 2 * pad, height), flags=cv2.INTER_NEAREST)
+    x, y, w, h = cv2.boundingRect(upright)
+    return upright[y:y + h, x:x + w]
+
+
+def render_font_templates():
+    """Render CHARSET with OpenCV's Hershey fonts; returns (glyphs, labels)"""
+    fonts = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX,
+             cv2.FONT_HERSHEY_COMPLEX, cv2.FONT_HERSHEY_PLAIN]
+    glyphs, labels = [], []
+    for font in fonts:
+        for thickness in (2, 4, 6):
+            for char in CHARSET:
+                canvas = np.zeros((WORK_HEIGHT * 2, WORK_HEIGHT * 2), dtype=np.uint8)
+                scale = cv2.getFontScaleFromHeight(font, WORK_HEIGHT, thickness)
+                cv2.putText(canvas, char, (10, int(WORK_HEIGHT * 1.5)), font, scale, 255, thickness)
+                points = cv2.findNonZero(canvas)
+                if points is None:
+                    continue
+                box = cv2.boundingRect(points)
+                glyphs.append(normalize_glyphs(canvas, [box])[0])
+                labels.append(char)
+    return np.array(glyphs, dtype=np.float32), np.array(labels)
+
+
+class CharTemplateOCR:
+    """Nearest-neighbour character classifier over a template set"""
+
+    def __init__(self, templates, labels):
+        self.templates = np.asarray(templates, dtype=np.float32)
+        self.labels = np.asarray(labels)
+        if self.templates.ndim != 2 or len(self.templates) == 0:
+            raise ValueError("No character templates to classify with")
+        self._template_norms = (self.templates ** 2).sum(axis=1)
+
+    @classmethod
+    def load(cls, path=None):
+        """Load templates from a .npz file, or render font templates if path is empty"""
+        if path and os.path.exists(path):
+            data = np.load(path)
+            return cls(data['templates'], data['labels'])
+        if path:
+            print(f"⚠ Character templates not found: {path} - using font templates")
+        return cls(*render_font_templates())
+
+    def save(self, path):
+        np.savez_compressed(path, templates=self.templates, labels=self.labels)
+
+    def recognize(self, gray):
+        """Read a grayscale plate crop; returns (text, per-character confidences)"""
+        binary, boxes = binarize_and_segment(gray)
+        if not boxes:
+            return "", []
+
+        glyphs = normalize_glyphs(binary, boxes)
+
+        # Squared distances of every glyph to every template in one batch
+        dists = ((glyphs ** 2).sum(axis=1)[:, None] + self._template_norms[None, :]
+                 - 2.0 * glyphs @ self.templates.T)
+        np.maximum(dists, 0, out=dists)
+
+        nearest = dists.argmin(axis=1)
+        best = dists[np.arange(len(glyphs)), nearest]
+        chars = self.labels[nearest]
+
+        # Confidence: margin to the closest template of a different character
+        other = np.where(self.labels[None, :] == chars[:, None], np.inf, dists)
+        runner_up = other.min(axis=1)
+        confidences = np.clip(1.0 - np.sqrt(best) / np.maximum(np.sqrt(runner_up), 1e-6), 0.0, 1.0)
+
+        return ''.join(chars.tolist()), confidences.tolist()
+
+
+def build_templates(crops_dir):
+    """Build templates from labeled plate crops whose file names are the plate text"""
+    glyphs, labels = [], []
+    skipped = 0
+    for name in sorted(os.listdir(crops_dir)):
+        label = os.path.splitext(name)[0].split('_')[0].upper()
+        image = cv2.imread(os.path.join(crops_dir, name), cv2.IMREAD_GRAYSCALE)
+        if image is None or not label:
+            continue
+
+        binary, boxes = binarize_and_segment(image)
+        if len(boxes) != len(label):
+            skipped += 1  # Segmentation disagrees with the label - don't guess
+            continue
+
+        glyphs.extend(normalize_glyphs(binary, boxes))
+        labels.extend(label)
+
+    if not labels:
+        raise ValueError(f"No character templates built from {crops_dir}: no crop segmented into "
+                         f"as many characters as its name ({skipped} crops skipped)")
+    print(f"✓ {len(labels)} character templates from {crops_dir} ({skipped} crops skipped)")
+    return CharTemplateOCR(np.array(glyphs, dtype=np.float32), np.array(labels))
+
+
+def calibrate(ocr, dataset_dir, limit=None, thresholds=CALIBRATION_THRESHOLDS):
+    """Reads accepted / wrong per minimum confidence over a labeled dataset
+
+    Plates are cropped from their labeled boxes and must fit PLATE_FORMATS
+    (after confusable corrections) as in the detector. Returns
+    {threshold: (accepted, wrong)} and the number of plates.
+    """
+    from plate_grammar import PlateGrammar
+    grammar = PlateGrammar.from_config()
+
+    with open(os.path.join(dataset_dir, 'labels.jsonl'), encoding='utf-8') as f:
+        records = [json.loads(line) for line in f][:limit]
+    reads = []  # (min confidence, correct) of every read that fits a format
+    plates = 0
+    for record in records:
+        image = cv2.imread(os.path.join(dataset_dir, record['image']), cv2.IMREAD_GRAYSCALE)
+        for label in record['plates']:
+            plates += 1
+            x1, y1, x2, y2 = label['bbox']
+            pad = (y2 - y1) // 6
+            text, confidences = ocr.recognize(image[max(y1 - pad, 0):y2 + pad, max(x1 - pad, 0):x2 + pad])
+            if grammar is not None:
+                text = grammar.match(text)
+            if text:
+                reads.append((min(confidences), text == label['plate']))
+
+    table = {}
+    for threshold in thresholds:
+        accepted = [correct for confidence, correct in reads if confidence >= threshold]
+        table[threshold] = (len(accepted), accepted.count(False))
+    return table, plates
+
+
+def main(argv):
+    try:
+        return _run(argv)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+
+def _run(argv):
+    if len(argv) >= 3 and argv[0] == 'build':
+        build_templates(argv[1]).save(argv[2])
+        print(f"✓ Saved: {argv[2]}")
+        return 0
+
+    if len(argv) >= 3 and argv[0] == 'calibrate':
+        ocr = CharTemplateOCR.load(None if argv[1] == 'fonts' else argv[1])
+        table, plates = calibrate(ocr, argv[2], int(argv[3]) if len(argv) > 3 else None)
+        print(f"{plates} plates | min confidence: reads accepted (wrong)")
+        for threshold, (accepted, wrong) in table.items():
+            print(f"  {threshold:5.2f}: {accepted:4d} ({wrong})")
+        return 0
+
+    if len(argv) >= 3 and argv[0] == 'read':
+        ocr = CharTemplateOCR.load(None if argv[1] == 'fonts' else argv[1])
+        for path in argv[2:]:
+            text, confidences = ocr.recognize(cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+            print(f"{path}: {text} {[round(c, 2) for c in confidences]}")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
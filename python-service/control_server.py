@@ -0,0 +1,394 @@
+"""Live tuning of pipeline parameters over a local HTTP endpoint
+
+    GET  /config    tunable parameters: current values, types and ranges
+    POST /config    {"FRAME_SKIP": 2, "RESIZE_WIDTH": 800}: validated as a
+                    whole, then applied together between two frames
+    GET  /stats     fps and latency since the last change, and before it
+    POST /profile   {"kind": "cpu" | "memory", "duration": 30}
+
+A change set is either rejected (400, with a reason per parameter) or
+applied in full: the frame loop swaps in the new values at the top of its
+next iteration, so no frame runs with half of them; change sets that
+arrive before that frame are applied together. Values are not written
+back to .env; a restart returns to the configured ones.
+
+Profiles are started and stopped between frames on the frame loop thread,
+so cProfile runs need no SIGALRM and also work on Windows.
+
+With CONTROL_TOKEN set, requests need "Authorization: Bearer <token>".
+
+Usage (against a running scanner):
+    python control_server.py get
+    python control_server.py set FRAME_SKIP=2 RESIZE_WIDTH=800
+    python control_server.py stats
+    python control_server.py profile cpu|memory [seconds]
+"""
+import json
+import math
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+import config
+from config import (
+    CONTROL_HOST,
+    CONTROL_PORT,
+    CONTROL_TOKEN
+)
+
+# name: (type, minimum, maximum)
+TUNABLES = {
+    'FRAME_SKIP': (int, 1, 100),
+    'TRIGGER_BURST_FRAME_SKIP': (int, 1, 100),
+    'RESIZE_WIDTH': (int, 160, 7680),
+    'DUPLICATE_WINDOW_SECONDS': (int, 0, 86400),
+    'QUALITY_MIN_SHARPNESS': (float, 0.0, None),
+    'QUALITY_MIN_CONTRAST': (float, 0.0, 255.0),
+    'QUALITY_MAX_SATURATION': (float, 0.0, 1.0),
+    'TEMPLATE_OCR_MIN_CONFIDENCE': (float, 0.0, 1.0),
+    'PLATE_GRAMMAR_STRICT': (bool, None, None),
+    'USE_PLATE_RECOGNIZER': (bool, None, None),  # Send every crop to Plate Recognizer instead of local OCR
+    'USE_OCR_SPACE_FALLBACK': (bool, None, None),  # Queue unusable local reads for remote OCR
+}
+
+APPLY_TIMEOUT = 5.0  # Seconds a POST waits for the frame loop to take a change
+WINDOW_SAMPLES = 2000  # Frames per stats window kept for the percentiles
+
+
+class _Window:
+    """Frame timings under one version of the settings"""
+
+    def __init__(self, version, frame_count):
+        self.version = version
+        self.started = time.monotonic()
+        self.first_frame = frame_count
+        self.last_frame = frame_count
+        self.processed = 0
+        self.durations = deque(maxlen=WINDOW_SAMPLES)  # Frame loop time per processed frame
+        self.latencies = deque(maxlen=WINDOW_SAMPLES)  # Capture to end of processing
+
+    def stats(self, until=None):
+        elapsed = max((until or time.monotonic()) - self.started, 1e-6)
+        stats = {'version': self.version, 'seconds': round(elapsed, 1), 'processed': self.processed,
+                 'input_fps': round((self.last_frame - self.first_frame) / elapsed, 2),
+                 'processed_fps': round(self.processed / elapsed, 2)}
+        for name, values in (('frame_ms', self.durations), ('latency_ms', self.latencies)):
+            if values:
+                values = np.array(values) * 1000.0
+                stats[name] = {'p50': round(float(np.percentile(values, 50)), 1),
+                               'p95': round(float(np.percentile(values, 95)), 1)}
+        return stats
+
+
+class RuntimeSettings:
+    """The tunable values the frame loop reads, replaced only between frames
+
+    values is never modified in place: apply() builds the new dict, pushes
+    the values into the components that hold them (detector, quality gate)
+    and then swaps it in, all on the frame loop thread.
+    """
+
+    def __init__(self, detector=None, quality_gate=None):
+        self.detector = detector
+        self.quality_gate = quality_gate
+        # Parameters living on a component: name -> (component, attribute)
+        self._targets = {
+            'QUALITY_MIN_SHARPNESS': (quality_gate, 'min_sharpness'),
+            'QUALITY_MIN_CONTRAST': (quality_gate, 'min_contrast'),
+            'QUALITY_MAX_SATURATION': (quality_gate, 'max_saturation'),
+            'TEMPLATE_OCR_MIN_CONFIDENCE': (detector, 'template_min_confidence'),
+            'PLATE_GRAMMAR_STRICT': (detector, 'grammar_strict'),
+            'USE_PLATE_RECOGNIZER': (detector, 'remote_primary'),
+            'USE_OCR_SPACE_FALLBACK': (detector, 'remote_fallback'),
+        }
+        values = {}
+        for name in TUNABLES:
+            target, attribute = self._targets.get(name, (None, None))
+            values[name] = getattr(target, attribute) if target is not None else getattr(config, name)
+        self.values = values
+        self.version = 0
+        self.changes = deque(maxlen=20)
+        self.pending = False  # Whether apply() has anything to do
+        self._changes = {}  # Validated values waiting for the next frame
+        self._futures = []  # Resolved with the frame the changes were applied at
+        self._actions = []  # Callables to run on the frame loop thread
+        self._lock = threading.Lock()
+        self._window = _Window(0, 0)
+        self._previous = None
+
+    def validate(self, changes):
+        """(typed values, {}) for a valid change set, or (None, {name: reason})"""
+        values = {}
+        errors = {}
+        for name, raw in changes.items():
+            if name not in TUNABLES:
+                errors[name] = 'not a tunable parameter'
+                continue
+            kind, minimum, maximum = TUNABLES[name]
+            try:
+                value = _cast(kind, raw)
+            except (TypeError, ValueError, OverflowError):
+                errors[name] = f'expected a finite {kind.__name__}'
+                continue
+            if minimum is not None and value < minimum or maximum is not None and value > maximum:
+                errors[name] = f"must be within {minimum}..{maximum if maximum is not None else ''}"
+                continue
+            reason = self._unavailable(name, value)
+            if reason:
+                errors[name] = reason
+                continue
+            values[name] = value
+        return (None, errors) if errors else (values, {})
+
+    def _unavailable(self, name, value):
+        """Why a parameter can't take this value in this process, if it can't"""
+        target = self._targets.get(name, (True,))[0]
+        if target is None:
+            return 'its component is disabled in this process'
+        if name in ('USE_PLATE_RECOGNIZER', 'USE_OCR_SPACE_FALLBACK') and value:
+            remote = self.detector.remote_ocr
+            providers = [provider.name for provider in remote.providers] if remote is not None else []
+            if not providers:
+                return 'no remote OCR provider configured at startup'
+            if name == 'USE_PLATE_RECOGNIZER' and 'platerecognizer' not in providers:
+                return 'Plate Recognizer was not configured at startup'
+        return None
+
+    def submit(self, changes):
+        """Validate a change set and queue it for the next frame
+
+        Returns (future, errors); the future resolves to the frame number
+        the change was applied at. Change sets arriving before the next
+        frame are applied together, later ones winning per parameter.
+        """
+        values, errors = self.validate(changes)
+        if errors:
+            return None, errors
+        future = Future()
+        with self._lock:
+            self._changes.update(values)
+            self._futures.append(future)
+            self.pending = True
+        return future, {}
+
+    def call_between_frames(self, function):
+        """Run function on the frame loop thread before the next frame; returns a Future"""
+        future = Future()
+        with self._lock:
+            self._actions.append((function, future))
+            self.pending = True
+        return future
+
+    def apply(self, frame_count):
+        """Apply what was queued; called by the frame loop between frames"""
+        with self._lock:
+            changes, self._changes = self._changes, {}
+            futures, self._futures = self._futures, []
+            actions, self._actions = self._actions, []
+            self.pending = False
+
+        if futures:
+            # Merged here, on the only thread that replaces values, so no change is lost
+            values = {**self.values, **changes}
+            for name, (target, attribute) in self._targets.items():
+                if target is not None:
+                    setattr(target, attribute, values[name])
+            self.values = values
+            self.version += 1
+            self._previous = self._window.stats()
+            self._window = _Window(self.version, frame_count)
+            self.changes.append({'version': self.version, 'frame': frame_count,
+                                 'at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'changes': changes})
+            print(f"🎛 Settings v{self.version} applied at frame {frame_count}: {changes}")
+            for future in futures:
+                future.set_result(frame_count)
+
+        for function, action_future in actions:
+            try:
+                action_future.set_result(function())
+            except Exception as e:
+                action_future.set_exception(e)
+
+    def record_frame(self, frame_count, started, captured_at):
+        """Timings of a processed frame (wall-clock start and capture time)"""
+        now = time.time()
+        window = self._window
+        window.last_frame = frame_count
+        window.processed += 1
+        window.durations.append(now - started)
+        window.latencies.append(now - captured_at)
+
+    def stats(self):
+        return {'version': self.version, 'current': self._window.stats(),
+                'before_last_change': self._previous, 'changes': list(self.changes)}
+
+
+def _cast(kind, raw):
+    if kind is bool:
+        if isinstance(raw, bool):
+            return raw
+        if str(raw).lower() in ('true', '1', 'yes', 'on'):
+            return True
+        if str(raw).lower() in ('false', '0', 'no', 'off'):
+            return False
+        raise ValueError(raw)
+    if isinstance(raw, bool):
+        raise TypeError(raw)
+    value = kind(raw)  # OverflowError for an infinite int
+    if kind is float and not math.isfinite(value):
+        raise ValueError(raw)  # NaN passes every range check
+    if kind is int and isinstance(raw, float) and raw != value:
+        raise ValueError(raw)
+    return value
+
+
+class ControlServer:
+    """HTTP front end of RuntimeSettings (and of the on-demand profiler)"""
+
+    def __init__(self, settings, profiler=None, host=CONTROL_HOST, port=CONTROL_PORT, token=CONTROL_TOKEN):
+        self.settings = settings
+        self.profiler = profiler
+        self.token = token
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='control-http', daemon=True).start()
+        print(f"✓ Control endpoint: http://{host}:{self.server.server_address[1]}/config"
+              f"{' (token required)' if token else ''}")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def start_profile(self, kind, duration=None):
+        """Start a profiling run on the frame loop thread (cProfile needs the main thread)"""
+        if self.profiler is None:
+            raise RuntimeError('profiling is not available')
+        if kind == 'memory':
+            return self.settings.call_between_frames(lambda: self.profiler.start_memory(duration))
+
+        duration = duration or self.profiler.duration
+
+        def start():
+            started = self.profiler.start_cpu(duration, stop_timer=False)
+            if started:
+                # Stopped from the frame loop too: cProfile only sees the thread it runs on
+                timer = threading.Timer(duration, self.settings.call_between_frames, (self.profiler.stop_cpu,))
+                timer.daemon = True
+                timer.start()
+            return started
+
+        return self.settings.call_between_frames(start)
+
+    def _handler_class(self):
+        control = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                path = self.path.split('?')[0]
+                if path == '/config':
+                    self._reply(200, {'version': control.settings.version, 'values': control.settings.values,
+                                      'tunables': {name: {'type': kind.__name__, 'min': minimum, 'max': maximum}
+                                                   for name, (kind, minimum, maximum) in TUNABLES.items()}})
+                elif path == '/stats':
+                    self._reply(200, control.settings.stats())
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                path = self.path.split('?')[0]
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                    if not isinstance(body, dict):
+                        raise ValueError('expected a JSON object')
+                except ValueError as e:
+                    self._reply(400, {'error': f'invalid JSON: {e}'})
+                    return
+
+                if path == '/config':
+                    future, errors = control.settings.submit(body)
+                    if errors:
+                        self._reply(400, {'errors': errors})
+                        return
+                    try:
+                        frame = future.result(timeout=APPLY_TIMEOUT)
+                    except FutureTimeout:
+                        self._reply(202, {'status': 'queued until the next frame'})
+                        return
+                    self._reply(200, {'version': control.settings.version, 'applied_at_frame': frame,
+                                      'values': control.settings.values})
+                elif path == '/profile':
+                    kind = body.get('kind', 'cpu')
+                    duration = body.get('duration')
+                    if kind not in ('cpu', 'memory'):
+                        self._reply(400, {'error': "kind must be 'cpu' or 'memory'"})
+                        return
+                    if duration is not None and (isinstance(duration, bool) or
+                                                 not isinstance(duration, (int, float)) or
+                                                 not math.isfinite(duration) or duration <= 0):
+                        self._reply(400, {'error': 'duration must be a positive number of seconds'})
+                        return
+                    try:
+                        started = control.start_profile(kind, duration).result(timeout=APPLY_TIMEOUT)
+                    except FutureTimeout:
+                        self._reply(202, {'status': 'queued until the next frame'})
+                        return
+                    except (RuntimeError, TypeError, ValueError) as e:
+                        self._reply(409, {'error': str(e)})
+                        return
+                    self._reply(200 if started else 409, {'started': started, 'kind': kind,
+                                                          'output_dir': control.profiler.output_dir})
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+            def _authorized(self):
+                if not control.token or self.headers.get('Authorization') == f'Bearer {control.token}':
+                    return True
+                self._reply(401, {'error': 'unauthorized'})
+                return False
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv):
+    url = f"http://{'127.0.0.1' if CONTROL_HOST in ('0.0.0.0', '') else CONTROL_HOST}:{CONTROL_PORT}"
+    headers = {'Authorization': f'Bearer {CONTROL_TOKEN}'} if CONTROL_TOKEN else {}
+    if argv and argv[0] in ('get', 'stats'):
+        response = requests.get(f"{url}/{'config' if argv[0] == 'get' else 'stats'}", headers=headers, timeout=5)
+    elif len(argv) > 1 and argv[0] == 'set':
+        changes = dict(item.split('=', 1) for item in argv[1:])
+        response = requests.post(f'{url}/config', json=changes, headers=headers, timeout=APPLY_TIMEOUT + 5)
+    elif len(argv) > 1 and argv[0] == 'profile':
+        body = {'kind': argv[1]}
+        if len(argv) > 2:
+            body['duration'] = float(argv[2])
+        response = requests.post(f'{url}/profile', json=body, headers=headers, timeout=APPLY_TIMEOUT + 5)
+    else:
+        print(__doc__)
+        return 1
+    print(json.dumps(response.json(), indent=2))
+    return 0 if response.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,170 @@
+"""Duplicate suppression shared by every scanner process on this machine
+
+Worker processes and cameras covering the same lane point DEDUP_DB at the
+same file and use the same DEDUP_GROUP; a plate read by any of them is a
+duplicate for all of them for DUPLICATE_WINDOW_SECONDS. The check and the
+update are a single SQLite UPSERT, so two processes reading the same plate
+at the same moment can't both see it as new.
+
+Usage:
+    python dedup_store.py bench [processes] [reads]
+"""
+import multiprocessing as mp
+import sqlite3
+import sys
+import threading
+import time
+
+from config import (
+    DEDUP_DB,
+    DEDUP_GROUP,
+    DEDUP_BUSY_TIMEOUT,
+    DUPLICATE_WINDOW_SECONDS
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    grp TEXT NOT NULL,
+    plate TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (grp, plate)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seen_time ON seen (last_seen);
+"""
+
+# Inserts a new plate, or refreshes one whose window has passed; a plate
+# still inside its window changes nothing, which is how a duplicate shows
+CHECK_AND_SET = """
+INSERT INTO seen (grp, plate, last_seen) VALUES (?, ?, ?)
+ON CONFLICT (grp, plate) DO UPDATE SET last_seen = excluded.last_seen
+WHERE excluded.last_seen - seen.last_seen >= ?
+"""
+
+EXPIRE_INTERVAL = 60  # Seconds between purges of expired plates
+RECONNECT_INTERVAL = 30  # Seconds between attempts to open a database that failed to open
+
+
+class SharedDedupStore:
+    """Atomic check-and-set of recently seen plates in a local SQLite table
+
+    If the database is unavailable or stays locked beyond busy_timeout, the
+    check falls back to a per-process cache: a duplicate upload is better
+    than a lost read. A database that can't be opened at startup is
+    retried every RECONNECT_INTERVAL seconds meanwhile.
+    """
+
+    def __init__(self, path=DEDUP_DB, group=DEDUP_GROUP, busy_timeout=DEDUP_BUSY_TIMEOUT):
+        self.path = path
+        self.group = group
+        self.checks = 0
+        self.duplicates = 0
+        self.fallbacks = 0
+        self._local = {}
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._next_expiry = 0.0
+        self._db = None
+        self._retry_at = 0.0
+        try:
+            self._connect()
+        except sqlite3.Error as e:
+            print(f"⚠ Shared dedup database {path} unavailable ({e}); using a local cache, "
+                  f"retrying every {RECONNECT_INTERVAL}s")
+
+    def _connect(self):
+        """Open the database (schema included); raises sqlite3.Error and schedules a retry"""
+        self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+        # Autocommit: each UPSERT is its own (atomic) transaction
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+        except sqlite3.Error:
+            db.close()
+            raise
+        self._db = db
+        return db
+
+    def is_duplicate(self, plate, window_seconds=DUPLICATE_WINDOW_SECONDS, now=None):
+        """True if any process in the group saw plate within the window; records it otherwise"""
+        now = now or time.time()
+        with self._lock:
+            self.checks += 1
+            try:
+                db = self._db
+                if db is None:
+                    if time.monotonic() < self._retry_at:
+                        raise sqlite3.OperationalError("database not open")
+                    db = self._connect()
+                    print(f"✓ Shared dedup database {self.path} opened")
+                duplicate = db.execute(CHECK_AND_SET, (self.group, plate, now, window_seconds)).rowcount == 0
+                if now >= self._next_expiry:
+                    db.execute('DELETE FROM seen WHERE last_seen < ?', (now - 2 * window_seconds,))
+                    self._next_expiry = now + EXPIRE_INTERVAL
+            except sqlite3.Error as e:
+                self.fallbacks += 1
+                if self.fallbacks == 1:
+                    print(f"⚠ Shared dedup unavailable ({e}); using a local cache")
+                duplicate = now - self._local.get(plate, float('-inf')) < window_seconds
+                if not duplicate:
+                    self._local[plate] = now
+
+            if duplicate:
+                self.duplicates += 1
+        return duplicate
+
+    def stats(self):
+        return {'checks': self.checks, 'duplicates': self.duplicates, 'fallbacks': self.fallbacks}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+
+
+def _bench_worker(path, plates, results):
+    store = SharedDedupStore(path, group='bench')
+    new = 0
+    started = time.perf_counter()
+    for plate in plates:
+        if not store.is_duplicate(plate, window_seconds=3600):
+            new += 1
+    results.put((new, (time.perf_counter() - started) / len(plates)))
+    store.close()
+
+
+def benchmark(path, processes=4, reads=2000):
+    """Every process reads the same plates: exactly one of them may count each as new"""
+    plates = [f'BEN{i:04d}' for i in range(reads)]
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_bench_worker, args=(path, plates, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    uploads = sum(new for new, _ in outcomes)
+    latency_ms = 1000 * sum(latency for _, latency in outcomes) / len(outcomes)
+    return uploads, latency_ms
+
+
+def main(argv):
+    if argv and argv[0] == 'bench':
+        import os
+        import tempfile
+        processes = int(argv[1]) if len(argv) > 1 else 4
+        reads = int(argv[2]) if len(argv) > 2 else 2000
+        path = os.path.join(tempfile.mkdtemp(), 'dedup.sqlite')
+        uploads, latency_ms = benchmark(path, processes, reads)
+        print(f"{processes} processes x {reads} reads of the same plates: {uploads} uploads "
+              f"({uploads - reads} duplicates let through), {latency_ms:.3f} ms per check")
+        return 0 if uploads == reads else 1
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,353 @@
+"""Append-only columnar log of detections and OCR outcomes, for analytics
+
+Every published read and every candidate's OCR outcome is appended to
+compressed Arrow IPC stream files, so questions like reads per hour, OCR
+drift or per-gate hit rates never touch the production database:
+
+    <DETECTION_LOG_DIR>/detections/<YYYY-MM-DD>/<gate>_<HHMMSS>_<pid>.arrows
+    <DETECTION_LOG_DIR>/ocr/<YYYY-MM-DD>/<gate>_<HHMMSS>_<pid>.arrows
+
+Logging a record only appends a tuple to an in-memory batch; full batches
+are converted to columns, compressed and written by a background thread.
+Files rotate every DETECTION_LOG_ROTATE_MINUTES and at midnight, and date
+directories older than DETECTION_LOG_MAX_AGE_DAYS are deleted. The stream
+format stays readable up to the last complete batch if the scanner dies.
+
+Requires pyarrow (pip install pyarrow); without it the log is disabled.
+
+Usage:
+    python detection_log.py scan <since> [until] [--table ocr] [--gate id]   (ISO dates/times)
+    python detection_log.py hourly <since> [until] [--gate id]
+    python detection_log.py bench [records]
+"""
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+from config import (
+    GATE_IDENTIFIER,
+    DETECTION_LOG_DIR,
+    DETECTION_LOG_BATCH_ROWS,
+    DETECTION_LOG_FLUSH_SECONDS,
+    DETECTION_LOG_ROTATE_MINUTES,
+    DETECTION_LOG_COMPRESSION,
+    DETECTION_LOG_MAX_AGE_DAYS
+)
+
+# Columns of each table, in the order log_*() builds their rows
+COLUMNS = {
+    'detections': [
+        ('captured_at', 'timestamp'),
+        ('gate', 'string'),
+        ('plate', 'string'),
+        ('confidence', 'float32'),
+        ('trigger_id', 'string'),
+        ('trace_id', 'int64'),
+        ('sent', 'bool'),
+        ('latency_ms', 'float32'),  # Capture to API answer
+    ],
+    'ocr': [
+        ('captured_at', 'timestamp'),
+        ('gate', 'string'),
+        ('text', 'string'),  # '' when nothing was read
+        ('outcome', 'string'),  # unread | duplicate | new
+        ('engine', 'string'),  # local | remote
+        ('confidence', 'float32'),  # Detection confidence of the crop
+        ('width', 'int32'),
+        ('height', 'int32'),
+        ('trigger_id', 'string'),
+        ('trace_id', 'int64'),
+    ],
+}
+
+SUFFIX = '.arrows'
+
+
+def _schema(table):
+    types = {'timestamp': pa.timestamp('us', tz='UTC'), 'string': pa.string(), 'float32': pa.float32(),
+             'int32': pa.int32(), 'int64': pa.int64(), 'bool': pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS[table]])
+
+
+class DetectionLog:
+    """Buffers records in memory and writes them as Arrow batches in the background"""
+
+    def __init__(self, directory=DETECTION_LOG_DIR, gate_id=GATE_IDENTIFIER, batch_rows=DETECTION_LOG_BATCH_ROWS,
+                 flush_seconds=DETECTION_LOG_FLUSH_SECONDS, rotate_minutes=DETECTION_LOG_ROTATE_MINUTES,
+                 compression=DETECTION_LOG_COMPRESSION, max_age_days=DETECTION_LOG_MAX_AGE_DAYS):
+        self.directory = directory
+        self.gate_id = gate_id
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.rotate_seconds = rotate_minutes * 60
+        self.max_age_days = max_age_days
+        self.options = ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+        self.schemas = {table: _schema(table) for table in COLUMNS}
+
+        self.rows = 0
+        self.batches = 0
+        self.files = 0
+        self.write_seconds = 0.0
+        self._pending = {table: [] for table in COLUMNS}
+        self._open = {}  # table -> (writer, sink, date, opened_at)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='detection-log', daemon=True)
+        self._thread.start()
+        print(f"✓ Detection log: {directory} ({compression}, {batch_rows} rows/batch, "
+              f"rotate {rotate_minutes:g} min)")
+
+    def log_detection(self, candidate, plate, sent, answered_at=None):
+        """A new read that was published to the API"""
+        answered_at = answered_at or time.time()
+        self._append('detections', (candidate['captured_at'], self.gate_id, plate, float(candidate['confidence']),
+                                    candidate['trigger_id'], candidate['trace_id'], sent,
+                                    (answered_at - candidate['captured_at']) * 1000.0))
+
+    def log_ocr(self, candidate, text, outcome, engine='local'):
+        """What OCR made of one candidate crop"""
+        height, width = candidate['gray'].shape[:2]
+        self._append('ocr', (candidate['captured_at'], self.gate_id, text, outcome, engine,
+                             float(candidate['confidence']), width, height,
+                             candidate['trigger_id'], candidate['trace_id']))
+
+    def _append(self, table, row):
+        with self._lock:
+            rows = self._pending[table]
+            rows.append(row)
+            if len(rows) < self.batch_rows:
+                return
+            self._pending[table] = []
+        self._queue.put((table, rows))
+
+    def stats(self):
+        return {'rows': self.rows, 'batches': self.batches, 'files': self.files,
+                'write_us_per_row': round(1e6 * self.write_seconds / max(self.rows, 1), 2)}
+
+    def close(self):
+        """Write what is buffered and close the files"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                item = ()  # Write partial batches so the files stay current
+            if item:
+                self._write(*item)
+                continue
+
+            with self._lock:
+                pending = [(table, rows) for table, rows in self._pending.items() if rows]
+                self._pending = {table: [] for table in COLUMNS}
+            for table, rows in pending:
+                self._write(table, rows)
+            if item is None:
+                for table in list(self._open):
+                    self._close_file(table)
+                return
+
+    def _write(self, table, rows):
+        started = time.perf_counter()
+        try:
+            batch = self._to_batch(table, rows)
+            self._file(table).write_batch(batch)
+        except (OSError, pa.ArrowException) as e:
+            print(f"⚠ Detection log write failed ({len(rows)} {table} rows lost): {e}")
+            self._close_file(table)
+            return
+        self.rows += len(rows)
+        self.batches += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def _to_batch(self, table, rows):
+        schema = self.schemas[table]
+        arrays = []
+        for field, values in zip(schema, zip(*rows)):
+            if pa.types.is_timestamp(field.type):
+                micros = (np.asarray(values, dtype=np.float64) * 1e6).astype(np.int64)
+                arrays.append(pa.array(micros, type=field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _file(self, table):
+        """The open writer of table, rotating it when its time is up"""
+        now = time.time()
+        date = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        current = self._open.get(table)
+        if current is not None and (current[2] != date or now - current[3] >= self.rotate_seconds):
+            self._close_file(table)
+            current = None
+        if current is None:
+            directory = os.path.join(self.directory, table, date)
+            os.makedirs(directory, exist_ok=True)
+            name = f"{self.gate_id}_{datetime.fromtimestamp(now).strftime('%H%M%S')}_{os.getpid()}{SUFFIX}"
+            sink = pa.OSFile(os.path.join(directory, name), 'wb')
+            writer = ipc.new_stream(sink, self.schemas[table], options=self.options)
+            current = self._open[table] = (writer, sink, date, now)
+            self.files += 1
+            self._expire(table)
+        return current[0]
+
+    def _close_file(self, table):
+        current = self._open.pop(table, None)
+        if current is None:
+            return
+        writer, sink = current[:2]
+        try:
+            writer.close()
+            sink.close()
+        except (OSError, pa.ArrowException):
+            pass
+
+    def _expire(self, table):
+        """Delete date partitions past the retention period"""
+        if self.max_age_days <= 0:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d')
+        root = os.path.join(self.directory, table)
+        for date in os.listdir(root):
+            if date < cutoff:
+                shutil.rmtree(os.path.join(root, date), ignore_errors=True)
+
+
+def open_detection_log():
+    """A DetectionLog, or None (with a warning) if pyarrow is not installed"""
+    if pa is None:
+        print("⚠ DETECTION_LOG_ENABLED needs pyarrow (pip install pyarrow); detection log disabled")
+        return None
+    return DetectionLog()
+
+
+def scan(since=None, until=None, table='detections', gate=None, columns=None, directory=DETECTION_LOG_DIR):
+    """Rows of table captured in [since, until) (epoch seconds), as one pyarrow Table
+
+    Only the date partitions that can hold the range are opened; a file
+    still being written (or cut short by a crash) is read up to its last
+    complete batch.
+    """
+    if pa is None:
+        raise RuntimeError("scan() needs pyarrow (pip install pyarrow)")
+    root = os.path.join(directory, table)
+    # Rows land in the partition of their write time, which trails capture time
+    first = datetime.fromtimestamp(since - 86400).strftime('%Y-%m-%d') if since is not None else ''
+    last = datetime.fromtimestamp(until + 86400).strftime('%Y-%m-%d') if until is not None else '9999'
+
+    batches = []
+    for date in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        if not first <= date <= last:
+            continue
+        for name in sorted(os.listdir(os.path.join(root, date))):
+            if name.endswith(SUFFIX) and (gate is None or name.rsplit('_', 2)[0] == gate):
+                batches.extend(_read_batches(os.path.join(root, date, name)))
+
+    result = pa.Table.from_batches(batches, schema=_schema(table))
+    mask = None
+    for column, compare, value in (('captured_at', pc.greater_equal, since), ('captured_at', pc.less, until),
+                                   ('gate', pc.equal, gate)):
+        if value is not None:
+            if column == 'captured_at':
+                value = pa.scalar(int(value * 1e6), type=result.schema.field(column).type)
+            condition = compare(result[column], value)
+            mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        result = result.filter(mask)
+    return result.select(columns) if columns else result
+
+
+def _read_batches(path):
+    batches = []
+    try:
+        with pa.OSFile(path, 'rb') as source:
+            reader = ipc.open_stream(source)
+            while True:
+                batches.append(reader.read_next_batch())
+    except StopIteration:
+        pass
+    except (OSError, pa.ArrowInvalid):
+        pass  # Empty, or truncated after the last complete batch
+    return batches
+
+
+def hourly(since=None, until=None, gate=None, directory=DETECTION_LOG_DIR):
+    """Published reads per hour and gate: [(hour, gate, reads), ...]"""
+    table = scan(since, until, 'detections', gate, ['captured_at', 'gate'], directory)
+    hours = pc.floor_temporal(pc.local_timestamp(table['captured_at']), unit='hour')
+    counts = pa.table({'hour': hours, 'gate': table['gate']}).group_by(['hour', 'gate']).aggregate([([], 'count_all')])
+    return sorted(zip(counts['hour'].to_pylist(), counts['gate'].to_pylist(), counts['count_all'].to_pylist()))
+
+
+def benchmark(records, directory):
+    """Amortized hot-path and total cost per logged record"""
+    log = DetectionLog(directory, batch_rows=1024, flush_seconds=5, rotate_minutes=60,
+                       compression=DETECTION_LOG_COMPRESSION, max_age_days=0)
+    gray = np.zeros((40, 160), dtype=np.uint8)
+    candidate = {'captured_at': time.time(), 'confidence': 0.87, 'gray': gray, 'trigger_id': None, 'trace_id': 1}
+    started = time.perf_counter()
+    for i in range(records):
+        log.log_ocr(candidate, 'ABC123', 'new' if i % 10 == 0 else 'duplicate')
+    hot = time.perf_counter() - started
+    log.close()
+    total = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(directory) for f in files)
+    return 1e6 * hot / records, 1e6 * total / records, size / records
+
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+def main(argv):
+    option = lambda flag, default=None: argv[argv.index(flag) + 1] if flag in argv else default
+    args = [arg for i, arg in enumerate(argv)
+            if not arg.startswith('--') and (i == 0 or not argv[i - 1].startswith('--'))]
+    if pa is None:
+        print("pyarrow is not installed (pip install pyarrow)")
+        return 1
+
+    if args and args[0] == 'bench':
+        import tempfile
+        records = int(args[1]) if len(args) > 1 else 200000
+        hot_us, total_us, size = benchmark(records, tempfile.mkdtemp())
+        print(f"{records} OCR records: {hot_us:.2f} µs/record on the hot path, "
+              f"{total_us:.2f} µs/record including the writes, {size:.1f} bytes/record on disk")
+        return 0
+
+    if len(args) >= 2 and args[0] in ('scan', 'hourly'):
+        since = _timestamp(args[1])
+        until = _timestamp(args[2]) if len(args) > 2 else None
+        gate = option('--gate')
+        if args[0] == 'hourly':
+            for hour, gate, reads in hourly(since, until, gate):
+                print(f"{hour:%Y-%m-%d %H:00}  {gate}  {reads}")
+            return 0
+        table = scan(since, until, option('--table', 'detections'), gate)
+        for row in table.to_pylist():
+            row['captured_at'] = row['captured_at'].astimezone().isoformat(timespec='milliseconds')
+            print('  '.join('' if value is None else f'{value:.4g}' if isinstance(value, float) else str(value)
+                            for value in row.values()))
+        print(f"{table.num_rows} row(s)")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,12 +3,32 @@ import numpy as np
 import pytesseract
 import re
 from datetime import datetime, timedelta
-from ultralytics import YOLO
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None  # Contour detection only
 import base64
-import os
 
+from char_ocr import CharTemplateOCR
+from dedup_store import SharedDedupStore
+from frame_context import FrameContext, as_context
+from gate_profiles import load_gate_profile
+from mosaic_ocr import MosaicBatcher
+from ocr_server import OCRClient
+from plate_grammar import PlateGrammar
+from remote_ocr import RemoteOCRClient, PlateRecognizerProvider, OCRSpaceProvider
+from snapshot_store import SnapshotStore
+from tracing import get_tracer
 from config import (
+    GATE_IDENTIFIER,
     TESSERACT_CMD,
+    OCR_TARGET_HEIGHT,
+    OCR_ENGINE,
+    TEMPLATE_OCR_MODEL,
+    TEMPLATE_OCR_MIN_CONFIDENCE,
+    OCR_BATCH_MODE,
+    OCR_SERVER,
+    PLATE_GRAMMAR_STRICT,
     CONFIDENCE_THRESHOLD,
     USE_PLATE_RECOGNIZER,
     PLATE_RECOGNIZER_TOKEN,
@@ -16,10 +36,25 @@ from config import (
     USE_OCR_SPACE_FALLBACK,
     YOLO_MODEL,
     DEBUG_MODE,
+    DEDUP_DB,
     SAVE_SNAPSHOTS,
-    SNAPSHOT_DIR
+    SNAPSHOT_JPEG_QUALITY
 )
 
+# Binarizations of the filtered crop handed to Tesseract, tried in order
+THRESHOLD_VARIANTS = [
+    # Method 1: Otsu's thresholding
+    ('otsu', lambda gray: cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+    # Method 2: Adaptive thresholding
+    ('adaptive', lambda gray: cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                                    cv2.THRESH_BINARY, 11, 2)),
+    # Method 3: Simple threshold
+    ('simple', lambda gray: cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]),
+]
+
+# OCR configuration - PSM 7 for single line of text
+TESSERACT_CONFIG = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
 
 class LicensePlateDetector:
     """Handles license plate detection and OCR"""
@@ -30,6 +65,8 @@ class LicensePlateDetector:
         
         # Initialize YOLO model for license plate detection
         try:
+            if YOLO is None:
+                raise ImportError("ultralytics is not installed")
             self.model = YOLO(YOLO_MODEL)
             print(f"✓ YOLO model loaded: {YOLO_MODEL}")
         except Exception as e:
@@ -37,28 +74,92 @@ class LicensePlateDetector:
             print("  Will use basic contour detection as fallback")
             self.model = None
         
-        # Recent detections cache for duplicate filtering
+        # Lane ROIs and plate geometry for this gate
+        self.profile = load_gate_profile()
+        self._scaled_profiles = {}
+        
+        # Fast template recognizer for fixed plate fonts (Tesseract is the fallback)
+        self.char_ocr = None
+        if OCR_ENGINE == 'template':
+            self.char_ocr = CharTemplateOCR.load(TEMPLATE_OCR_MODEL)
+            print(f"✓ Template OCR loaded: {len(self.char_ocr.labels)} templates")
+        
+        # Regional plate formats used to correct, score and reject reads
+        self.grammar = PlateGrammar.from_config()
+        if self.grammar is not None:
+            print(f"✓ Plate formats: {', '.join(self.grammar.formats)}")
+        
+        # Mosaic batching: one Tesseract call for all crops of a frame / window,
+        # in this process or in the worker shared by all camera processes
+        self.mosaic = None
+        if OCR_BATCH_MODE == 'mosaic':
+            self.mosaic = OCRClient() if OCR_SERVER else MosaicBatcher()
+        
+        # Remote OCR backends run asynchronously behind a shared client
+        self.remote_ocr = self._create_remote_ocr()
+        
+        # Read on every call, so the control endpoint can change them between frames
+        self.template_min_confidence = TEMPLATE_OCR_MIN_CONFIDENCE
+        self.grammar_strict = PLATE_GRAMMAR_STRICT
+        self.remote_primary = USE_PLATE_RECOGNIZER and bool(PLATE_RECOGNIZER_TOKEN) and self.remote_ocr is not None
+        self.remote_fallback = self.remote_ocr is not None
+        
+        # OCR steps are traced as children of the caller's span
+        self.tracer = get_tracer()
+        
+        # Recent detections cache for duplicate filtering, shared between
+        # local processes when DEDUP_DB is set
         self.recent_detections = {}
+        self.dedup = SharedDedupStore() if DEDUP_DB else None
         
-        # Create snapshot directory
-        if SAVE_SNAPSHOTS and not os.path.exists(SNAPSHOT_DIR):
-            os.makedirs(SNAPSHOT_DIR)
+        # Date/gate partitioned snapshot files with an index and retention
+        self.snapshots = SnapshotStore() if SAVE_SNAPSHOTS else None
     
-    def detect_plates(self, frame):
-        """Detect license plate regions in the frame using contour detection"""
-        # Use contour-based detection (proven to work with NBC1234)
-        plates = self._detect_plates_contours(frame)
+    def detect_plates(self, frame, scale=None):
+        """Detect license plate regions in the frame using contour detection
+        
+        frame may be a FrameContext or a plain image. scale is the ratio of
+        this frame's width to the source frame's (taken from the context when
+        omitted), so the gate profile defined in source pixels can be mapped
+        onto it.
+        """
+        if isinstance(frame, FrameContext):
+            ctx = frame
+        else:
+            ctx = FrameContext(frame, scale=scale or 1.0)
+        scale = ctx.scale if scale is None else scale
+        
+        profile = self._scaled_profiles.get(scale)
+        if profile is None:
+            profile = self._scaled_profiles[scale] = self.profile.scaled(scale)
+        
+        # Search each lane ROI separately so cost scales with ROI area
+        plates = []
+        for x, y, w, h, mask in profile.regions(ctx.shape):
+            # Use contour-based detection (proven to work with NBC1234)
+            for plate in self._detect_plates_contours(ctx, profile, mask, rect=(x, y, w, h)):
+                px1, py1, px2, py2 = plate['bbox']
+                plate['bbox'] = (px1 + x, py1 + y, px2 + x, py2 + y)
+                plates.append(plate)
+        
         return plates
     
-    def _detect_plates_contours(self, frame):
-        """Fallback method using contour detection"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def _detect_plates_contours(self, frame, profile=None, mask=None, rect=None):
+        """Fallback method using contour detection
         
-        # Apply bilateral filter to reduce noise
-        blur = cv2.bilateralFilter(gray, 11, 17, 17)
+        Returns boxes relative to rect (x, y, w, h) when one is given.
+        """
+        profile = profile or self.profile
         
-        # Edge detection - same as working test_real_plate.py
-        edges = cv2.Canny(blur, 30, 200)
+        # Grayscale, bilateral filter and Canny edges - same as working
+        # test_real_plate.py, memoized on the frame context
+        ctx = as_context(frame)
+        edges = ctx.edges(rect)
+        
+        # Ignore everything outside the lane polygon (the edge map is shared,
+        # so mask into a scratch buffer)
+        if mask is not None:
+            edges = cv2.bitwise_and(edges, mask, dst=ctx.buffer(edges.shape))
         
         # Find contours
         contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
@@ -74,10 +175,9 @@ class LicensePlateDetector:
             # License plates are typically rectangular (exactly 4 corners)
             if len(approx) == 4:
                 x, y, w, h = cv2.boundingRect(approx)
-                aspect_ratio = w / float(h)
                 
-                # Same criteria as test_real_plate.py
-                if 2.0 <= aspect_ratio <= 6.0 and w > 80 and h > 20:
+                # Size and aspect limits come from the gate profile
+                if profile.accepts(w, h):
                     plates.append({
                         'bbox': (x, y, x + w, y + h),
                         'confidence': 0.85  # Good confidence for contour detection
@@ -85,59 +185,170 @@ class LicensePlateDetector:
         
         return plates
     
-    def extract_text(self, plate_image):
-        """Extract text from plate image using OCR"""
-        
+    def _create_remote_ocr(self):
+        """Build the remote OCR client for the configured providers, if any"""
+        providers = []
         if USE_PLATE_RECOGNIZER and PLATE_RECOGNIZER_TOKEN:
-            return self._extract_text_api(plate_image)
-        
-        # Try Tesseract first
-        text = self._extract_text_tesseract(plate_image)
+            providers.append(PlateRecognizerProvider())
+        if USE_OCR_SPACE_FALLBACK and OCR_SPACE_API_KEY:
+            providers.append(OCRSpaceProvider())
         
-        # If Tesseract fails or returns short result, try OCR.space as fallback
-        if USE_OCR_SPACE_FALLBACK and OCR_SPACE_API_KEY and len(text) < 5:
-            ocr_text = self._extract_text_ocrspace(plate_image)
-            if len(ocr_text) > len(text):
-                return ocr_text
+        if not providers:
+            return None
         
-        return text
+        print(f"✓ Remote OCR: {', '.join(p.name for p in providers)}")
+        return RemoteOCRClient(providers)
     
-    def _extract_text_tesseract(self, plate_image):
-        """Extract text using Tesseract OCR"""
-        # Preprocess the image
-        gray = cv2.cvtColor(plate_image, cv2.COLOR_BGR2GRAY)
-        
-        # Resize for better OCR (larger scale)
-        scale_factor = 3
-        width = int(gray.shape[1] * scale_factor)
-        height = int(gray.shape[0] * scale_factor)
-        gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_CUBIC)
-        
-        # Apply bilateral filter to reduce noise while keeping edges
-        filtered = cv2.bilateralFilter(gray, 11, 17, 17)
+    def extract_text(self, plate_image, plate_gray=None, remote_context=None):
+        """Extract text from plate image using OCR
+        
+        plate_gray is the same crop in grayscale (e.g. FrameContext.gray_crop)
+        so local OCR can skip its own color conversion. Remote OCR never
+        blocks: the crop is queued and its read comes back later from
+        poll_remote_text() together with remote_context. A local read that
+        gets a remote fallback is held back until then, so one vehicle is
+        never published twice.
+        """
+        
+        if self.remote_primary and self.remote_ocr is not None:
+            self._submit_remote(plate_image, remote_context)
+            return ""
         
-        # Try multiple thresholding methods
-        results = []
+        # Try local OCR first
+        text = self._extract_text_local(plate_image if plate_gray is None else plate_gray)
         
-        # Method 1: Otsu's thresholding
-        _, thresh1 = cv2.threshold(filtered, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # If no local read fits a plate format, queue OCR.space as fallback
+        if self.remote_ocr is not None and self.remote_fallback and self._needs_remote(text):
+            if self._submit_remote(plate_image, remote_context, text):
+                return ""  # Comes back from poll_remote_text()
         
-        # Method 2: Adaptive thresholding
-        thresh2 = cv2.adaptiveThreshold(filtered, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                         cv2.THRESH_BINARY, 11, 2)
+        return text
+    
+    def _submit_remote(self, plate_image, remote_context, local_text=""):
+        """Queue a remote read, holding back local_text until it answers; False if not accepted"""
+        def held():
+            return (remote_context() if callable(remote_context) else remote_context), local_text
+        
+        accepted = self.remote_ocr.submit(plate_image, held)
+        self.tracer.instant('ocr.remote.submit', accepted=accepted)
+        return accepted
+    
+    def poll_remote_text(self):
+        """Return (remote_context, text, engine) for remote reads that have finished
         
-        # Method 3: Simple threshold
-        _, thresh3 = cv2.threshold(filtered, 150, 255, cv2.THRESH_BINARY)
+        The held-back local read is returned instead (engine 'local') when the
+        remote call failed or its read is no better: it doesn't fit a plate
+        format the local one fits, or is shorter.
+        """
+        if self.remote_ocr is None:
+            return []
         
-        # OCR configuration - PSM 7 for single line of text
-        custom_config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        results = []
+        for (context, local_text), text in self.remote_ocr.poll(include_failed=True):
+            cleaned = self._apply_grammar(self._clean_plate_text(text)) if text else ""
+            if cleaned and self._read_rank(cleaned) >= self._read_rank(local_text):
+                if DEBUG_MODE:
+                    print(f"    🌐 Remote OCR detected: {cleaned}")
+                results.append((context, cleaned, 'remote'))
+            elif local_text:
+                results.append((context, local_text, 'local'))
+        return results
+    
+    def _read_rank(self, text):
+        """Orders reads of one crop: fitting a plate format first, then length"""
+        return (self.grammar is not None and bool(text) and self.grammar.fits(text), len(text))
+    
+    def extract_text_batch(self, items, trace_ids=None, camera=GATE_IDENTIFIER, captured_at=None):
+        """Extract text from several crops; items are (plate_image, plate_gray, remote_context)
+        
+        With OCR_BATCH_MODE=mosaic, every crop the template engine cannot
+        read is recognized in one shared mosaic Tesseract call instead of
+        three Tesseract calls per crop, scheduled among the cameras sharing
+        it (camera, and captured_at per item for stale-crop dropping).
+        trace_ids (one per item) attribute the OCR spans to their
+        candidates when tracing is enabled.
+        """
+        if trace_ids is None:
+            trace_ids = [None] * len(items)
+        
+        if self.mosaic is None or (self.remote_primary and self.remote_ocr is not None):
+            texts = []
+            for item, trace_id in zip(items, trace_ids):
+                with self.tracer.span('ocr', trace_id):
+                    texts.append(self.extract_text(*item))
+            return texts
+        
+        grays = [self._to_gray(image if gray is None else gray) for image, gray, _ in items]
+        texts = []
+        for gray, trace_id in zip(grays, trace_ids):
+            with self.tracer.span('ocr', trace_id):
+                texts.append(self._extract_text_template(gray) if self.char_ocr is not None else "")
+        
+        unread = [i for i, text in enumerate(texts) if not text]
+        if unread:
+            with self.tracer.span('ocr.mosaic', crops=len(unread), trace_ids=[trace_ids[i] for i in unread]):
+                raws = self.mosaic.read([grays[i] for i in unread], camera,
+                                        None if captured_at is None else [captured_at[i] for i in unread])
+            for i, raw in zip(unread, raws):
+                texts[i] = self._apply_grammar(self._clean_plate_text(raw))
+        
+        # Queue remote fallbacks for unusable results, as in extract_text
+        if self.remote_ocr is not None and self.remote_fallback:
+            for i, ((image, _, remote_context), text, trace_id) in enumerate(zip(items, texts, trace_ids)):
+                if self._needs_remote(text):
+                    with self.tracer.span('ocr.remote.encode', trace_id):
+                        if self._submit_remote(image, remote_context, text):
+                            texts[i] = ""  # Held back, as in extract_text
+        
+        return texts
+    
+    @staticmethod
+    def _to_gray(image):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    
+    def _extract_text_local(self, plate_image):
+        """Template OCR when enabled, falling back to Tesseract on low confidence"""
+        if self.char_ocr is not None:
+            text = self._extract_text_template(self._to_gray(plate_image))
+            if text:
+                return text
+        
+        return self._extract_text_tesseract(plate_image)
+    
+    def _extract_text_template(self, gray):
+        """Template OCR; returns "" when any character is below the confidence threshold"""
+        with self.tracer.span('ocr.template'):
+            text, confidences = self.char_ocr.recognize(gray)
+        cleaned = self._clean_plate_text(text)
+        if cleaned and min(confidences) >= self.template_min_confidence:
+            if self.grammar is None:
+                return cleaned
+            return self.grammar.match(cleaned) or ""
+        return ""
+    
+    def _extract_text_tesseract(self, plate_image):
+        """Extract text using Tesseract OCR"""
+        filtered = self._prepare_for_tesseract(plate_image)
         
-        # Try all methods and pick the best result
-        for thresh in [thresh1, thresh2, thresh3]:
-            text = pytesseract.image_to_string(thresh, config=custom_config)
+        # Try multiple thresholding methods, built lazily so a read that
+        # fits a plate format skips the remaining variants
+        results = []
+        for name, threshold in THRESHOLD_VARIANTS:
+            with self.tracer.span(f'ocr.tesseract.{name}'):
+                text = pytesseract.image_to_string(threshold(filtered), config=TESSERACT_CONFIG)
             cleaned = self._clean_plate_text(text)
-            if cleaned:
-                results.append(cleaned)
+            if not cleaned:
+                continue
+            
+            if self.grammar is not None:
+                corrected = self.grammar.match(cleaned)
+                if corrected:
+                    return corrected
+            results.append(cleaned)
+        
+        # Nothing fits a plate format - garbage in strict mode
+        if self.grammar is not None and self.grammar_strict:
+            return ""
         
         # Return the longest valid result
         if results:
@@ -145,95 +356,38 @@ class LicensePlateDetector:
         
         return ""
     
-    def _extract_text_api(self, plate_image):
-        """Extract text using Plate Recognizer API"""
-        import requests
-        
-        # Encode image
-        _, buffer = cv2.imencode('.jpg', plate_image)
-        
-        response = requests.post(
-            'https://api.platerecognizer.com/v1/plate-reader/',
-            headers={'Authorization': f'Token {PLATE_RECOGNIZER_TOKEN}'},
-            files={'upload': buffer.tobytes()}
-        )
+    def _prepare_for_tesseract(self, plate_image):
+        """Grayscale, upscale and denoise a crop for thresholding"""
+        if plate_image.ndim == 2:
+            gray = plate_image
+        else:
+            gray = cv2.cvtColor(plate_image, cv2.COLOR_BGR2GRAY)
+        
+        # Resize for better OCR - full-resolution crops often need little or no upscaling
+        scale_factor = min(3.0, OCR_TARGET_HEIGHT / float(gray.shape[0]))
+        if scale_factor > 1.0:
+            width = int(gray.shape[1] * scale_factor)
+            height = int(gray.shape[0] * scale_factor)
+            gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_CUBIC)
         
-        if response.status_code == 201:
-            result = response.json()
-            if result['results']:
-                return result['results'][0]['plate'].upper()
-        
-        return ""
+        # Apply bilateral filter to reduce noise while keeping edges
+        return cv2.bilateralFilter(gray, 11, 17, 17)
     
-    def _extract_text_ocrspace(self, plate_image):
-        """Extract text using OCR.space API as fallback"""
-        import requests
-        
-        # Encode image to base64
-        _, buffer = cv2.imencode('.jpg', plate_image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        try:
-            response = requests.post(
-                'https://api.ocr.space/parse/image',
-                data={
-                    'apikey': OCR_SPACE_API_KEY,
-                    'base64Image': f'data:image/jpeg;base64,{img_base64}',
-                    'isOverlayRequired': False,
-                    'OCREngine': 2,  # Engine 2 is better for license plates
-                    'scale': True,
-                    'isTable': False
-                },
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('ParsedResults') and len(result['ParsedResults']) > 0:
-                    text = result['ParsedResults'][0].get('ParsedText', '')
-                    cleaned = self._clean_plate_text(text)
-                    if cleaned:
-                        print(f"    🌐 OCR.space detected: {cleaned}")
-                        return cleaned
-        except Exception as e:
-            print(f"    ⚠️ OCR.space API error: {e}")
-        
-        return ""
+    def _apply_grammar(self, text):
+        """Correct text to a plate format; drops non-fitting text in strict mode"""
+        if self.grammar is None or not text:
+            return text
+        
+        corrected = self.grammar.match(text)
+        if corrected:
+            return corrected
+        return "" if self.grammar_strict else text
     
-    def _extract_text_ocrspace(self, plate_image):
-        """Extract text using OCR.space API as fallback"""
-        import requests
-        
-        # Encode image to base64
-        _, buffer = cv2.imencode('.jpg', plate_image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        try:
-            response = requests.post(
-                'https://api.ocr.space/parse/image',
-                data={
-                    'apikey': OCR_SPACE_API_KEY,
-                    'base64Image': f'data:image/jpeg;base64,{img_base64}',
-                    'isOverlayRequired': False,
-                    'OCREngine': 2,  # Engine 2 is better for license plates
-                    'scale': True,
-                    'isTable': False
-                },
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('ParsedResults') and len(result['ParsedResults']) > 0:
-                    text = result['ParsedResults'][0].get('ParsedText', '')
-                    cleaned = self._clean_plate_text(text)
-                    if cleaned:
-                        print(f"    🌐 OCR.space detected: {cleaned}")
-                        return cleaned
-        except Exception as e:
-            print(f"    ⚠️ OCR.space API error: {e}")
-        
-        return ""
+    def _needs_remote(self, text):
+        """Whether a local read is unusable enough to pay for a remote call"""
+        if self.grammar is None:
+            return len(text) < 5
+        return not self.grammar.fits(text)
     
     def _clean_plate_text(self, text):
         """Clean and normalize plate text"""
@@ -248,6 +402,9 @@ class LicensePlateDetector:
     
     def is_duplicate(self, plate_number, window_seconds=60):
         """Check if plate was recently detected"""
+        if self.dedup is not None:
+            return self.dedup.is_duplicate(plate_number, window_seconds)
+        
         if plate_number in self.recent_detections:
             last_time = self.recent_detections[plate_number]
             if datetime.now() - last_time < timedelta(seconds=window_seconds):
@@ -273,9 +430,9 @@ class LicensePlateDetector:
         for plate in to_remove:
             del self.recent_detections[plate]
     
-    def save_snapshot(self, frame, plate_number, bbox):
-        """Save snapshot with detected plate"""
-        if not SAVE_SNAPSHOTS:
+    def save_snapshot(self, frame, plate_number, bbox, captured_at=None, confidence=None):
+        """Save snapshot with detected plate; returns the JPEG bytes (None when disabled)"""
+        if self.snapshots is None:
             return None
         
         # Draw bounding box on frame
@@ -284,14 +441,18 @@ class LicensePlateDetector:
         cv2.putText(frame, plate_number, (x1, y1 - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
         
-        # Save with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{plate_number}_{timestamp}.jpg"
-        filepath = os.path.join(SNAPSHOT_DIR, filename)
+        # Encoded once: the same bytes are stored and uploaded
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, SNAPSHOT_JPEG_QUALITY])
+        if not ok:
+            return None
+        jpeg = buffer.tobytes()
         
-        cv2.imwrite(filepath, frame)
+        try:
+            self.snapshots.save(jpeg, plate_number, captured_at, confidence)
+        except OSError as e:
+            print(f"  ⚠ Snapshot not saved: {e}")
         
-        return filepath
+        return jpeg
     
     def frame_to_base64(self, frame):
         """Convert frame to base64 string"""
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+
+def scale_bbox(bbox, factor, frame_shape):
+    """Map an (x1, y1, x2, y2) box by factor, clipped to a frame of frame_shape"""
+    if factor == 1.0:
+        return bbox
+
+    height, width = frame_shape[:2]
+    x1, y1, x2, y2 = bbox
+    return (
+        max(0, int(x1 * factor)),
+        max(0, int(y1 * factor)),
+        min(width, int(round(x2 * factor))),
+        min(height, int(round(y2 * factor)))
+    )
+
+
+class FrameContext:
+    """One frame plus lazily computed, memoized derived images
+
+    Every pipeline stage that needs grayscale, a downscaled copy, the blurred
+    image or the edge map asks the context, so each conversion happens at
+    most once per frame. Crops are returned as NumPy views, not copies.
+    Derived images are shared - treat them as read-only.
+
+    With a FramePool every derived image is written into a pooled buffer and
+    release() hands them (and the frame itself) back, so views taken from the
+    context must not be used after release().
+    """
+
+    def __init__(self, frame, parent=None, scale=1.0, pool=None):
+        self.frame = frame
+        self.parent = parent
+        self.scale = scale  # Width of this frame relative to the source frame
+        self.pool = pool
+        self._buffers = []
+        self._gray = None
+        self._working = {}
+        self._blurred = {}
+        self._edges = {}
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    @property
+    def source(self):
+        """The full-resolution context this one was derived from"""
+        return self.parent.source if self.parent is not None else self
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY, dst=self.buffer(self.frame.shape[:2]))
+        return self._gray
+
+    def buffer(self, shape, dtype=np.uint8):
+        """Scratch array that lives until release(), pooled when possible"""
+        if self.pool is None:
+            return np.empty(shape, dtype=dtype)
+        buffer = self.pool.acquire(shape, dtype)
+        self._buffers.append(buffer)
+        return buffer
+
+    def release(self, release_frame=True):
+        """Hand the frame and all derived buffers back to the pool"""
+        for ctx in self._working.values():
+            ctx.release(release_frame=False)  # Working frames are our own buffers
+        self._working.clear()
+        self._gray = None
+        self._blurred.clear()
+        self._edges.clear()
+
+        if self.pool is not None:
+            for buffer in self._buffers:
+                self.pool.release(buffer)
+            if release_frame:
+                self.pool.release(self.frame)
+        self._buffers = []
+
+    def working(self, width):
+        """Return a context for this frame downscaled to at most width pixels"""
+        if self.frame.shape[1] <= width:
+            return self
+
+        ctx = self._working.get(width)
+        if ctx is None:
+            height, source_width = self.frame.shape[:2]
+            factor = width / source_width
+            size = (width, int(round(height * factor)))
+            small = cv2.resize(self.frame, size, dst=self.buffer((size[1], size[0]) + self.frame.shape[2:]))
+            ctx = self._working[width] = FrameContext(small, parent=self, scale=self.scale * factor, pool=self.pool)
+        return ctx
+
+    def blurred(self, rect=None):
+        """Bilateral-filtered grayscale of rect (x, y, w, h), or the whole frame"""
+        blurred = self._blurred.get(rect)
+        if blurred is None:
+            gray = self._region(self.gray, rect)
+            blurred = self._blurred[rect] = cv2.bilateralFilter(gray, 11, 17, 17, dst=self.buffer(gray.shape))
+        return blurred
+
+    def edges(self, rect=None):
+        """Canny edge map of blurred(rect)"""
+        edges = self._edges.get(rect)
+        if edges is None:
+            blurred = self.blurred(rect)
+            edges = self._edges[rect] = cv2.Canny(blurred, 30, 200, edges=self.buffer(blurred.shape))
+        return edges
+
+    def crop(self, bbox):
+        """View of the color frame inside an (x1, y1, x2, y2) box"""
+        x1, y1, x2, y2 = bbox
+        return self.frame[y1:y2, x1:x2]
+
+    def gray_crop(self, bbox):
+        """View of the grayscale frame inside an (x1, y1, x2, y2) box"""
+        x1, y1, x2, y2 = bbox
+        return self.gray[y1:y2, x1:x2]
+
+    def to_source(self, bbox):
+        """Map a box in this frame's coordinates to the source frame"""
+        return scale_bbox(bbox, 1.0 / self.scale, self.source.shape)
+
+    @staticmethod
+    def _region(image, rect):
+        if rect is None:
+            return image
+        x, y, w, h = rect
+        return image[y:y + h, x:x + w]
+
+
+def as_context(frame):
+    """Wrap a plain frame in a FrameContext; contexts pass through unchanged"""
+    return frame if isinstance(frame, FrameContext) else FrameContext(frame)
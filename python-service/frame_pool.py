@@ -0,0 +1,77 @@
+import os
+import threading
+
+import numpy as np
+
+from config import FRAME_POOL_SIZE
+
+
+class FramePool:
+    """Fixed-size pools of preallocated image buffers, one pool per shape
+
+    Capture reads, resizes and derived images are written into buffers from
+    here and handed back with release() once the frame is done, so in steady
+    state no frame-sized arrays are allocated. When a pool runs dry a fresh
+    buffer is allocated rather than blocking capture; those show up in
+    stats() as allocations beyond the warm-up.
+    """
+
+    def __init__(self, size=FRAME_POOL_SIZE):
+        self.size = size
+        self._free = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Return a buffer of the given shape (contents are undefined)"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer):
+        """Return a buffer to its pool; extra buffers are dropped"""
+        if buffer is None or buffer.base is not None:
+            return  # Views are never pooled
+
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.size and not any(b is buffer for b in free):
+                free.append(buffer)
+
+    def stats(self):
+        """Allocation counters and the number of idle buffers"""
+        with self._lock:
+            idle = sum(len(free) for free in self._free.values())
+            idle_bytes = sum(b.nbytes for free in self._free.values() for b in free)
+        return {
+            'allocations': self.allocations,
+            'reuses': self.reuses,
+            'idle': idle,
+            'idle_mb': idle_bytes / (1024 * 1024),
+        }
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (peak RSS off Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KB elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return 0.0
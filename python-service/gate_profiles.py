@@ -0,0 +1,130 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from config import (
+    GATE_IDENTIFIER,
+    GATE_PROFILES_FILE,
+    PLATE_MIN_WIDTH,
+    PLATE_MIN_HEIGHT,
+    PLATE_MIN_ASPECT,
+    PLATE_MAX_ASPECT
+)
+
+
+SETTINGS = ('rois', 'min_width', 'min_height', 'max_width', 'max_height', 'min_aspect', 'max_aspect')
+
+
+class GateProfile:
+    """Lane regions of interest and expected plate geometry for one gate
+
+    All coordinates and sizes are in source-frame pixels. Use scaled() to get
+    the equivalent profile for a resized working frame. The exception is a
+    minimum size left at None: the global PLATE_MIN_WIDTH/HEIGHT defaults
+    then apply as before, in working-frame pixels, at any scale.
+    """
+
+    def __init__(self, name, rois=None, min_width=None, min_height=None,
+                 max_width=None, max_height=None, min_aspect=PLATE_MIN_ASPECT,
+                 max_aspect=PLATE_MAX_ASPECT):
+        self.name = name
+        self.rois = [np.asarray(roi, dtype=np.int32).reshape(-1, 2) for roi in (rois or [])]
+        self.min_width = min_width
+        self.min_height = min_height
+        self.max_width = max_width
+        self.max_height = max_height
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+
+        # Per-frame-shape cache of (x, y, w, h, mask) tuples
+        self._regions = {}
+
+    def accepts(self, w, h):
+        """Check if a candidate box has plate-like size and aspect ratio"""
+        min_width = PLATE_MIN_WIDTH if self.min_width is None else self.min_width
+        min_height = PLATE_MIN_HEIGHT if self.min_height is None else self.min_height
+        if w <= min_width or h <= min_height:
+            return False
+        if self.max_width is not None and w > self.max_width:
+            return False
+        if self.max_height is not None and h > self.max_height:
+            return False
+        return self.min_aspect <= w / float(h) <= self.max_aspect
+
+    def scaled(self, factor):
+        """Return this profile with all geometry multiplied by factor"""
+        if factor == 1.0:
+            return self
+
+        def scale(value):
+            return None if value is None else value * factor
+
+        return GateProfile(
+            self.name,
+            rois=[np.round(roi * factor).astype(np.int32) for roi in self.rois],
+            min_width=scale(self.min_width),
+            min_height=scale(self.min_height),
+            max_width=scale(self.max_width),
+            max_height=scale(self.max_height),
+            min_aspect=self.min_aspect,
+            max_aspect=self.max_aspect
+        )
+
+    def regions(self, frame_shape):
+        """Return (x, y, w, h, mask) crops to search for a frame of this shape
+
+        Without ROIs the whole frame is returned with no mask. Otherwise each
+        ROI is clipped to its bounding box and paired with a polygon mask of
+        the same size, so the search never touches pixels outside the lanes.
+        """
+        key = frame_shape[:2]
+        if key not in self._regions:
+            self._regions[key] = self._build_regions(*key)
+        return self._regions[key]
+
+    def _build_regions(self, frame_height, frame_width):
+        if not self.rois:
+            return [(0, 0, frame_width, frame_height, None)]
+
+        regions = []
+        for roi in self.rois:
+            x, y, w, h = cv2.boundingRect(roi)
+            x1, y1 = max(x, 0), max(y, 0)
+            x2, y2 = min(x + w, frame_width), min(y + h, frame_height)
+            if x2 <= x1 or y2 <= y1:
+                continue
+
+            mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(mask, [roi - (x1, y1)], 255)
+            regions.append((x1, y1, x2 - x1, y2 - y1, mask))
+
+        return regions
+
+
+def load_gate_profile(gate_id=GATE_IDENTIFIER, path=GATE_PROFILES_FILE):
+    """Load the profile for gate_id from the JSON profiles file
+
+    The file maps gate identifiers to profile settings, e.g.
+    {"gate_01": {"rois": [[[0, 300], [1280, 300], [1280, 720], [0, 720]]],
+                 "min_width": 120, "max_width": 500}}
+    Gates without an entry get the defaults from config.
+    """
+    if not path or not os.path.exists(path):
+        return GateProfile(gate_id)
+
+    with open(path) as f:
+        profiles = json.load(f)
+
+    settings = profiles.get(gate_id)
+    if settings is None:
+        return GateProfile(gate_id)
+
+    unknown = sorted(set(settings) - set(SETTINGS))
+    if unknown:
+        raise ValueError(f"Unknown setting(s) {', '.join(unknown)} for gate '{gate_id}' in {path} "
+                         f"(expected: {', '.join(SETTINGS)})")
+    profile = GateProfile(gate_id, **settings)
+    print(f"✓ Gate profile loaded: {gate_id} ({len(profile.rois)} ROI(s))")
+    return profile
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Multi-camera load test
+
+Runs N virtual cameras, each in its own process with its own detector,
+feeding the real detection pipeline (detect -> crop -> quality gate -> OCR)
+at the camera's native frame rate. N is ramped up and for every step the
+processed fps, drop rate, capture-to-result latency percentiles, CPU cores
+used and RSS are reported. The first step where frames start dropping or
+latency jumps is marked as the knee of the scaling curve.
+
+Usage:
+    python load_test.py --source synthetic --cameras 1,2,4,8
+    python load_test.py --source clip.mp4 --fps 25 --duration 30 --out results.json
+
+Remote OCR and the API are not used; snapshots are not written.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from config import RESIZE_WIDTH, QUALITY_GATE_ENABLED, SYNTH_FPS, CPU_THREADS
+
+# A step is past the knee when it drops more frames than this, or its p95
+# latency grows beyond this factor of the single-camera p95
+KNEE_DROP_RATE = 0.05
+KNEE_LATENCY_FACTOR = 2.0
+
+STARTUP_TIMEOUT = 120  # Seconds a camera process may take to load its detector
+
+
+def load_clip(source, fps, seconds, seed):
+    """Encoded frames of a short loop: from a video file or a synthetic stream"""
+    if source == 'synthetic':
+        from synthetic import SceneGenerator, SyntheticTraffic
+        traffic = SyntheticTraffic(SceneGenerator(seed=seed), fps=fps, vehicles_per_minute=30)
+        frames = (traffic.frame()[0] for _ in range(int(seconds * fps)))
+    else:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"Cannot open video: {source}")
+        frames = []
+        while len(frames) < seconds * fps:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    # Kept as JPEG so N cameras fit in memory; decoding per frame is part
+    # of what a real camera costs anyway
+    clip = [cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for frame in frames]
+    if not clip:
+        raise ValueError(f"No frames in {source}")
+    return clip
+
+
+class VirtualCamera:
+    """Decodes a looped clip at a fixed frame rate into a one-frame slot
+
+    Like a live camera it does not wait for the consumer: a frame that is
+    still in the slot when the next one arrives is dropped.
+    """
+
+    def __init__(self, clip, fps):
+        self.clip = clip
+        self.fps = fps
+        self.produced = 0
+        self.dropped = 0
+        self._slot = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        started = time.monotonic()
+        while not self._stop.is_set():
+            delay = started + self.produced / self.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            jpeg = self.clip[self.produced % len(self.clip)]
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            with self._cond:
+                if self._slot is not None:
+                    self.dropped += 1
+                self._slot = (frame, time.monotonic())
+                self.produced += 1
+                self._cond.notify()
+
+    def get_frame(self, timeout=1.0):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._slot is not None, timeout=timeout):
+                return None, None
+            frame, captured = self._slot
+            self._slot = None
+        return frame, captured
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def process_frame(detector, quality_gate, frame):
+    """The detection pipeline of main.process_video_stream, without publishing"""
+    from frame_context import FrameContext
+    from quality import score_crop
+
+    ctx = FrameContext(frame)
+    work = ctx.working(RESIZE_WIDTH)
+    items = []
+    for plate in detector.detect_plates(work):
+        bbox = work.to_source(plate['bbox'])
+        image = ctx.crop(bbox)
+        if image.size == 0:
+            continue
+        gray = ctx.gray_crop(bbox)
+        if quality_gate is not None and quality_gate.check(score_crop(gray)):
+            continue
+        items.append((image, gray, None))
+    texts = detector.extract_text_batch(items) if items else []
+    ctx.release()
+    return texts
+
+
+def camera_worker(index, clip, fps, warmup, duration, threads, results, ready, start):
+    """One virtual camera and its pipeline, in its own process
+
+    A failure is put on the queue run_step is waiting on (ready while the
+    detector loads, results after) with its traceback, so the step fails
+    instead of waiting for a camera that is gone.
+    """
+    waiting_on = ready
+    try:
+        detector, quality_gate = _load_pipeline(threads)
+        ready.put(index)
+        waiting_on = results
+        start.wait()
+        results.put(_run_camera(index, clip, fps, warmup, duration, detector, quality_gate))
+    except BaseException:
+        waiting_on.put({'camera': index, 'error': traceback.format_exc()})
+
+
+def _load_pipeline(threads):
+    from detector import LicensePlateDetector
+    from quality import QualityGate
+    from thread_budget import apply as apply_thread_budget
+
+    # Several cameras share the box, so no per-role pinning here
+    apply_thread_budget(threads=threads, affinity='')
+
+    detector = LicensePlateDetector()
+    if detector.remote_ocr is not None:
+        detector.remote_ocr.close()
+        detector.remote_ocr = None
+    if detector.snapshots is not None:
+        detector.snapshots.close()
+        detector.snapshots = None
+    quality_gate = QualityGate() if QUALITY_GATE_ENABLED else None
+    return detector, quality_gate
+
+
+def _run_camera(index, clip, fps, warmup, duration, detector, quality_gate):
+    from frame_pool import rss_mb
+
+    camera = VirtualCamera(clip, fps)
+    measure_from = time.monotonic() + warmup
+    measure_until = measure_from + duration
+    latencies = []
+    processed = reads = 0
+    produced_at_start = dropped_at_start = 0
+    cpu_at_start = None
+
+    while time.monotonic() < measure_until:
+        frame, captured = camera.get_frame()
+        if frame is None:
+            continue
+        texts = process_frame(detector, quality_gate, frame)
+
+        if captured < measure_from:
+            continue
+        if cpu_at_start is None:
+            cpu_at_start = time.process_time()
+            produced_at_start, dropped_at_start = camera.produced - 1, camera.dropped
+        latencies.append(time.monotonic() - captured)
+        processed += 1
+        reads += sum(1 for text in texts if text)
+
+    camera.stop()
+    return {
+        'camera': index,
+        'produced': camera.produced - produced_at_start,
+        'dropped': camera.dropped - dropped_at_start,
+        'processed': processed,
+        'reads': reads,
+        'latencies': latencies,
+        'cpu_seconds': time.process_time() - (cpu_at_start or time.process_time()),
+        'rss_mb': rss_mb(),
+    }
+
+
+def _collect(channel, workers, timeout):
+    """One message per worker from channel; raises if a worker fails or dies"""
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < len(workers):
+        try:
+            message = channel.get(timeout=1.0)
+        except queue.Empty:
+            dead = [w for w in workers if not w.is_alive() and w.exitcode != 0]
+            if dead:
+                raise RuntimeError(f"Camera process exited with code {dead[0].exitcode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out after {timeout:g}s waiting for the camera processes")
+            continue
+        if isinstance(message, dict) and 'error' in message:
+            raise RuntimeError(f"Camera {message['camera']} failed:\n{message['error']}")
+        messages.append(message)
+    return messages
+
+
+def run_step(cameras, clips, fps, warmup, duration, threads=0):
+    """Run `cameras` virtual cameras together; returns aggregated stats"""
+    ctx = mp.get_context('spawn')
+    results, ready, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+    workers = [ctx.Process(target=camera_worker, daemon=True,
+                           args=(i, clips[i % len(clips)], fps, warmup, duration, threads, results, ready, start))
+               for i in range(cameras)]
+    for worker in workers:
+        worker.start()
+    try:
+        _collect(ready, workers, STARTUP_TIMEOUT)  # Every detector is loaded before the clock starts
+        start.set()
+        stats = _collect(results, workers, warmup + duration + STARTUP_TIMEOUT)
+    except BaseException:
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    latencies = np.array([l for s in stats for l in s['latencies']]) * 1000.0
+    produced = sum(s['produced'] for s in stats)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies.size else (float('nan'),) * 3
+    return {
+        'cameras': cameras,
+        'offered_fps': cameras * fps,
+        'processed_fps': sum(s['processed'] for s in stats) / duration,
+        'drop_rate': sum(s['dropped'] for s in stats) / max(produced, 1),
+        'latency_p50_ms': float(p50),
+        'latency_p95_ms': float(p95),
+        'latency_p99_ms': float(p99),
+        'cpu_cores': sum(s['cpu_seconds'] for s in stats) / duration,
+        'rss_mb': sum(s['rss_mb'] for s in stats),
+        'reads': sum(s['reads'] for s in stats),
+    }
+
+
+def find_knee(steps):
+    """Index of the first step past the knee, or None"""
+    if not steps:
+        return None
+    base_p95 = steps[0]['latency_p95_ms']
+    for i, step in enumerate(steps):
+        if step['drop_rate'] > KNEE_DROP_RATE or step['latency_p95_ms'] > KNEE_LATENCY_FACTOR * base_p95:
+            return i
+    return None
+
+
+def print_report(steps, knee):
+    print("\n" + "="*96)
+    print(f"{'cams':>4} {'offered':>8} {'processed':>10} {'drops':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'CPU cores':>10} {'RSS MB':>8}")
+    print("-"*96)
+    for i, step in enumerate(steps):
+        marker = "  ◀ knee" if i == knee else ""
+        print(f"{step['cameras']:>4} {step['offered_fps']:>8.1f} {step['processed_fps']:>10.1f} "
+              f"{100 * step['drop_rate']:>6.1f}% {step['latency_p50_ms']:>8.1f} {step['latency_p95_ms']:>8.1f} "
+              f"{step['latency_p99_ms']:>8.1f} {step['cpu_cores']:>10.2f} {step['rss_mb']:>8.0f}{marker}")
+    print("="*96)
+    if knee is None:
+        print(f"No knee up to {steps[-1]['cameras']} cameras on {os.cpu_count()} CPUs")
+    elif knee == 0:
+        print("Even one camera can't keep up at this frame rate")
+    else:
+        print(f"Capacity: {steps[knee - 1]['cameras']} camera(s) on {os.cpu_count()} CPUs "
+              f"(drops or latency blow up at {steps[knee]['cameras']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-camera load test')
+    parser.add_argument('--source', default='synthetic', help="'synthetic' or a video file to loop")
+    parser.add_argument('--cameras', default=None,
+                        help='Comma-separated camera counts (default: 1, 2, 4, ... up to 2x CPUs)')
+    parser.add_argument('--fps', type=float, default=SYNTH_FPS, help='Native frame rate of each camera')
+    parser.add_argument('--clip-seconds', type=float, default=4, help='Length of the looped clip')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds discarded at the start of a step')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per step')
+    parser.add_argument('--threads', type=int, default=CPU_THREADS,
+                        help='Library threads per camera process (0 = every core, the default free-for-all)')
+    parser.add_argument('--stop-at-knee', action='store_true', help='Stop ramping once past the knee')
+    parser.add_argument('--out', help='Write the results as JSON')
+    args = parser.parse_args()
+
+    if args.cameras:
+        counts = [int(n) for n in args.cameras.split(',')]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= 2 * (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+
+    # Synthetic cameras each get their own traffic; a file is shared by all
+    print(f"🎬 Preparing clip(s): {args.source}, {args.clip_seconds:g}s @ {args.fps:g} fps")
+    clips = [load_clip(args.source, args.fps, args.clip_seconds, seed)
+             for seed in range(min(max(counts), 4) if args.source == 'synthetic' else 1)]
+
+    steps = []
+    for cameras in counts:
+        print(f"▶ {cameras} camera(s): {args.warmup:g}s warm-up + {args.duration:g}s measured")
+        try:
+            steps.append(run_step(cameras, clips, args.fps, args.warmup, args.duration, args.threads))
+        except RuntimeError as e:
+            print(f"✗ Step failed: {e}")
+            break
+        step = steps[-1]
+        print(f"  {step['processed_fps']:.1f}/{step['offered_fps']:.1f} fps, "
+              f"{100 * step['drop_rate']:.1f}% dropped, p95 {step['latency_p95_ms']:.0f} ms")
+        if args.stop_at_knee and find_knee(steps) is not None:
+            break
+
+    if not steps:
+        raise SystemExit(1)
+    knee = find_knee(steps)
+    print_report(steps, knee)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'source': args.source, 'fps': args.fps, 'cpus': os.cpu_count(), 'threads': args.threads,
+                       'knee_cameras': steps[knee]['cameras'] if knee is not None else None,
+                       'steps': steps}, f, indent=2)
+        print(f"Results saved: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,21 +7,49 @@ detects license plates, performs OCR, and sends results to the backend API.
 """
 
 import cv2
+import numpy as np
 import argparse
+import base64
+import os
 import time
 import requests
 from datetime import datetime
 
 from camera_sources import get_camera_source
+from camera_supervisor import CameraSupervisor
+from control_server import ControlServer, RuntimeSettings
+from detection_log import open_detection_log
+from frame_context import FrameContext
+from frame_pool import FramePool, rss_mb
+from preview_server import PreviewServer
+from profiling import Profiler
+from stream_recorder import StreamRecorder
+from thread_budget import apply as apply_thread_budget, cpu_role
+from trigger_input import TriggerInput
+from quality import QualityGate, BestCropBuffer, score_crop
 from detector import LicensePlateDetector
+from tracing import get_tracer
+from watchlist import PlateListMatcher
 from config import (
     API_URL,
     GATE_IDENTIFIER,
     DUPLICATE_WINDOW_SECONDS,
     FRAME_SKIP,
-    RESIZE_WIDTH,
+    TRIGGER_ENABLED,
     DEBUG_MODE,
-    SHOW_VIDEO_WINDOW
+    SHOW_VIDEO_WINDOW,
+    FRAME_POOL_SIZE,
+    MEMORY_REPORT_INTERVAL,
+    CAMERA_SUPERVISOR,
+    RECORD_ENABLED,
+    DETECTION_LOG_ENABLED,
+    CONTROL_ENABLED,
+    PREVIEW_ENABLED,
+    QUALITY_GATE_ENABLED,
+    QUALITY_BEST_OF,
+    QUALITY_STATS_FILE,
+    WATCHLIST_FILE,
+    ALLOWLIST_FILE
 )
 
 
@@ -42,7 +70,100 @@ def send_to_api(plate_data):
         return False
 
 
-def process_video_stream(camera_source, detector):
+def report_memory(pool, frame_count):
+    """Print buffer pool allocations and process RSS"""
+    if pool is None:
+        print(f"Memory: RSS {rss_mb():.1f} MB (buffer pool disabled)")
+        return
+    
+    stats = pool.stats()
+    per_frame = stats['allocations'] / frame_count if frame_count else 0.0
+    print(f"Memory: RSS {rss_mb():.1f} MB | buffer allocations {stats['allocations']} "
+          f"({per_frame:.3f}/frame) | reuses {stats['reuses']} | "
+          f"idle {stats['idle']} ({stats['idle_mb']:.1f} MB)")
+
+
+def report_quality(quality_gate):
+    """Print crop quality score distributions (and save them if configured)"""
+    stats = quality_gate.stats()
+    print(f"Crop quality: {stats['passed']} passed | rejected {stats['rejected']}")
+    for metric in ('sharpness', 'contrast', 'saturation'):
+        if metric in stats:
+            p = stats[metric]
+            print(f"  {metric}: p5 {p['p5']} | p50 {p['p50']} | p95 {p['p95']}")
+    
+    if QUALITY_STATS_FILE:
+        quality_gate.dump(QUALITY_STATS_FILE)
+        print(f"  Score distributions saved: {QUALITY_STATS_FILE}")
+
+
+def print_trigger(trigger):
+    """Print a vehicle-presence trigger"""
+    print(f"  🚦 Trigger {trigger['id']} ({trigger['source']})")
+
+
+def print_list_match(event):
+    """Print a watchlist / allowlist match event"""
+    icon = '🚨' if event['list'] == 'watchlist' else '✅'
+    label = f" ({event['label']})" if event['label'] else ''
+    print(f"  {icon} {event['list'].capitalize()} match: {event['plate']}{label} [{event['match']}]")
+
+
+def detach_candidate(candidate):
+    """Copy a candidate's images out of the pooled frame so it can outlive it"""
+    return {
+        'index': None,
+        'image': candidate['image'].copy(),
+        'gray': candidate['gray'].copy(),
+        'bbox': candidate['bbox'],
+        'confidence': candidate['confidence'],
+        'frame': candidate['frame'].copy(),
+        'captured_at': candidate['captured_at'],
+        'trace_id': candidate['trace_id'],
+        'trigger_id': candidate['trigger_id'],
+    }
+
+
+def publish_detection(detector, plate_text, candidate, snapshot, number, detection_log=None):
+    """Save a snapshot of a new plate read and send it to the API"""
+    tracer = get_tracer()
+    trace_id = candidate['trace_id']
+    confidence = candidate['confidence']
+    trigger = f" [trigger {candidate['trigger_id']}]" if candidate['trigger_id'] else ""
+    print(f"\n[{number}] 🚗 Detected: {plate_text} (confidence: {confidence:.2f}){trigger}")
+    
+    # Save snapshot
+    with tracer.span('snapshot', trace_id):
+        snapshot_jpeg = detector.save_snapshot(snapshot, plate_text, candidate['bbox'],
+                                               candidate['captured_at'], float(confidence))
+    
+    # Prepare data for API (timestamped when the camera delivered the frame)
+    plate_data = {
+        'plateNumber': plate_text,
+        'gateId': GATE_IDENTIFIER,
+        'confidence': float(confidence),
+        'timestamp': datetime.fromtimestamp(candidate['captured_at']).isoformat(),
+    }
+    
+    if candidate['trigger_id']:
+        plate_data['triggerId'] = candidate['trigger_id']
+    
+    # Add image if snapshot was saved
+    if snapshot_jpeg:
+        plate_data['image'] = base64.b64encode(snapshot_jpeg).decode('utf-8')
+    
+    # Send to API
+    with tracer.span('upload', trace_id):
+        sent = send_to_api(plate_data)
+    
+    # One track per plate: frame capture to API ack
+    answered_at = time.time()
+    tracer.add_flow(f"plate {plate_text}", candidate['captured_at'], answered_at, trace_id, sent=sent)
+    if detection_log is not None:
+        detection_log.log_detection(candidate, plate_text, sent, answered_at)
+
+
+def process_video_stream(camera_source, detector, recorder=None, preview=None, profiler=None):
     """Main video processing loop"""
     
     print("\n" + "="*60)
@@ -57,82 +178,207 @@ def process_video_stream(camera_source, detector):
     
     frame_count = 0
     detection_count = 0
+    tracer = get_tracer()
+    
+    # Crop quality gate and best-of-N buffering ahead of OCR
+    quality_gate = QualityGate() if QUALITY_GATE_ENABLED else None
+    best_crops = BestCropBuffer() if quality_gate is not None and QUALITY_BEST_OF > 1 else None
+    
+    # Gate decisions from local lists, without a backend round trip
+    list_matcher = None
+    if WATCHLIST_FILE or ALLOWLIST_FILE:
+        list_matcher = PlateListMatcher()
+        list_matcher.listeners.append(print_list_match)
+    
+    # Loop / beam triggers switch between idle and burst processing
+    trigger = None
+    if TRIGGER_ENABLED:
+        trigger = TriggerInput()
+        trigger.listeners.append(print_trigger)
+    supervised = isinstance(camera_source, CameraSupervisor)
+    
+    # Columnar history of reads and OCR outcomes for offline analysis
+    detection_log = open_detection_log() if DETECTION_LOG_ENABLED else None
+    
+    # Tunables the frame loop reads live; the control endpoint changes them
+    settings = RuntimeSettings(detector, quality_gate)
+    control = ControlServer(settings, profiler) if CONTROL_ENABLED else None
     
     try:
         while camera_source.is_opened():
+            # Changes from the control endpoint take effect here, between frames
+            if settings.pending:
+                settings.apply(frame_count)
+            tuning = settings.values
+            
+            # Between triggers only drain the stream, apart from an
+            # occasional safety-net frame
+            trigger_id = None
+            if trigger is not None:
+                active = trigger.active
+                if active is None and not trigger.idle_frame_due():
+                    if supervised:
+                        camera_source.idle = True
+                        trigger.wait(min(1.0, trigger.seconds_to_idle_frame()))
+                    elif not camera_source.skip_frame():
+                        print("⚠ Failed to grab frame, retrying...")
+                        time.sleep(1)
+                    continue
+                if supervised:
+                    camera_source.idle = False
+                trigger_id = active['id'] if active else None
+            
             frame = camera_source.get_frame()
             
             if frame is None:
-                print("⚠ Failed to grab frame, retrying...")
-                time.sleep(1)
+                # A supervised camera reconnects in the background and has already waited
+                if not supervised:
+                    print("⚠ Failed to grab frame, retrying...")
+                    time.sleep(1)
                 continue
             
             frame_count += 1
             
-            # Process every Nth frame
-            if frame_count % FRAME_SKIP != 0:
+            # Tee every frame the pipeline sees, so incidents can be replayed
+            if recorder is not None:
+                recorder.write(frame, camera_source.captured_at)
+            
+            # Process every Nth frame (idle safety-net frames always)
+            frame_skip = tuning['FRAME_SKIP']
+            if trigger is not None:
+                frame_skip = tuning['TRIGGER_BURST_FRAME_SKIP'] if trigger_id else 1
+            if frame_count % frame_skip != 0:
+                camera_source.release_frame(frame)
                 continue
             
-            # Resize frame for faster processing
-            height, width = frame.shape[:2]
-            if width > RESIZE_WIDTH:
-                scale = RESIZE_WIDTH / width
-                frame = cv2.resize(frame, None, fx=scale, fy=scale)
+            # Frames and candidates each get a trace id (None when tracing is off)
+            captured_at = camera_source.captured_at or time.time()
+            frame_id = tracer.new_id()
+            frame_started = time.time()
+            if camera_source.read_started_at is not None:
+                tracer.add_span('capture', camera_source.read_started_at, captured_at, frame_id)
             
-            # Detect license plates
-            plates = detector.detect_plates(frame)
+            # Detect on a downscaled working frame, but keep the source frame
+            # so OCR gets native-resolution crops. Derived images (gray,
+            # edges, ...) are computed at most once per frame by the context.
+            ctx = FrameContext(frame, pool=camera_source.pool)
+            with cpu_role('detect'):
+                work = ctx.working(tuning['RESIZE_WIDTH'])
+                frame = work.frame
+                
+                # Detect license plates
+                with tracer.span('detect', frame_id, frame=frame_count):
+                    plates = detector.detect_plates(work)
+            plate_texts = [""] * len(plates)
+            candidates = []
             
-            if plates:
-                plate_texts = []
+            for i, plate in enumerate(plates):
+                # Extract plate region from the full-resolution frame
+                source_bbox = work.to_source(plate['bbox'])
+                plate_img = ctx.crop(source_bbox)
                 
-                for plate in plates:
-                    x1, y1, x2, y2 = plate['bbox']
-                    confidence = plate['confidence']
-                    
-                    # Extract plate region
-                    plate_img = frame[y1:y2, x1:x2]
-                    
-                    if plate_img.size == 0:
+                if plate_img.size == 0:
+                    continue
+                
+                candidate = {
+                    'index': i,
+                    'image': plate_img,
+                    'gray': ctx.gray_crop(source_bbox),
+                    'bbox': plate['bbox'],
+                    'confidence': plate['confidence'],
+                    'frame': frame,
+                    'captured_at': captured_at,
+                    'trace_id': tracer.new_id(),
+                    'trigger_id': trigger_id,
+                }
+                
+                # Skip blurred / blown-out crops that can never produce a valid read
+                if quality_gate is not None:
+                    with tracer.span('quality', candidate['trace_id'], frame_trace_id=frame_id):
+                        quality = score_crop(candidate['gray'])
+                        reason = quality_gate.check(quality)
+                    if reason:
+                        if DEBUG_MODE:
+                            print(f"  ⊘ Low quality crop ({reason}): sharpness {quality.sharpness:.0f}, "
+                                  f"contrast {quality.contrast:.0f}, saturation {quality.saturation:.2f}")
                         continue
                     
-                    # Perform OCR
-                    plate_text = detector.extract_text(plate_img)
-                    plate_texts.append(plate_text)
-                    
-                    if plate_text:
-                        # Check for duplicates
-                        if detector.is_duplicate(plate_text, DUPLICATE_WINDOW_SECONDS):
-                            if DEBUG_MODE:
-                                print(f"  ⊘ Duplicate: {plate_text} (skipped)")
+                    # Optionally wait for a few crops of this plate and OCR the sharpest
+                    if best_crops is not None:
+                        candidate = best_crops.add(frame_count, source_bbox, quality,
+                                                   lambda c=candidate: detach_candidate(c))
+                        if candidate is None:
                             continue
-                        
-                        # New detection
-                        detection_count += 1
-                        print(f"\n[{detection_count}] 🚗 Detected: {plate_text} (confidence: {confidence:.2f})")
-                        
-                        # Save snapshot
-                        snapshot_path = detector.save_snapshot(frame.copy(), plate_text, plate['bbox'])
-                        
-                        # Prepare data for API
-                        plate_data = {
-                            'plateNumber': plate_text,
-                            'gateId': GATE_IDENTIFIER,
-                            'confidence': float(confidence),
-                            'timestamp': datetime.now().isoformat(),
-                        }
-                        
-                        # Add image if snapshot was saved
-                        if snapshot_path:
-                            with open(snapshot_path, 'rb') as f:
-                                import base64
-                                plate_data['image'] = base64.b64encode(f.read()).decode('utf-8')
-                        
-                        # Send to API
-                        send_to_api(plate_data)
                 
-                # Annotate frame
-                if SHOW_VIDEO_WINDOW:
-                    frame = detector.annotate_frame(frame, plates, plate_texts)
+                candidates.append(candidate)
+            
+            if best_crops is not None:
+                candidates.extend(best_crops.expire(frame_count))
+            
+            # Perform OCR on all candidates together (remote fallbacks are queued, not awaited)
+            ocr_items = []
+            for candidate in candidates:
+                if candidate['index'] is None:
+                    remote_context = candidate
+                else:
+                    remote_context = lambda c=candidate: detach_candidate(c)
+                ocr_items.append((candidate['image'], candidate['gray'], remote_context))
+            
+            reads = []
+            with cpu_role('ocr'):
+                texts = detector.extract_text_batch(ocr_items, [c['trace_id'] for c in candidates],
+                                                    camera=GATE_IDENTIFIER,
+                                                    captured_at=[c['captured_at'] for c in candidates])
+            for candidate, plate_text in zip(candidates, texts):
+                if candidate['index'] is not None:
+                    plate_texts[candidate['index']] = plate_text
+                
+                if plate_text:
+                    reads.append((candidate, plate_text, 'local'))
+                elif detection_log is not None:
+                    detection_log.log_ocr(candidate, '', 'unread')
+            
+            # Remote OCR reads that finished since the last frame
+            for candidate, plate_text, engine in detector.poll_remote_text():
+                tracer.instant('ocr.remote.result', candidate['trace_id'], text=plate_text, engine=engine)
+                reads.append((candidate, plate_text, engine))
+            
+            for candidate, plate_text, engine in reads:
+                # Check for duplicates
+                with tracer.span('dedup', candidate['trace_id']):
+                    duplicate = detector.is_duplicate(plate_text, tuning['DUPLICATE_WINDOW_SECONDS'])
+                if detection_log is not None:
+                    detection_log.log_ocr(candidate, plate_text, 'duplicate' if duplicate else 'new', engine)
+                if duplicate:
+                    if DEBUG_MODE:
+                        print(f"  ⊘ Duplicate: {plate_text} (skipped)")
+                    continue
+                
+                # New detection
+                detection_count += 1
+                
+                if list_matcher is not None:
+                    list_matcher.check(plate_text, confidence=float(candidate['confidence']),
+                                       trigger_id=candidate['trigger_id'])
+                
+                # Snapshot is annotated on a pooled scratch copy of the live frame
+                snapshot = candidate['frame']
+                if candidate['index'] is not None:
+                    snapshot = work.buffer(frame.shape)
+                    np.copyto(snapshot, frame)
+                
+                publish_detection(detector, plate_text, candidate, snapshot, detection_count, detection_log)
+                if trigger is not None and candidate['trigger_id']:
+                    trigger.record_read(candidate['trigger_id'])
+            
+            # Live preview copies (and later annotates) the frame only when a viewer is due one
+            if preview is not None:
+                preview.offer(frame, plates, plate_texts,
+                              f"{GATE_IDENTIFIER} | Frame: {frame_count} | Detections: {detection_count}")
+            
+            # Annotate frame
+            if plates and SHOW_VIDEO_WINDOW:
+                frame = detector.annotate_frame(frame, plates, plate_texts)
             
             # Display video (optional)
             if SHOW_VIDEO_WINDOW:
@@ -145,19 +391,77 @@ def process_video_stream(camera_source, detector):
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     print("\n⏹ Stopping...")
                     break
+            
+            # Hand the frame and derived buffers back to the pool
+            ctx.release()
+            tracer.add_span('frame', frame_started, time.time(), frame_id,
+                            frame=frame_count, plates=len(plates), reads=len(reads))
+            settings.record_frame(frame_count, frame_started, captured_at)
+            
+            # Allocations and RSS should stay flat once the pool is warm
+            if DEBUG_MODE and MEMORY_REPORT_INTERVAL and frame_count % MEMORY_REPORT_INTERVAL == 0:
+                report_memory(camera_source.pool, frame_count)
     
     except KeyboardInterrupt:
         print("\n⏹ Interrupted by user")
     
     finally:
         camera_source.release()
-        cv2.destroyAllWindows()
+        if list_matcher is not None:
+            list_matcher.close()
+        if trigger is not None:
+            trigger.close()
+        if control is not None:
+            control.close()
+        if SHOW_VIDEO_WINDOW:
+            cv2.destroyAllWindows()  # Not implemented in headless OpenCV builds
         
         print("\n" + "="*60)
         print(f"📊 Session Summary")
         print("="*60)
         print(f"Frames processed: {frame_count}")
         print(f"Plates detected: {detection_count}")
+        report_memory(camera_source.pool, frame_count)
+        if supervised:
+            print(f"Camera: {camera_source.stats()}")
+        if recorder is not None:
+            recorder.close()
+            print(f"Recording: {recorder.stats()} in {recorder.directory}")
+        if trigger is not None:
+            print(f"Triggers: {trigger.stats()}")
+        if settings.version:
+            print(f"Live settings: v{settings.version} {settings.stats()['current']}")
+        if preview is not None:
+            preview.close()
+            print(f"Preview: {preview.stats()}")
+        if detector.grammar is not None:
+            print(f"Plate grammar: {detector.grammar.stats}")
+        if detector.mosaic is not None:
+            stats = detector.mosaic.stats()
+            print(f"Mosaic OCR: {stats['crops']} crops in {stats['batches']} batches | "
+                  f"{stats['ocr_ms_per_crop']:.1f} ms/crop amortized | "
+                  f"+{stats['batching_wait_ms']:.1f} ms batching wait")
+            if stats.get('fallback_crops'):
+                print(f"  {stats['fallback_crops']} crops read in-process (shared OCR worker unavailable)")
+            for camera, camera_stats in detector.mosaic.lane_stats().items():
+                print(f"  OCR schedule [{camera}]: {camera_stats}")
+        if detector.remote_ocr is not None:
+            print(f"Remote OCR: {detector.remote_ocr.stats()}")
+            detector.remote_ocr.close()
+        if detector.dedup is not None:
+            print(f"Shared dedup ({detector.dedup.group}): {detector.dedup.stats()}")
+            detector.dedup.close()
+        if detector.snapshots is not None:
+            print(f"Snapshots: {detector.snapshots.stats()} in {detector.snapshots.root}")
+            detector.snapshots.close()
+        if detection_log is not None:
+            detection_log.close()
+            print(f"Detection log: {detection_log.stats()} in {detection_log.directory}")
+        if quality_gate is not None:
+            report_quality(quality_gate)
+        if tracer.enabled:
+            tracer.close()
+            print(f"Traces written: {tracer.path}")
         print("="*60)
 
 
@@ -169,7 +473,7 @@ def main():
         '--source',
         type=str,
         default='iphone',
-        choices=['iphone', 'rtsp', 'webcam'],
+        choices=['iphone', 'rtsp', 'webcam', 'replay', 'synthetic'],
         help='Camera source type'
     )
     parser.add_argument(
@@ -183,23 +487,64 @@ def main():
         default=0,
         help='Webcam device ID'
     )
+    parser.add_argument(
+        '--path',
+        type=str,
+        help='Recorded segment file or directory (for replay)'
+    )
+    parser.add_argument(
+        '--fast',
+        action='store_true',
+        help='Replay / synthesize frames as fast as possible instead of in real time'
+    )
     
     args = parser.parse_args()
     
+    # Library thread pools sized to this process's share of the CPU
+    budget = apply_thread_budget()
+    if budget:
+        print(f"✓ CPU budget: {budget}")
+    
+    # Profilers are only attached on demand, so they cost nothing until used
+    profiler = Profiler()
+    if profiler.install_signals():
+        print(f"✓ Profiling on demand: kill -USR1 {os.getpid()} (CPU) / kill -USR2 {os.getpid()} (memory)")
+    
     try:
+        # Frames, resizes and derived images are read into reusable buffers
+        pool = FramePool() if FRAME_POOL_SIZE > 0 else None
+        
         # Initialize camera source
         if args.url:
-            camera = get_camera_source(args.source, url=args.url)
+            source_kwargs = {'url': args.url}
         elif args.source == 'webcam':
-            camera = get_camera_source(args.source, device_id=args.device)
+            source_kwargs = {'device_id': args.device}
+        elif args.source in ('replay', 'synthetic'):
+            source_kwargs = {'realtime': not args.fast}
+            if args.path:
+                source_kwargs['path'] = args.path
         else:
-            camera = get_camera_source(args.source)
+            source_kwargs = {}
+        
+        def open_camera():
+            return get_camera_source(args.source, pool=pool, **source_kwargs)
+        
+        # The supervisor connects (and reconnects) in the background; replays
+        # are read directly so every recorded frame is processed in order
+        if CAMERA_SUPERVISOR and args.source not in ('replay', 'synthetic'):
+            camera = CameraSupervisor(open_camera, pool=pool)
+        else:
+            camera = open_camera()
+        
+        recorder = StreamRecorder() if RECORD_ENABLED and args.source != 'replay' else None
         
         # Initialize detector
         detector = LicensePlateDetector()
         
+        preview = PreviewServer(annotate=detector.annotate_frame) if PREVIEW_ENABLED else None
+        
         # Start processing
-        process_video_stream(camera, detector)
+        process_video_stream(camera, detector, recorder, preview, profiler)
     
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+import pytesseract
+
+from ocr_scheduler import OCRScheduler
+from thread_budget import pin
+from config import (
+    GATE_IDENTIFIER,
+    MOSAIC_ROW_HEIGHT,
+    MOSAIC_WINDOW_MS,
+    MOSAIC_MAX_BATCH
+)
+
+
+class MosaicOCR:
+    """Reads many plate crops with a single Tesseract call
+
+    Crops are binarized, scaled to a common row height and stacked into one
+    mosaic with blank gaps between rows. Tesseract reads the mosaic as a
+    block of text and every word box is mapped back to its crop by the row
+    its vertical centre falls in.
+    """
+
+    def __init__(self, row_height=MOSAIC_ROW_HEIGHT, gap=None):
+        self.row_height = row_height
+        self.gap = gap if gap is not None else row_height // 2
+        self.config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+    def recognize(self, crops):
+        """Return the raw text of each grayscale crop (one Tesseract call in total)"""
+        if not crops:
+            return []
+
+        rows = [self._prepare(crop) for crop in crops]
+        pitch = self.row_height + self.gap
+        width = max(row.shape[1] for row in rows) + 2 * self.gap
+
+        # White canvas with a margin around every row
+        mosaic = np.full((pitch * len(rows) + self.gap, width), 255, dtype=np.uint8)
+        for i, row in enumerate(rows):
+            y = self.gap + i * pitch
+            mosaic[y:y + self.row_height, self.gap:self.gap + row.shape[1]] = row
+
+        data = pytesseract.image_to_data(mosaic, config=self.config, output_type=pytesseract.Output.DICT)
+
+        words = [[] for _ in rows]
+        for text, left, top, height in zip(data['text'], data['left'], data['top'], data['height']):
+            text = text.strip()
+            if not text:
+                continue
+            row = int((top + height / 2.0 - self.gap / 2.0) // pitch)
+            if 0 <= row < len(rows):
+                words[row].append((left, text))
+
+        return [''.join(text for _, text in sorted(row_words)) for row_words in words]
+
+    def _prepare(self, gray):
+        scale = self.row_height / float(gray.shape[0])
+        resized = cv2.resize(gray, (max(1, int(gray.shape[1] * scale)), self.row_height),
+                             interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+        _, binary = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Tesseract wants dark text on a light background
+        if cv2.countNonZero(binary) < binary.size // 2:
+            binary = cv2.bitwise_not(binary)
+        return binary
+
+
+class MosaicBatcher:
+    """Collects crops (from one frame or several cameras) into mosaic OCR calls
+
+    A batch closes window_ms after its first crop arrived, or at max_batch
+    crops. With window_ms = 0 only crops submitted together are batched.
+    Crops are picked by the OCRScheduler: highest-priority camera first,
+    fair shares by weight, stale crops dropped.
+    """
+
+    def __init__(self, ocr=None, window_ms=MOSAIC_WINDOW_MS, max_batch=MOSAIC_MAX_BATCH, scheduler=None):
+        self.ocr = ocr or MosaicOCR()
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.scheduler = scheduler or OCRScheduler()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.crops = 0
+        self.ocr_seconds = 0.0
+        self.wait_seconds = 0.0
+        threading.Thread(target=self._run, name='mosaic-ocr', daemon=True).start()
+
+    def submit(self, crops, camera=GATE_IDENTIFIER, captured_at=None):
+        """Queue grayscale crops of one camera; returns one Future per crop
+
+        captured_at (wall time per crop) lets crops that waited too long be
+        dropped; their futures resolve to ''.
+        """
+        futures = [Future() for _ in crops]
+        if crops:
+            self.scheduler.put(camera, crops, futures, captured_at)
+        return futures
+
+    def read(self, crops, camera=GATE_IDENTIFIER, captured_at=None):
+        """Submit crops and wait for their texts"""
+        return [future.result() for future in self.submit(crops, camera, captured_at)]
+
+    def _run(self):
+        pin('ocr')  # Tesseract processes started here inherit the OCR cores
+        while True:
+            batch = self.scheduler.take(self.max_batch)
+            deadline = time.perf_counter() + self.window
+            while batch and len(batch) < self.max_batch:
+                more = self.scheduler.take(self.max_batch - len(batch),
+                                           timeout=max(0.0, deadline - time.perf_counter()))
+                if not more:
+                    break
+                batch.extend(more)
+            if not batch:
+                continue  # Everything waiting was stale
+
+            started = time.perf_counter()
+            try:
+                texts = self.ocr.recognize([crop for _, crop, _, _ in batch])
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            self.scheduler.record(batch, finished)
+
+            with self._lock:
+                self.batches += 1
+                self.crops += len(batch)
+                self.ocr_seconds += finished - started
+                self.wait_seconds += sum(started - queued for _, _, _, queued in batch)
+
+            for (_, _, future, _), text in zip(batch, texts):
+                future.set_result(text)
+
+    def lane_stats(self):
+        """Per-camera schedule stats"""
+        return self.scheduler.stats()
+
+    def stats(self):
+        """Amortized OCR cost per crop and latency added by the batching window"""
+        with self._lock:
+            crops = max(self.crops, 1)
+            return {
+                'batches': self.batches,
+                'crops': self.crops,
+                'crops_per_batch': self.crops / max(self.batches, 1),
+                'ocr_ms_per_batch': 1000 * self.ocr_seconds / max(self.batches, 1),
+                'ocr_ms_per_crop': 1000 * self.ocr_seconds / crops,
+                'batching_wait_ms': 1000 * self.wait_seconds / crops,
+            }
@@ -0,0 +1,256 @@
+"""One mosaic OCR worker shared by every camera process on this machine
+
+Each camera process (main.py with its own GATE_IDENTIFIER) normally has its
+own MosaicBatcher, so its OCRScheduler only ever sees one lane. With
+OCR_SERVER set, the processes send their crops to this worker instead: one
+MosaicBatcher whose scheduler gets a lane per camera, so OCR_PRIORITIES and
+OCR_WEIGHTS apply across the cameras and crops of different cameras share
+Tesseract calls (MOSAIC_WINDOW_MS > 0).
+
+Requests go over a local multiprocessing connection. Its messages are
+pickles, so OCR_SERVER_TOKEN is required and the worker listens on the
+loopback interface unless told otherwise. If the worker is unreachable or
+doesn't answer within OCR_SERVER_TIMEOUT, the camera process reads its
+crops with its own MosaicBatcher until the worker is back.
+
+Usage:
+    python ocr_server.py serve [host:port]
+    python ocr_server.py bench [seconds]
+"""
+import multiprocessing as mp
+import sys
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import numpy as np
+import pytesseract
+
+from mosaic_ocr import MosaicBatcher
+from ocr_scheduler import OCRScheduler, _SimulatedOCR
+from config import (
+    GATE_IDENTIFIER,
+    OCR_SERVER,
+    OCR_SERVER_TOKEN,
+    OCR_SERVER_TIMEOUT,
+    TESSERACT_CMD
+)
+
+RECONNECT_INTERVAL = 2.0  # Seconds between connection attempts while the worker is down
+
+
+def parse_address(text):
+    """'host:port' (or just 'port' for the loopback interface) -> (host, port)"""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _authkey(token):
+    if not token:
+        raise ValueError("OCR_SERVER_TOKEN must be set to use the shared OCR worker")
+    return token.encode('utf-8')
+
+
+class OCRServer:
+    """Serves mosaic OCR reads to the camera processes, scheduled per camera"""
+
+    def __init__(self, address=OCR_SERVER or '127.0.0.1:8093', token=OCR_SERVER_TOKEN, batcher=None):
+        self.batcher = batcher or MosaicBatcher()
+        self.listener = Listener(parse_address(address) if isinstance(address, str) else address,
+                                 authkey=_authkey(token))
+        self.address = self.listener.address
+        self.clients = 0
+
+    def serve_forever(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                print(f"⚠ OCR server: rejected a connection ({e})")
+                continue
+            except OSError:
+                return  # Listener closed
+            self.clients += 1
+            threading.Thread(target=self._handle, args=(connection,), name='ocr-client', daemon=True).start()
+
+    def close(self):
+        self.listener.close()
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return  # Camera process went away
+                try:
+                    if request[0] == 'read':
+                        _, camera, crops, captured_at = request
+                        reply = ('ok', self.batcher.read(crops, camera, captured_at))
+                    elif request[0] == 'stats':
+                        reply = ('ok', (self.batcher.stats(), self.batcher.lane_stats()))
+                    else:
+                        reply = ('error', f"unknown request {request[0]!r}")
+                except Exception as e:
+                    reply = ('error', f"{type(e).__name__}: {e}")
+                try:
+                    connection.send(reply)
+                except OSError:
+                    return
+
+
+class OCRClient:
+    """MosaicBatcher.read() and stats() of the shared OCR worker, for one camera process"""
+
+    def __init__(self, address=OCR_SERVER, token=OCR_SERVER_TOKEN, timeout=OCR_SERVER_TIMEOUT, fallback=None):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = _authkey(token)
+        self.timeout = timeout
+        self.failures = 0  # Consecutive failed requests (0 while connected)
+        self.fallback = fallback  # In-process MosaicBatcher, created on the first failure
+        self.fallback_crops = 0
+        self._connection = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def read(self, crops, camera=GATE_IDENTIFIER, captured_at=None):
+        """Send crops to the worker and wait for their texts (read in-process if it fails)"""
+        if not crops:
+            return []
+        texts = self._request(('read', camera, list(crops), captured_at))
+        if texts is not None:
+            return texts
+        if self.fallback is None:
+            self.fallback = MosaicBatcher()
+        self.fallback_crops += len(crops)
+        return self.fallback.read(crops, camera, captured_at)
+
+    def stats(self):
+        """Batching stats of the worker (all cameras), or of the in-process fallback"""
+        stats = self._request(('stats',))
+        if stats is not None:
+            return dict(stats[0], fallback_crops=self.fallback_crops)
+        stats = self.fallback.stats() if self.fallback is not None else {
+            'batches': 0, 'crops': 0, 'ocr_ms_per_crop': 0.0, 'batching_wait_ms': 0.0}
+        return dict(stats, fallback_crops=self.fallback_crops, unreachable=True)
+
+    def lane_stats(self):
+        """Per-camera schedule stats of the worker, or of the in-process fallback"""
+        stats = self._request(('stats',))
+        if stats is not None:
+            return stats[1]
+        return self.fallback.lane_stats() if self.fallback is not None else {}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _request(self, request):
+        with self._lock:
+            if self._connection is None:
+                if time.monotonic() < self._retry_at:
+                    return None
+                try:
+                    self._connection = Client(self.address, authkey=self.authkey)
+                    print(f"✓ Connected to shared OCR worker at {self.address[0]}:{self.address[1]}")
+                    self.failures = 0
+                except (OSError, EOFError, AuthenticationError) as e:
+                    return self._failed(e)
+            try:
+                self._connection.send(request)
+                # A wedged worker must not freeze the frame loop of every camera
+                if not self._connection.poll(self.timeout):
+                    raise TimeoutError(f"no answer within {self.timeout:g}s")
+                status, result = self._connection.recv()
+            except (OSError, EOFError) as e:
+                self._connection.close()
+                self._connection = None
+                return self._failed(e)
+        if status != 'ok':
+            print(f"⚠ Shared OCR worker error: {result}")
+            return None
+        return result
+
+    def _failed(self, error):
+        # Warn once per outage, not for every frame
+        if self.failures == 0:
+            print(f"⚠ Shared OCR worker unreachable ({error}) - reading crops in-process until it is back")
+        self.failures += 1
+        self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+        return None
+
+
+def _entry_camera(address, token, seconds, results):
+    """Quiet entry lane: one crop every 0.5 s, timed end to end"""
+    client = OCRClient(address, token)
+    crop = np.zeros((40, 160), dtype=np.uint8)
+    latencies = []
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        started = time.perf_counter()
+        client.read([crop], camera='entry', captured_at=[time.time()])
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.5)
+    results.put(latencies)
+
+
+def _exit_camera(address, token, camera, seconds):
+    """Busy exit lane: four crops per frame, back to back"""
+    client = OCRClient(address, token)
+    crop = np.zeros((40, 160), dtype=np.uint8)
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        client.read([crop] * 4, camera=camera, captured_at=[time.time()] * 4)
+
+
+def benchmark(seconds, exit_cameras=3):
+    """An entry camera process and busy exit camera processes sharing one worker"""
+    token = 'bench'
+    scheduler = OCRScheduler(priorities={'entry': 1}, weights={}, max_age_ms=1500, slo_ms=500)
+    server = OCRServer(('127.0.0.1', 0), token,
+                       MosaicBatcher(ocr=_SimulatedOCR(), window_ms=10, max_batch=8, scheduler=scheduler))
+    threading.Thread(target=server.serve_forever, name='ocr-server', daemon=True).start()
+
+    results = mp.Queue()
+    cameras = [mp.Process(target=_entry_camera, args=(server.address, token, seconds, results))]
+    cameras += [mp.Process(target=_exit_camera, args=(server.address, token, f'exit_{i + 1}', seconds))
+                for i in range(exit_cameras)]
+    for camera in cameras:
+        camera.start()
+    latencies_ms = np.array(results.get()) * 1000.0
+    for camera in cameras:
+        camera.join()
+    server.close()
+    return float(np.percentile(latencies_ms, 95)), server.batcher.stats(), scheduler.stats()
+
+
+def main(argv):
+    if argv and argv[0] == 'serve':
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        server = OCRServer(argv[1] if len(argv) > 1 else OCR_SERVER or '127.0.0.1:8093')
+        print(f"✓ Shared OCR worker listening on {server.address[0]}:{server.address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        for camera, camera_stats in server.batcher.lane_stats().items():
+            print(f"  OCR schedule [{camera}]: {camera_stats}")
+        return 0
+
+    if argv and argv[0] == 'bench':
+        seconds = float(argv[1]) if len(argv) > 1 else 10
+        print(f"Entry camera process vs 3 busy exit camera processes on one OCR worker, {seconds:g}s")
+        p95, stats, lanes = benchmark(seconds)
+        print(f"  entry p95 {p95:.0f} ms | {stats['crops_per_batch']:.1f} crops/batch")
+        for camera, camera_stats in lanes.items():
+            print(f"    {camera}: {camera_stats}")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
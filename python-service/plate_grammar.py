@@ -0,0 +1,85 @@
+import re
+
+from config import PLATE_FORMATS, PLATE_MAX_CORRECTIONS
+
+# Confusable characters and what they most likely are at a letter / digit position
+TO_LETTER = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+TO_DIGIT = {'O': '0', 'Q': '0', 'D': '0', 'U': '0', 'I': '1', 'L': '1', 'T': '1', 'J': '1',
+            'Z': '2', 'A': '4', 'S': '5', 'G': '6', 'B': '8'}
+
+CLASS_PATTERNS = {'L': '[A-Z]', 'N': '[0-9]', 'X': '[A-Z0-9]'}
+
+
+class PlateGrammar:
+    """Regional plate formats compiled into fast matchers
+
+    Formats use L for a letter, N for a digit and X for either, e.g.
+    "LLL NNNN" (spaces are ignored). match() accepts a cleaned OCR string
+    and returns it corrected position by position (O/0, I/1, B/8, ...) if
+    it fits one of the formats with at most max_corrections substitutions,
+    or None for garbage.
+    """
+
+    def __init__(self, formats, max_corrections=PLATE_MAX_CORRECTIONS):
+        self.max_corrections = max_corrections
+        self.formats = [f.replace(' ', '').upper() for f in formats if f.strip()]
+        for fmt in self.formats:
+            if set(fmt) - set(CLASS_PATTERNS):
+                raise ValueError(f"Invalid plate format: {fmt!r} (use L, N and X)")
+
+        # One alternation regex answers "already valid?" in a single call
+        self._exact = re.compile('^(?:%s)$' % '|'.join(
+            ''.join(CLASS_PATTERNS[c] for c in fmt) for fmt in self.formats))
+
+        # Per length: the formats and their per-position correction tables
+        self._by_length = {}
+        for fmt in self.formats:
+            tables = [TO_LETTER if c == 'L' else TO_DIGIT if c == 'N' else None for c in fmt]
+            self._by_length.setdefault(len(fmt), []).append((fmt, tables))
+
+        self.stats = {'exact': 0, 'corrected': 0, 'rejected': 0}
+
+    @classmethod
+    def from_config(cls, formats=PLATE_FORMATS):
+        """Build from a comma-separated format list; None if no formats are configured"""
+        formats = [f for f in formats.split(',') if f.strip()]
+        return cls(formats) if formats else None
+
+    def match(self, text):
+        """Return text corrected to the closest format, or None if nothing fits"""
+        if not text:
+            return None
+
+        if self._exact.match(text):
+            self.stats['exact'] += 1
+            return text
+
+        best, best_fixes = None, None
+        for fmt, tables in self._by_length.get(len(text), ()):
+            corrected, fixes = self._correct(text, fmt, tables)
+            if corrected is None or fixes > self.max_corrections:
+                continue
+            if best_fixes is None or fixes < best_fixes:
+                best, best_fixes = corrected, fixes
+
+        self.stats['corrected' if best else 'rejected'] += 1
+        return best
+
+    def fits(self, text):
+        """Check if text already matches a format exactly (no correction)"""
+        return bool(text) and self._exact.match(text) is not None
+
+    @staticmethod
+    def _correct(text, fmt, tables):
+        chars = []
+        fixes = 0
+        for char, cls, table in zip(text, fmt, tables):
+            if cls == 'X' or (cls == 'L') == char.isalpha():
+                chars.append(char)
+                continue
+            fixed = table.get(char)
+            if fixed is None:
+                return None, 0
+            chars.append(fixed)
+            fixes += 1
+        return ''.join(chars), fixes
@@ -0,0 +1,230 @@
+"""Live preview of the detector's view over HTTP, for headless gate boxes
+
+    GET /               minimal page embedding the stream
+    GET /stream         multipart MJPEG of annotated frames
+    GET /snapshot.jpg   the latest annotated frame
+
+Each preview frame is annotated and JPEG-encoded once, on a background
+thread, however many viewers are connected. Nothing is encoded while
+nobody is watching.
+
+With PREVIEW_TOKEN set, every request needs ?token=<token> (what a browser
+can send; the page passes it on to the stream) or "Authorization: Bearer
+<token>". The feed shows the plates being read: set a token before
+exposing the preview beyond loopback.
+"""
+import hmac
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+import cv2
+
+from config import (
+    PREVIEW_HOST,
+    PREVIEW_PORT,
+    PREVIEW_TOKEN,
+    PREVIEW_FPS,
+    PREVIEW_WIDTH,
+    PREVIEW_JPEG_QUALITY
+)
+
+BOUNDARY = 'frame'
+
+PAGE = """<!doctype html>
+<html><head><title>Plate scanner preview</title></head>
+<body style="margin:0;background:#111"><img src="/stream{query}" style="width:100%"></body></html>
+"""
+
+
+class PreviewServer:
+    """Serves annotated frames as MJPEG without ever blocking the frame loop
+
+    offer() is called from the frame loop; it returns immediately unless a
+    preview frame is due (PREVIEW_FPS) and someone is watching, and then
+    only downsizes the frame into a one-frame slot. An encoder thread
+    annotates and encodes the newest slot frame and publishes it to all
+    viewers. Every viewer thread sends the newest encoded frame when its
+    socket is ready again, so a slow viewer skips frames instead of
+    holding up the others or the pipeline.
+    """
+
+    def __init__(self, host=PREVIEW_HOST, port=PREVIEW_PORT, fps=PREVIEW_FPS,
+                 width=PREVIEW_WIDTH, quality=PREVIEW_JPEG_QUALITY, annotate=None, token=PREVIEW_TOKEN):
+        self.token = token
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.width = width
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.annotate = annotate  # (frame, plates, texts) -> frame, e.g. detector.annotate_frame
+
+        self.viewers = 0
+        self.peak_viewers = 0
+        self.encoded = 0
+        self.sent = 0
+        self.skipped = 0
+
+        self._pending = None  # (frame, plates, texts, status) waiting for the encoder
+        self._jpeg = None
+        self._seq = 0
+        self._next_due = 0.0
+        self._snapshot_wanted = 0.0  # Keep encoding briefly after a snapshot request
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='preview-http', daemon=True).start()
+        threading.Thread(target=self._encode_loop, name='preview-encoder', daemon=True).start()
+        print(f"✓ Live preview: http://{host}:{self.server.server_address[1]}/ "
+              f"({fps:g} fps, {width}px wide{', token required' if token else ''})")
+        if not token and host not in ('127.0.0.1', 'localhost', '::1'):
+            print("⚠ Live preview is open to the network without PREVIEW_TOKEN")
+
+    def authorized(self, token):
+        """True if no token is configured or `token` matches it"""
+        return not self.token or (bool(token) and hmac.compare_digest(token, self.token))
+
+    @property
+    def wanted(self):
+        return self.viewers > 0 or time.monotonic() < self._snapshot_wanted
+
+    def offer(self, frame, plates=(), texts=(), status=None):
+        """Hand a frame to the preview if one is due; cheap no-op otherwise
+
+        plates carry bboxes in frame coordinates. The frame is copied (at
+        preview size), so the caller can reuse its buffer right away.
+        """
+        now = time.monotonic()
+        if now < self._next_due or not self.wanted:
+            return False
+        self._next_due = now + self.interval
+
+        scale = min(1.0, self.width / frame.shape[1]) if self.width else 1.0
+        if scale < 1.0:
+            size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+            small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame.copy()
+        plates = [dict(plate, bbox=tuple(int(v * scale) for v in plate['bbox'])) for plate in plates]
+
+        with self._cond:
+            self._pending = (small, plates, list(texts), status)
+            self._cond.notify_all()
+        return True
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        return {'encoded': self.encoded, 'sent': self.sent, 'skipped': self.skipped,
+                'viewers': self.viewers, 'peak_viewers': self.peak_viewers}
+
+    def _encode_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stop.is_set())
+                if self._stop.is_set():
+                    return
+                frame, plates, texts, status = self._pending
+                self._pending = None
+
+            if self.annotate is not None and plates:
+                frame = self.annotate(frame, plates, texts)
+            if status:
+                cv2.putText(frame, status, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            ok, jpeg = cv2.imencode('.jpg', frame, self.params)
+            if not ok:
+                continue
+
+            with self._cond:
+                self._jpeg = jpeg.tobytes()
+                self._seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    def _next_jpeg(self, after, timeout):
+        """Newest encoded frame newer than sequence `after`: (seq, jpeg), or None on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after or self._stop.is_set(), timeout=timeout):
+                return None
+            if self._stop.is_set():
+                return None
+            if after and self._seq > after + 1:
+                self.skipped += self._seq - after - 1
+            return self._seq, self._jpeg
+
+    def _handler_class(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            timeout = 10  # A viewer that stops reading is dropped instead of pinning a thread
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                token = parse_qs(url.query).get('token', [None])[0]
+                scheme, _, header_token = (self.headers.get('Authorization') or '').partition(' ')
+                if not (preview.authorized(token) or (scheme == 'Bearer' and preview.authorized(header_token))):
+                    self._send(401, 'text/plain', b'Unauthorized\n')
+                    return
+                if url.path == '/stream':
+                    self._stream()
+                elif url.path == '/snapshot.jpg':
+                    self._snapshot()
+                elif url.path == '/':
+                    query = f"?token={quote(token)}" if token else ''
+                    self._send(200, 'text/html', PAGE.format(query=query).encode())
+                else:
+                    self._send(404, 'text/plain', b'Not found\n')
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _snapshot(self):
+                preview._snapshot_wanted = time.monotonic() + 5
+                latest = preview._next_jpeg(preview._seq, timeout=max(2.0, 2 * preview.interval))
+                if latest is None:
+                    self._send(503, 'text/plain', b'No frame yet\n')
+                    return
+                self._send(200, 'image/jpeg', latest[1])
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+
+                with preview._cond:
+                    preview.viewers += 1
+                    preview.peak_viewers = max(preview.peak_viewers, preview.viewers)
+                seq = 0
+                try:
+                    while not preview._stop.is_set():
+                        latest = preview._next_jpeg(seq, timeout=1.0)
+                        if latest is None:
+                            continue
+                        seq, jpeg = latest
+                        self.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                         f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b'\r\n')
+                        preview.sent += 1
+                except OSError:
+                    pass  # Viewer went away
+                finally:
+                    with preview._cond:
+                        preview.viewers -= 1
+
+            def log_message(self, format, *args):
+                pass  # Keep per-request lines out of the detector console
+
+        return Handler
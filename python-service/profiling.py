@@ -0,0 +1,224 @@
+"""On-demand CPU and memory profiling of the running service
+
+Nothing is hooked into the frame loop: profilers are started from a signal
+handler (or the control endpoint) and stop themselves after a fixed
+duration, writing their reports to PROFILE_DIR.
+
+    kill -USR1 <pid>   CPU profile for PROFILE_DURATION seconds
+    kill -USR2 <pid>   tracemalloc allocation report for PROFILE_DURATION seconds
+
+PROFILE_MODE=sample samples the stacks of all threads (flame-graph ready
+.folded file plus a per-function table); PROFILE_MODE=cprofile runs cProfile
+on the main (frame loop) thread and also writes a .prof file for snakeviz /
+pstats. Signals are POSIX only; on Windows use the control endpoint.
+"""
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from config import (
+    GATE_IDENTIFIER,
+    PROFILE_DIR,
+    PROFILE_DURATION,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL_MS
+)
+
+
+class StackSampler:
+    """Samples every thread's stack at a fixed interval from a background thread"""
+
+    def __init__(self, interval_ms=PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()  # collapsed stack -> samples
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self, limit=40):
+        """Per-function self / total sample counts as a text table"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(';')[1:]
+            if not functions:
+                continue
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+
+        # Percentages are of all thread stacks sampled, so idle threads count too
+        samples = max(sum(self.stacks.values()), 1)
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms, {samples} thread stacks", "",
+                 f"{'self %':>8} {'total %':>8}  function"]
+        for function, count in own.most_common(limit):
+            lines.append(f"{100.0 * count / samples:8.1f} {100.0 * total[function] / samples:8.1f}  {function}")
+        return '\n'.join(lines) + '\n'
+
+    def folded(self):
+        """Collapsed stacks for flamegraph.pl / speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profiler:
+    """Starts and stops CPU / memory profiling runs on demand"""
+
+    def __init__(self, output_dir=PROFILE_DIR, duration=PROFILE_DURATION, mode=PROFILE_MODE,
+                 gate_id=GATE_IDENTIFIER):
+        self.output_dir = output_dir
+        self.duration = duration
+        self.mode = mode
+        self.gate_id = gate_id
+        self._cpu = None
+        self._memory = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return {'cpu': self._cpu is not None, 'memory': self._memory}
+
+    def install_signals(self):
+        """SIGUSR1 starts a CPU profile, SIGUSR2 a memory profile (POSIX only)"""
+        if not hasattr(signal, 'SIGUSR1'):
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.start_cpu())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.start_memory())
+        signal.signal(signal.SIGALRM, lambda signum, frame: self.stop_cpu())
+        return True
+
+    def start_cpu(self, duration=None, stop_timer=True):
+        """Profile CPU for `duration` seconds; False if a CPU profile is already running
+
+        cProfile mode only sees the thread that calls this, so it must run
+        on the main thread (signal handlers do); other callers should send
+        SIGUSR1 to the process instead. The run stops itself (by SIGALRM in
+        cProfile mode) unless stop_timer is False; the caller then calls
+        stop_cpu() after `duration`, from this thread.
+        """
+        duration = duration or self.duration
+        if self.mode == 'cprofile' and stop_timer and not hasattr(signal, 'setitimer'):
+            raise RuntimeError("cProfile runs need SIGALRM here; start them from the control endpoint")
+        with self._lock:
+            if self._cpu is not None:
+                return False
+            if self.mode == 'cprofile':
+                if threading.current_thread() is not threading.main_thread():
+                    raise RuntimeError("cProfile must be started on the main thread (send SIGUSR1)")
+                self._cpu = cProfile.Profile()
+                self._cpu.enable()
+            else:
+                self._cpu = StackSampler()
+                self._cpu.start()
+
+        if not stop_timer:
+            pass
+        elif self.mode == 'cprofile':
+            # Stopped by SIGALRM, which is delivered to the main thread too
+            signal.setitimer(signal.ITIMER_REAL, duration)
+        else:
+            threading.Timer(duration, self.stop_cpu).start()
+        print(f"🔬 CPU profile started ({self.mode}, {duration:.0f}s)")
+        return True
+
+    def stop_cpu(self):
+        """Stop the CPU profile and write its report; returns the report path"""
+        with self._lock:
+            profiler, self._cpu = self._cpu, None
+        if profiler is None:
+            return None
+
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            path = self._path('cpu', 'txt')
+            profiler.dump_stats(path[:-4] + '.prof')
+            text = io.StringIO()
+            stats = pstats.Stats(profiler, stream=text)
+            stats.sort_stats('cumulative').print_stats(40)
+            stats.sort_stats('tottime').print_stats(40)
+            report = text.getvalue()
+        else:
+            profiler.stop()
+            path = self._path('cpu', 'txt')
+            with open(path[:-4] + '.folded', 'w', encoding='utf-8') as f:
+                f.write(profiler.folded())
+            report = profiler.report()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"🔬 CPU profile written: {path}")
+        return path
+
+    def start_memory(self, duration=None, frames=10):
+        """Trace allocations for `duration` seconds, then report the top sites"""
+        with self._lock:
+            if self._memory:
+                return False
+            self._memory = True
+        tracemalloc.start(frames)
+        baseline = tracemalloc.take_snapshot()
+        threading.Timer(duration or self.duration, self._stop_memory, args=(baseline,)).start()
+        print(f"🔬 Memory profile started ({duration or self.duration:.0f}s)")
+        return True
+
+    def _stop_memory(self, baseline, limit=30):
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            with self._lock:
+                self._memory = False
+
+        lines = [f"Traced memory: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB", "",
+                 f"Top {limit} allocation sites (live at the end)"]
+        lines += [str(stat) for stat in snapshot.statistics('lineno')[:limit]]
+        lines += ["", f"Top {limit} growth since start"]
+        lines += [str(stat) for stat in snapshot.compare_to(baseline, 'lineno')[:limit]]
+        lines += ["", "Largest allocation tracebacks"]
+        for stat in snapshot.statistics('traceback')[:5]:
+            lines.append(f"{stat.size / 1e6:.2f} MB in {stat.count} blocks")
+            lines += ['  ' + line for line in stat.traceback.format()]
+
+        path = self._path('memory', 'txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"🔬 Memory profile written: {path}")
+        return path
+
+    def _path(self, kind, ext):
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.output_dir, f"{self.gate_id}_{kind}_{timestamp}.{ext}")
@@ -0,0 +1,157 @@
+import json
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+from config import (
+    QUALITY_MIN_SHARPNESS,
+    QUALITY_MIN_CONTRAST,
+    QUALITY_MAX_SATURATION,
+    QUALITY_BEST_OF,
+    QUALITY_TRACK_TIMEOUT,
+    QUALITY_SAMPLE_SIZE
+)
+
+
+CropQuality = namedtuple('CropQuality', ['sharpness', 'contrast', 'saturation'])
+
+
+def score_crop(gray):
+    """Score a grayscale plate crop
+
+    sharpness is the variance of the Laplacian (low = motion blur / defocus),
+    contrast the standard deviation of intensities and saturation the share
+    of pixels clipped to near-white (headlight glare).
+    """
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S, ksize=3)
+    _, lap_std = cv2.meanStdDev(laplacian)
+    _, std = cv2.meanStdDev(gray)
+
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
+    clipped = float(hist[250:].sum())
+
+    return CropQuality(
+        sharpness=float(lap_std[0][0]) ** 2,
+        contrast=float(std[0][0]),
+        saturation=clipped / max(gray.size, 1)
+    )
+
+
+class QualityGate:
+    """Decides which crops are worth OCR and keeps score distributions"""
+
+    def __init__(self, min_sharpness=QUALITY_MIN_SHARPNESS, min_contrast=QUALITY_MIN_CONTRAST,
+                 max_saturation=QUALITY_MAX_SATURATION, sample_size=QUALITY_SAMPLE_SIZE):
+        self.min_sharpness = min_sharpness
+        self.min_contrast = min_contrast
+        self.max_saturation = max_saturation
+        self.passed = 0
+        self.rejected = {'sharpness': 0, 'contrast': 0, 'saturation': 0}
+        self.samples = deque(maxlen=sample_size)
+
+    def check(self, quality):
+        """Record the scores and return the failing metric, or None if OCR should run"""
+        self.samples.append(quality)
+
+        if quality.sharpness < self.min_sharpness:
+            reason = 'sharpness'
+        elif quality.contrast < self.min_contrast:
+            reason = 'contrast'
+        elif quality.saturation > self.max_saturation:
+            reason = 'saturation'
+        else:
+            self.passed += 1
+            return None
+
+        self.rejected[reason] += 1
+        return reason
+
+    def stats(self):
+        """Percentiles of recent scores plus pass/reject counts, for tuning thresholds"""
+        summary = {
+            'passed': self.passed,
+            'rejected': dict(self.rejected),
+            'thresholds': {
+                'min_sharpness': self.min_sharpness,
+                'min_contrast': self.min_contrast,
+                'max_saturation': self.max_saturation,
+            },
+            'samples': len(self.samples),
+        }
+        if self.samples:
+            scores = np.array(self.samples, dtype=np.float64)
+            for i, metric in enumerate(CropQuality._fields):
+                p = np.percentile(scores[:, i], [5, 25, 50, 75, 95])
+                summary[metric] = dict(zip(['p5', 'p25', 'p50', 'p75', 'p95'], p.round(3).tolist()))
+        return summary
+
+    def dump(self, path):
+        """Write stats() to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+class BestCropBuffer:
+    """Buffers crops of the same plate across frames and releases the sharpest
+
+    Candidates are matched to tracks by bbox overlap. A track is released
+    once it has seen best_of crops, or when it has not been seen for
+    timeout frames (the vehicle has left).
+    """
+
+    def __init__(self, best_of=QUALITY_BEST_OF, timeout=QUALITY_TRACK_TIMEOUT, min_iou=0.3):
+        self.best_of = best_of
+        self.timeout = timeout
+        self.min_iou = min_iou
+        self.tracks = []
+
+    def add(self, frame_number, bbox, quality, make_candidate):
+        """Add a crop; returns the best candidate if its track is complete
+
+        make_candidate() builds the stored candidate (copying any pooled
+        image data) and is only called when this crop is the track's best.
+        """
+        track = self._match(bbox)
+        if track is None:
+            track = {'bbox': bbox, 'count': 0, 'best_score': -1.0, 'best': None}
+            self.tracks.append(track)
+
+        track['bbox'] = bbox
+        track['last_seen'] = frame_number
+        track['count'] += 1
+        if quality.sharpness > track['best_score']:
+            track['best_score'] = quality.sharpness
+            track['best'] = make_candidate()
+
+        if track['count'] >= self.best_of:
+            self.tracks.remove(track)
+            return track['best']
+        return None
+
+    def expire(self, frame_number):
+        """Release the best candidate of every track that has gone stale"""
+        stale = [t for t in self.tracks if frame_number - t['last_seen'] > self.timeout]
+        for track in stale:
+            self.tracks.remove(track)
+        return [t['best'] for t in stale]
+
+    def _match(self, bbox):
+        best, best_iou = None, self.min_iou
+        for track in self.tracks:
+            overlap = iou(track['bbox'], bbox)
+            if overlap >= best_iou:
+                best, best_iou = track, overlap
+        return best
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
@@ -0,0 +1,304 @@
+import base64
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    PLATE_RECOGNIZER_TOKEN,
+    PLATE_RECOGNIZER_URL,
+    OCR_SPACE_API_KEY,
+    OCR_SPACE_URL,
+    REMOTE_OCR_TIMEOUT,
+    REMOTE_OCR_MAX_CONCURRENCY,
+    REMOTE_OCR_MAX_PENDING,
+    REMOTE_OCR_HOURLY_BUDGET,
+    REMOTE_OCR_BREAKER_FAILURES,
+    REMOTE_OCR_BREAKER_COOLDOWN
+)
+
+
+class CircuitBreaker:
+    """Stops calling a failing provider for a cool-off period
+
+    After `failures` consecutive errors the breaker opens and allow() is
+    False until `cooldown` seconds have passed. Then a single trial call is
+    let through (half-open); success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, failures=REMOTE_OCR_BREAKER_FAILURES, cooldown=REMOTE_OCR_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.trial_in_flight or self.consecutive_failures >= self.failures:
+                if self.opened_at is None or self.trial_in_flight:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class PlateRecognizerProvider:
+    """Plate Recognizer snapshot API"""
+
+    name = 'platerecognizer'
+
+    def __init__(self, token=PLATE_RECOGNIZER_TOKEN, url=PLATE_RECOGNIZER_URL):
+        self.token = token
+        self.url = url
+
+    def read(self, session, jpeg, timeout):
+        response = session.post(
+            self.url,
+            headers={'Authorization': f'Token {self.token}'},
+            files={'upload': jpeg},
+            timeout=timeout
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('results'):
+            return result['results'][0]['plate'].upper()
+        return ""
+
+
+class OCRSpaceProvider:
+    """OCR.space parse API (engine 2)"""
+
+    name = 'ocrspace'
+
+    def __init__(self, api_key=OCR_SPACE_API_KEY, url=OCR_SPACE_URL):
+        self.api_key = api_key
+        self.url = url
+
+    def read(self, session, jpeg, timeout):
+        img_base64 = base64.b64encode(jpeg).decode('utf-8')
+        response = session.post(
+            self.url,
+            data={
+                'apikey': self.api_key,
+                'base64Image': f'data:image/jpeg;base64,{img_base64}',
+                'isOverlayRequired': False,
+                'OCREngine': 2,  # Engine 2 is better for license plates
+                'scale': True,
+                'isTable': False
+            },
+            timeout=timeout
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('ParsedResults'):
+            return result['ParsedResults'][0].get('ParsedText', '')
+        return ""
+
+
+class RemoteOCRClient:
+    """Shared asynchronous client for the remote OCR providers
+
+    Requests run on a small worker pool over one pooled HTTP session, so the
+    frame loop never waits on the network. Each call has a strict deadline,
+    each provider sits behind its own circuit breaker, at most
+    max_concurrency calls are in flight (max_pending queued) and no more
+    than hourly_budget provider calls are made per rolling hour: a crop
+    that falls through to the next provider is billed once per call.
+    Finished reads are collected with poll().
+    """
+
+    def __init__(self, providers, timeout=REMOTE_OCR_TIMEOUT, max_concurrency=REMOTE_OCR_MAX_CONCURRENCY,
+                 max_pending=REMOTE_OCR_MAX_PENDING, hourly_budget=REMOTE_OCR_HOURLY_BUDGET):
+        self.providers = list(providers)
+        self.breakers = {p.name: CircuitBreaker() for p in self.providers}
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.hourly_budget = hourly_budget
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.providers) or 1,
+                              pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='remote-ocr')
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._calls = deque()  # Provider call timestamps within the last hour (incl. reserved)
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'late': 0,
+                         'over_budget': 0, 'queue_full': 0, 'breaker_open': 0}
+
+    def submit(self, plate_image, context=None):
+        """Queue a crop for remote OCR; returns False if it was not accepted
+
+        context is handed back with the result by poll(); if it is callable
+        it is only called (e.g. to copy pooled images) once the crop is
+        accepted.
+        """
+        if not any(self.breakers[p.name].state != 'open' for p in self.providers):
+            self._count('breaker_open')
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.counters['queue_full'] += 1
+                return False
+
+            # Reserve the first call now, so a burst of submits can't overrun the budget
+            if not self._charge(now):
+                self.counters['over_budget'] += 1
+                return False
+
+        # Encode on the caller's thread: the crop may live in a pooled buffer
+        _, buffer = cv2.imencode('.jpg', plate_image)
+        if callable(context):
+            context = context()
+
+        deadline = now + self.timeout
+        future = self.executor.submit(self._read, buffer.tobytes(), deadline, now)
+        with self._lock:
+            self._pending.append((future, context, deadline))
+            self.counters['submitted'] += 1
+        return True
+
+    def poll(self, include_failed=False):
+        """Return (context, text) for every finished call, without blocking
+
+        Calls that fail or finish after their deadline are dropped, or
+        returned with text None when include_failed is set.
+        """
+        now = time.monotonic()
+        finished = []
+        with self._lock:
+            still_pending = []
+            for future, context, deadline in self._pending:
+                if future.done():
+                    finished.append((future, context, deadline))
+                elif now > deadline + 1.0:
+                    future.cancel()
+                    self.counters['late'] += 1
+                    if include_failed:
+                        finished.append((future, context, deadline))
+                else:
+                    still_pending.append((future, context, deadline))
+            self._pending = still_pending
+
+        results = []
+        for future, context, deadline in finished:
+            if not future.done():
+                results.append((context, None))  # Late
+                continue
+            text = future.result() if not future.cancelled() and future.exception() is None else None
+            if text is None:
+                self._count('failed')
+                if include_failed:
+                    results.append((context, None))
+            else:
+                self._count('completed')
+                results.append((context, text))
+        return results
+
+    def _read(self, jpeg, deadline, reserved):
+        """Try each provider in order until one answers; runs on a worker
+
+        The first call uses the budget reserved by submit(); every further
+        call is charged when it is made, and refused once the budget is spent.
+        """
+        try:
+            for provider in self.providers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                breaker = self.breakers[provider.name]
+                if not breaker.allow():
+                    continue
+
+                if reserved is None:
+                    with self._lock:
+                        charged = self._charge(time.monotonic())
+                        if not charged:
+                            self.counters['over_budget'] += 1
+                    if not charged:
+                        return None
+                reserved = None
+
+                try:
+                    # Connect and read timeouts are both capped by the deadline
+                    text = provider.read(self.session, jpeg, timeout=(min(remaining, 3.0), remaining))
+                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                    breaker.record_failure()
+                    print(f"    ⚠️ {provider.name} OCR error: {e}")
+                    continue
+
+                breaker.record_success()
+                return text
+            return None
+        finally:
+            if reserved is not None:
+                # No provider was called: give the reservation back
+                with self._lock:
+                    try:
+                        self._calls.remove(reserved)
+                    except ValueError:
+                        pass
+
+    def _charge(self, now):
+        """Record one provider call in the hourly budget; False if it is spent (lock held)"""
+        while self._calls and now - self._calls[0] > 3600:
+            self._calls.popleft()
+        if self.hourly_budget and len(self._calls) >= self.hourly_budget:
+            return False
+        self._calls.append(now)
+        return True
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Call counters, calls in the current hour and breaker states"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._pending)
+            stats['calls_last_hour'] = len(self._calls)
+        stats['breakers'] = {name: b.state for name, b in self.breakers.items()}
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,287 @@
+"""Snapshot storage partitioned by date and gate, with retention and an index
+
+    <SNAPSHOT_DIR>/<YYYY-MM-DD>/<gate>/<PLATE>_<HHMMSS_micro>_<n>.jpg
+    <SNAPSHOT_DIR>/index.sqlite
+
+Files are created exclusively, so two reads of the same plate in the same
+instant get different names instead of overwriting each other. The SQLite
+index records plate, gate, capture time and size of every snapshot: lookups
+by plate/time and quota accounting never list directories. A background
+thread deletes snapshots older than SNAPSHOT_MAX_AGE_DAYS and the oldest
+ones beyond SNAPSHOT_MAX_MB.
+
+Usage:
+    python snapshot_store.py find <plate> [since] [until]   (ISO dates/times)
+    python snapshot_store.py stats
+    python snapshot_store.py evict
+    python snapshot_store.py reindex      # Rebuild the index from the files
+"""
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    GATE_IDENTIFIER,
+    SNAPSHOT_DIR,
+    SNAPSHOT_MAX_MB,
+    SNAPSHOT_MAX_AGE_DAYS,
+    SNAPSHOT_EVICT_INTERVAL
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    path TEXT PRIMARY KEY,
+    plate TEXT NOT NULL,
+    gate TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS snapshots_plate ON snapshots (plate, captured_at);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (captured_at);
+"""
+
+# <PLATE>_<HHMMSS>_<micro>_<n>.jpg, and the flat <PLATE>_<YYYYmmdd>_<HHMMSS>.jpg of older versions
+NAME = re.compile(r'^([A-Z0-9]+)_(\d{6})_(\d{6})_\d+\.jpg$')
+LEGACY_NAME = re.compile(r'^([A-Z0-9]+)_(\d{8})_(\d{6})\.jpg$')
+
+EVICT_BATCH = 500
+
+
+class SnapshotStore:
+    """Writes snapshots into date/gate partitions and keeps them within quota"""
+
+    def __init__(self, root=SNAPSHOT_DIR, gate_id=GATE_IDENTIFIER, max_mb=SNAPSHOT_MAX_MB,
+                 max_age_days=SNAPSHOT_MAX_AGE_DAYS, evict_interval=SNAPSHOT_EVICT_INTERVAL):
+        self.root = root
+        self.gate_id = re.sub(r'[^A-Za-z0-9_.-]', '_', gate_id)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_age = max_age_days * 86400
+        self.saved = 0
+        self.evicted = 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+        self._thread = None
+        if evict_interval > 0 and (self.max_bytes > 0 or self.max_age > 0):
+            self._thread = threading.Thread(target=self._evict_loop, args=(evict_interval,),
+                                            name='snapshot-evictor', daemon=True)
+            self._thread.start()
+
+    def save(self, jpeg, plate, captured_at=None, confidence=None):
+        """Store encoded JPEG bytes; returns the snapshot's path"""
+        captured_at = captured_at or time.time()
+        moment = datetime.fromtimestamp(captured_at)
+        directory = os.path.join(self.root, moment.strftime('%Y-%m-%d'), self.gate_id)
+        os.makedirs(directory, exist_ok=True)
+
+        plate = normalize_plate(plate) or 'UNKNOWN'
+        stem = f"{plate}_{moment.strftime('%H%M%S_%f')}"
+        while True:
+            path = os.path.join(directory, f"{stem}_{next(self._counter)}.jpg")
+            try:
+                with open(path, 'xb') as f:
+                    f.write(jpeg)
+                break
+            except FileExistsError:
+                continue  # Another process on this gate took the name
+
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)',
+                             (os.path.relpath(path, self.root), plate, self.gate_id,
+                              captured_at, len(jpeg), confidence))
+            self._db.commit()
+        self.saved += 1
+        return path
+
+    def find(self, plate=None, since=None, until=None, gate=None, limit=100):
+        """Snapshots matching plate / gate / capture-time range, newest first"""
+        clauses, params = [], []
+        for column, op, value in (('plate', '=', plate), ('gate', '=', gate),
+                                  ('captured_at', '>=', since), ('captured_at', '<', until)):
+            if value is not None:
+                clauses.append(f'{column} {op} ?')
+                params.append(normalize_plate(value) if column == 'plate' else value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock:
+            rows = self._db.execute(f'SELECT path, plate, gate, captured_at, size, confidence FROM snapshots '
+                                    f'{where} ORDER BY captured_at DESC LIMIT ?', params + [limit]).fetchall()
+        return [{'path': os.path.join(self.root, path), 'plate': plate, 'gate': gate,
+                 'captured_at': captured_at, 'size': size, 'confidence': confidence}
+                for path, plate, gate, captured_at, size, confidence in rows]
+
+    def stats(self):
+        with self._lock:
+            count, size, oldest = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(captured_at) FROM snapshots').fetchone()
+        return {'snapshots': count, 'size_mb': round(size / 1e6, 2),
+                'oldest': datetime.fromtimestamp(oldest).isoformat(timespec='seconds') if oldest else None,
+                'saved': self.saved, 'evicted': self.evicted}
+
+    def evict(self):
+        """Delete snapshots past the age limit, then the oldest beyond the quota; returns how many"""
+        evicted = 0
+        if self.max_age > 0:
+            cutoff = time.time() - self.max_age
+            while True:
+                evicted_now = self._delete('WHERE captured_at < ?', (cutoff,))
+                evicted += evicted_now
+                if evicted_now < EVICT_BATCH:
+                    break
+
+        if self.max_bytes > 0:
+            with self._lock:
+                total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM snapshots').fetchone()[0]
+            while total > self.max_bytes:
+                with self._lock:
+                    rows = self._db.execute('SELECT path, size FROM snapshots ORDER BY captured_at LIMIT ?',
+                                            (EVICT_BATCH,)).fetchall()
+                # Only as many of the oldest as needed to get back under quota
+                doomed = []
+                for path, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append(path)
+                    total -= size
+                if not doomed:
+                    break
+                evicted += self._delete_paths(doomed)
+
+        self.evicted += evicted
+        return evicted
+
+    def reindex(self):
+        """Rebuild the index from the files on disk (after a lost index or an upgrade)"""
+        rows = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.jpg'):
+                    continue
+                path = os.path.join(directory, name)
+                plate, captured_at = parse_name(path, self.root)
+                gate = os.path.basename(directory) if directory != self.root else self.gate_id
+                rows.append((os.path.relpath(path, self.root), plate, gate,
+                             captured_at, os.path.getsize(path), None))
+        with self._lock:
+            self._db.execute('DELETE FROM snapshots')
+            self._db.executemany('INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+        return len(rows)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._db.close()
+
+    def _evict_loop(self, interval):
+        while True:
+            try:
+                evicted = self.evict()
+                if evicted:
+                    print(f"🗑 Evicted {evicted} old snapshot(s)")
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠ Snapshot eviction failed: {e}")
+            if self._stop.wait(interval):
+                return
+
+    def _delete(self, where, params):
+        with self._lock:
+            paths = [row[0] for row in self._db.execute(
+                f'SELECT path FROM snapshots {where} ORDER BY captured_at LIMIT ?',
+                params + (EVICT_BATCH,)).fetchall()]
+        return self._delete_paths(paths)
+
+    def _delete_paths(self, paths):
+        directories = set()
+        for path in paths:
+            full = os.path.join(self.root, path)
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+            directories.add(os.path.dirname(full))
+        with self._lock:
+            self._db.executemany('DELETE FROM snapshots WHERE path = ?', [(path,) for path in paths])
+            self._db.commit()
+
+        # Drop emptied gate and date partitions
+        for directory in directories:
+            while os.path.abspath(directory) != os.path.abspath(self.root):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        return len(paths)
+
+
+def normalize_plate(plate):
+    """Plate text as stored in file names and the index: upper-case letters and digits"""
+    return re.sub(r'[^A-Z0-9]', '', plate.upper())
+
+
+def parse_name(path, root):
+    """(plate, capture time) of a snapshot file from its name and partition"""
+    name = os.path.basename(path)
+    match = NAME.match(name)
+    if match:
+        date = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        try:
+            moment = datetime.strptime(f"{date} {match.group(2)}{match.group(3)}", '%Y-%m-%d %H%M%S%f')
+            return match.group(1), moment.timestamp()
+        except ValueError:
+            pass
+    match = LEGACY_NAME.match(name)
+    if match:
+        moment = datetime.strptime(match.group(2) + match.group(3), '%Y%m%d%H%M%S')
+        return match.group(1), moment.timestamp()
+    return name.split('_')[0].upper(), os.path.getmtime(path)
+
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 1
+
+    store = SnapshotStore(evict_interval=0)
+    try:
+        if argv[0] == 'find' and len(argv) >= 2:
+            since = _timestamp(argv[2]) if len(argv) > 2 else None
+            until = _timestamp(argv[3]) if len(argv) > 3 else None
+            for snapshot in store.find(argv[1], since, until):
+                moment = datetime.fromtimestamp(snapshot['captured_at']).isoformat(timespec='seconds')
+                print(f"{moment}  {snapshot['gate']}  {snapshot['path']}")
+        elif argv[0] == 'stats':
+            print(store.stats())
+        elif argv[0] == 'evict':
+            print(f"Evicted {store.evict()} snapshot(s)")
+        elif argv[0] == 'reindex':
+            print(f"Indexed {store.reindex()} snapshot(s)")
+        else:
+            print(__doc__)
+            return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,250 @@
+"""Stream recording into compact segment files, and their replay
+
+A segment is a header followed by (timestamp, JPEG) records:
+
+    b'PLATESEG1\\n' then per frame: float64 capture time, uint32 length, JPEG bytes
+
+Segments roll every RECORD_SEGMENT_SECONDS and the oldest are deleted
+beyond RECORD_MAX_MB. A truncated last record (power cut) is ignored on
+replay.
+
+Usage:
+    python stream_recorder.py info <segment_or_dir>
+    GATE_IDENTIFIER=<gate> python main.py --source replay --path <segment_or_dir> [--fast]
+"""
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from camera_sources import CameraSource
+from frame_pool import FramePool
+from config import (
+    GATE_IDENTIFIER,
+    RECORD_DIR,
+    RECORD_SEGMENT_SECONDS,
+    RECORD_MAX_MB,
+    RECORD_JPEG_QUALITY
+)
+
+MAGIC = b'PLATESEG1\n'
+RECORD = struct.Struct('<dI')
+SEGMENT_NAME = re.compile(r'(.+)_(\d{8}_\d{6}_\d{6})\.seg')  # <gate id>_<start time>.seg
+
+
+class StreamRecorder:
+    """Tees frames into rolling segment files from a background writer thread
+
+    write() only copies the frame into a pooled buffer on a bounded queue;
+    JPEG encoding and disk I/O happen on the writer thread, which hands the
+    buffer back once it is encoded. If the disk can't keep up, frames
+    are dropped (and counted) rather than stalling capture.
+    """
+
+    def __init__(self, directory=RECORD_DIR, segment_seconds=RECORD_SEGMENT_SECONDS,
+                 max_mb=RECORD_MAX_MB, quality=RECORD_JPEG_QUALITY, gate_id=GATE_IDENTIFIER,
+                 max_queue=30):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_mb * 1024 * 1024
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.gate_id = gate_id
+        self.frames = 0
+        self.dropped = 0
+        self.segments = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pool = FramePool()  # Bursts that back the queue up allocate; idle buffers are capped
+        self._file = None
+        self._path = None
+        self._segment_started = None
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='stream-recorder', daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """Queue a copy of frame for recording; returns False if it was dropped"""
+        if self._queue.full():
+            self.dropped += 1
+            return False
+        buffer = self._pool.acquire(frame.shape, frame.dtype)
+        np.copyto(buffer, frame)
+        try:
+            self._queue.put_nowait((timestamp or time.time(), buffer))
+            return True
+        except queue.Full:
+            self._pool.release(buffer)
+            self.dropped += 1
+            return False
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {'frames': self.frames, 'dropped': self.dropped, 'segments': self.segments}
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            timestamp, frame = item
+            ok, jpeg = cv2.imencode('.jpg', frame, self.params)
+            self._pool.release(frame)
+            if not ok:
+                continue
+            try:
+                self._append(timestamp, jpeg)
+            except OSError as e:
+                print(f"⚠ Recording failed: {e}")
+                self._close_segment()
+                self.dropped += 1
+        self._close_segment()
+
+    def _append(self, timestamp, jpeg):
+        if self._file is None or timestamp - self._segment_started >= self.segment_seconds:
+            self._close_segment()
+            self._open_segment(timestamp)
+        self._file.write(RECORD.pack(timestamp, len(jpeg)))
+        self._file.write(jpeg.tobytes())
+        self.frames += 1
+
+    def _open_segment(self, timestamp):
+        name = f"{self.gate_id}_{datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S_%f')}.seg"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, 'wb')
+        self._file.write(MAGIC)
+        self._segment_started = timestamp
+        self.segments += 1
+        self._enforce_retention()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _enforce_retention(self):
+        """Delete this gate's oldest segments (never the open one) beyond max_bytes
+
+        Other gates recording into the same directory keep their own
+        segments and budgets.
+        """
+        if self.max_bytes <= 0:
+            return
+        paths = list_segments(self.directory, self.gate_id)
+        sizes = [os.path.getsize(path) for path in paths]
+        total = sum(sizes)
+        for path, size in zip(paths, sizes):
+            if total <= self.max_bytes:
+                break
+            if path == self._path:
+                continue
+            os.remove(path)
+            total -= size
+
+
+def list_segments(path, gate_id=None):
+    """Segment files in a directory (oldest first), or the single file given
+
+    gate_id limits a directory to that gate's segments; names sort by start
+    time within one gate.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    paths = []
+    for name in os.listdir(path):
+        match = SEGMENT_NAME.fullmatch(name)
+        if match and (gate_id is None or match.group(1) == gate_id):
+            paths.append((match.group(2), os.path.join(path, name)))
+    return [path for _, path in sorted(paths)]
+
+
+def read_segment(path):
+    """Yield (timestamp, jpeg_bytes) records from one segment"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a stream segment: {path}")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, length = RECORD.unpack(header)
+            jpeg = f.read(length)
+            if len(jpeg) < length:
+                return  # Truncated by a crash
+            yield timestamp, jpeg
+
+
+class ReplayCamera(CameraSource):
+    """Plays one gate's recorded segments back in recorded order
+
+    realtime=True sleeps to reproduce the original frame timing; otherwise
+    frames are returned as fast as they can be decoded. captured_at is the
+    original capture time, so reads carry the timestamps of the incident.
+    """
+
+    def __init__(self, path, realtime=True, gate_id=GATE_IDENTIFIER):
+        self.path = path
+        self.realtime = realtime
+        self.segments = list_segments(path, gate_id)
+        if not self.segments or not os.path.exists(self.segments[0]):
+            raise FileNotFoundError(f"No recorded segments of {gate_id} at {path}")
+
+        self._records = (record for segment in self.segments for record in read_segment(segment))
+        self._first = None  # (recorded timestamp, monotonic start)
+        self._opened = True
+        print(f"✓ Replaying {len(self.segments)} segment(s) from {path} "
+              f"({'original timing' if realtime else 'as fast as possible'})")
+
+    def get_frame(self):
+        record = next(self._records, None)
+        if record is None:
+            self._opened = False
+            return None
+
+        timestamp, jpeg = record
+        if self.realtime:
+            if self._first is None:
+                self._first = (timestamp, time.monotonic())
+            delay = (timestamp - self._first[0]) - (time.monotonic() - self._first[1])
+            if delay > 0:
+                time.sleep(delay)
+
+        self.read_started_at = time.time()
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.captured_at = timestamp
+        return frame
+
+    def release(self):
+        self._opened = False
+
+    def is_opened(self):
+        return self._opened
+
+
+def main(argv):
+    if len(argv) == 2 and argv[0] == 'info':
+        total_frames = 0
+        for segment in list_segments(argv[1]):
+            timestamps = [timestamp for timestamp, _ in read_segment(segment)]
+            total_frames += len(timestamps)
+            duration = timestamps[-1] - timestamps[0] if timestamps else 0.0
+            start = datetime.fromtimestamp(timestamps[0]).isoformat() if timestamps else '-'
+            print(f"{os.path.basename(segment)}: {len(timestamps)} frames, {duration:.1f}s from {start}, "
+                  f"{os.path.getsize(segment) / 1e6:.1f} MB")
+        print(f"Total: {total_frames} frames")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,473 @@
+"""Synthetic plates and traffic for offline load and accuracy testing
+
+Plates are rendered in the configured regional formats (PLATE_FORMATS)
+with randomized fonts, skew, blur, noise and lighting, mounted on simple
+vehicles and composited onto background scenes (images from a directory,
+or procedurally drawn roads when none are given).
+
+Usage:
+    python synthetic.py dataset <out_dir> [count] [--backgrounds DIR] [--fonts DIR]
+    python synthetic.py video <out.avi> [seconds] [--rate VEHICLES_PER_MIN]
+    python synthetic.py eval <dataset_dir> [limit]
+    python main.py --source synthetic
+
+The dataset directory gets one JPEG per scene and labels.jsonl with the
+plate text and bounding box (source pixels) of every plate in it.
+"""
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from camera_sources import CameraSource
+from config import (
+    PLATE_FORMATS,
+    SYNTH_WIDTH,
+    SYNTH_HEIGHT,
+    SYNTH_FPS,
+    SYNTH_VEHICLES_PER_MINUTE,
+    SYNTH_BACKGROUNDS_DIR,
+    SYNTH_FONTS_DIR,
+    SYNTH_SEED
+)
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS = '0123456789'
+
+HERSHEY_FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX]
+
+# Plate (background, text) colors: white, yellow and green plates
+PLATE_COLORS = [((245, 245, 245), (20, 20, 20)), ((40, 200, 235), (20, 20, 20)),
+                ((60, 140, 40), (245, 245, 245))]
+
+VEHICLE_COLORS = [(30, 30, 30), (200, 200, 200), (40, 40, 160), (150, 90, 30), (220, 220, 220), (60, 60, 60)]
+
+
+def random_plate_text(formats, rng):
+    """Random text in one of the formats (L = letter, N = digit, X = either)"""
+    fmt = rng.choice(formats).replace(' ', '')
+    pools = {'L': LETTERS, 'N': DIGITS, 'X': LETTERS + DIGITS}
+    return ''.join(rng.choice(pools[c]) for c in fmt)
+
+
+class PlateRenderer:
+    """Renders plate images for given text with randomized styles
+
+    TrueType fonts (*.ttf / *.otf in fonts_dir) are drawn with Pillow;
+    otherwise OpenCV's Hershey fonts are used.
+    """
+
+    def __init__(self, fonts_dir=SYNTH_FONTS_DIR, height=110):
+        self.height = height
+        self.width = int(height * 3.6)
+        self.ttf_fonts = []
+        if fonts_dir:
+            self.ttf_fonts = sorted(glob.glob(os.path.join(fonts_dir, '*.ttf')) +
+                                    glob.glob(os.path.join(fonts_dir, '*.otf')))
+
+    def render(self, text, rng):
+        """Clean front-facing plate image (BGR)"""
+        background, color = rng.choice(PLATE_COLORS)
+        plate = np.full((self.height, self.width, 3), background, dtype=np.uint8)
+        border = max(2, self.height // 25)
+        cv2.rectangle(plate, (border, border), (self.width - border - 1, self.height - border - 1),
+                      color, border)
+
+        if self.ttf_fonts:
+            self._draw_ttf(plate, text, rng.choice(self.ttf_fonts), color)
+        else:
+            self._draw_hershey(plate, text, rng.choice(HERSHEY_FONTS), rng.choice((2, 3, 4)), color)
+        return plate
+
+    def _draw_hershey(self, plate, text, font, thickness, color):
+        text_height = int(self.height * 0.55)
+        scale = cv2.getFontScaleFromHeight(font, text_height, thickness)
+        (width, _), _ = cv2.getTextSize(text, font, scale, thickness)
+        max_width = int(self.width * 0.8)
+        if width > max_width:
+            scale *= max_width / width
+            (width, _), _ = cv2.getTextSize(text, font, scale, thickness)
+        origin = ((self.width - width) // 2, (self.height + text_height) // 2)
+        cv2.putText(plate, text, origin, font, scale, color, thickness, cv2.LINE_AA)
+
+    def _draw_ttf(self, plate, text, font_path, color):
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.truetype(font_path, int(self.height * 0.7))
+        image = Image.fromarray(plate[:, :, ::-1])
+        draw = ImageDraw.Draw(image)
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        scale = min(1.0, self.width * 0.8 / max(right - left, 1))
+        if scale < 1.0:
+            font = ImageFont.truetype(font_path, int(self.height * 0.7 * scale))
+            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        position = ((self.width - (right - left)) // 2 - left, (self.height - (bottom - top)) // 2 - top)
+        draw.text(position, text, font=font, fill=tuple(int(c) for c in color[::-1]))
+        plate[:] = np.asarray(image)[:, :, ::-1]
+
+
+def degrade(image, rng, blur=2.0, noise=8.0, shadow=0.45):
+    """Camera-like degradations: brightness / gamma, shadow gradient, blur and noise
+
+    Works on uint8 with lookup tables and OpenCV arithmetic so full frames
+    render fast enough for real-time synthetic streams.
+    """
+    # Lighting: gain and gamma in one lookup table, then a shadow across the image
+    gain, gamma = rng.uniform(0.6, 1.25), rng.uniform(0.7, 1.4)
+    lut = np.clip(255.0 * (np.clip(np.arange(256) * gain, 0, 255) / 255.0) ** gamma, 0, 255)
+    out = cv2.LUT(image, lut.astype(np.uint8))
+
+    h, w = out.shape[:2]
+    ramp = np.linspace(255 * rng.uniform(1 - shadow, 1), 255 * rng.uniform(1 - shadow / 3, 1), w)
+    ramp = cv2.resize(ramp.astype(np.uint8)[None, :], (w, h), interpolation=cv2.INTER_NEAREST)
+    out = cv2.multiply(out, cv2.merge([ramp] * out.shape[2]) if out.ndim == 3 else ramp, scale=1 / 255.0)
+
+    # Focus / motion blur
+    sigma = rng.uniform(0, blur)
+    if sigma > 0.3:
+        if rng.random() < 0.5:
+            out = cv2.GaussianBlur(out, (0, 0), sigma)
+        else:
+            length = max(3, int(sigma * 3) | 1)
+            kernel = np.zeros((length, length), np.float32)
+            kernel[length // 2, :] = 1.0 / length
+            out = cv2.filter2D(out, -1, kernel)
+
+    # Sensor noise
+    sigma = rng.uniform(0, noise)
+    if sigma > 0.5:
+        grain = np.empty(out.shape, dtype=np.int16)
+        cv2.setRNGSeed(rng.randrange(2 ** 31))
+        cv2.randn(grain, 0, sigma)
+        out = cv2.add(out, grain, dtype=cv2.CV_8U)
+    return out
+
+
+def skew_plate(plate, rng, amount=0.08):
+    """Random perspective warp; returns (warped, mask)"""
+    h, w = plate.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    jitter = np.float32([[rng.uniform(-amount, amount) * w, rng.uniform(-amount, amount) * h]
+                         for _ in range(4)])
+    dst = src + jitter
+    dst -= dst.min(axis=0)
+    size = (int(np.ceil(dst[:, 0].max())) + 1, int(np.ceil(dst[:, 1].max())) + 1)
+    matrix = cv2.getPerspectiveTransform(src, dst)
+    warped = cv2.warpPerspective(plate, matrix, size)
+    mask = cv2.warpPerspective(np.full((h, w), 255, np.uint8), matrix, size)
+    return warped, mask
+
+
+def procedural_background(width, height, rng):
+    """Road scene: asphalt with lane markings below a sky / wall band"""
+    scene = np.empty((height, width, 3), dtype=np.uint8)
+    horizon = int(height * rng.uniform(0.15, 0.35))
+    scene[:horizon] = rng.choice([(180, 160, 140), (120, 120, 120), (90, 110, 90)])
+    scene[horizon:] = rng.randint(70, 110)
+    for x in range(int(width * 0.1), width, int(width * 0.3)):
+        cv2.line(scene, (x, horizon), (x + rng.randint(-40, 40), height), (200, 200, 200), 6)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 6, scene.shape)
+    return np.clip(scene + noise, 0, 255).astype(np.uint8)
+
+
+class SceneGenerator:
+    """Composes vehicles carrying synthetic plates onto background scenes"""
+
+    def __init__(self, width=SYNTH_WIDTH, height=SYNTH_HEIGHT, formats=PLATE_FORMATS,
+                 backgrounds_dir=SYNTH_BACKGROUNDS_DIR, fonts_dir=SYNTH_FONTS_DIR, seed=SYNTH_SEED):
+        self.width = width
+        self.height = height
+        self.formats = [f for f in formats.split(',') if f.strip()] or ['LLL NNNN']
+        self.rng = random.Random(seed)
+        self.renderer = PlateRenderer(fonts_dir)
+        self.backgrounds = []
+        if backgrounds_dir:
+            for path in sorted(glob.glob(os.path.join(backgrounds_dir, '*'))):
+                image = cv2.imread(path)
+                if image is not None:
+                    self.backgrounds.append(cv2.resize(image, (width, height)))
+
+    def background(self):
+        if self.backgrounds:
+            return self.rng.choice(self.backgrounds).copy()
+        return procedural_background(self.width, self.height, self.rng)
+
+    def vehicle(self, plate_width=None):
+        """A vehicle sprite (rear view) with its plate; returns (sprite, mask, text, plate_bbox)"""
+        rng = self.rng
+        text = random_plate_text(self.formats, rng)
+        plate = degrade(self.renderer.render(text, rng), rng, blur=1.0, noise=4.0, shadow=0.2)
+
+        plate_width = plate_width or rng.randint(int(self.width * 0.08), int(self.width * 0.14))
+        plate = cv2.resize(plate, (plate_width, int(plate_width * plate.shape[0] / plate.shape[1])),
+                           interpolation=cv2.INTER_AREA)
+        plate, plate_mask = skew_plate(plate, rng)
+
+        body_w = int(plate.shape[1] * rng.uniform(3.5, 4.5))
+        body_h = int(body_w * rng.uniform(0.55, 0.75))
+        sprite = np.zeros((body_h, body_w, 3), dtype=np.uint8)
+        mask = np.zeros((body_h, body_w), dtype=np.uint8)
+        color = rng.choice(VEHICLE_COLORS)
+        cv2.rectangle(sprite, (0, body_h // 4), (body_w - 1, body_h - 1), color, -1)
+        cv2.rectangle(sprite, (body_w // 8, 0), (body_w * 7 // 8, body_h // 3), color, -1)
+        cv2.rectangle(sprite, (body_w // 6, body_h // 20), (body_w * 5 // 6, body_h // 3 - 4), (60, 50, 40), -1)
+        cv2.rectangle(mask, (0, body_h // 4), (body_w - 1, body_h - 1), 255, -1)
+        cv2.rectangle(mask, (body_w // 8, 0), (body_w * 7 // 8, body_h // 3), 255, -1)
+        for x in (body_w // 12, body_w * 9 // 12):  # Tail lights
+            cv2.rectangle(sprite, (x, body_h // 3), (x + body_w // 7, body_h // 2), (30, 30, 200), -1)
+
+        px = (body_w - plate.shape[1]) // 2
+        py = int(body_h * 0.62)
+        py = min(py, body_h - plate.shape[0] - 2)
+        region = sprite[py:py + plate.shape[0], px:px + plate.shape[1]]
+        np.copyto(region, plate, where=plate_mask[:, :, None] > 0)
+        bbox = (px, py, px + plate.shape[1], py + plate.shape[0])
+        return sprite, mask, text, bbox
+
+    def lane_x(self, lane, lanes, sprite_width):
+        """Random x for a vehicle inside one of `lanes` side-by-side lanes"""
+        lane_width = self.width // lanes
+        return lane * lane_width + self.rng.randint(0, max(0, lane_width - sprite_width))
+
+    def scene(self, vehicles=1, plate_width=None):
+        """A degraded still scene; returns (image, [{'plate', 'bbox'}])
+
+        Vehicles get a lane each so no plate is hidden behind another car.
+        plate_width (source pixels) fixes the plate size; random by default.
+        """
+        image = self.background()
+        labels = []
+        for lane in range(vehicles):
+            sprite, mask, text, bbox = self.vehicle(plate_width)
+            h, w = sprite.shape[:2]
+            x = self.lane_x(lane, vehicles, w)
+            y = self.rng.randint(int(self.height * 0.25), max(int(self.height * 0.25), self.height - h))
+            labels.append({'plate': text, 'bbox': paste(image, sprite, mask, x, y, bbox)})
+        return degrade(image, self.rng), labels
+
+
+def paste(image, sprite, mask, x, y, bbox=None):
+    """Composite sprite at (x, y), clipped to the image; returns bbox moved into image coords"""
+    h, w = sprite.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, image.shape[1]), min(y + h, image.shape[0])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    region = image[y0:y1, x0:x1]
+    np.copyto(region, sprite[y0 - y:y1 - y, x0 - x:x1 - x], where=mask[y0 - y:y1 - y, x0 - x:x1 - x, None] > 0)
+    if bbox is None:
+        return None
+    bx0, by0 = max(bbox[0] + x, 0), max(bbox[1] + y, 0)
+    bx1, by1 = min(bbox[2] + x, image.shape[1]), min(bbox[3] + y, image.shape[0])
+    if bx1 - bx0 < (bbox[2] - bbox[0]) or by1 - by0 < (bbox[3] - bbox[1]):
+        return None  # Plate partly out of frame: not a readable ground truth
+    return [int(bx0), int(by0), int(bx1), int(by1)]
+
+
+class SyntheticTraffic:
+    """Vehicles driving through a fixed scene towards the camera, frame by frame
+
+    Arrivals are Poisson with vehicles_per_minute, spread over `lanes`; each
+    vehicle crosses the frame from top to bottom in about cross_seconds and
+    enters its lane only once the previous vehicle there has moved on.
+    frame() returns the image and the ground truth of all fully visible
+    plates.
+    """
+
+    def __init__(self, generator=None, fps=SYNTH_FPS, vehicles_per_minute=SYNTH_VEHICLES_PER_MINUTE,
+                 cross_seconds=3.0, lanes=2):
+        self.generator = generator or SceneGenerator()
+        self.fps = fps
+        self.rate = vehicles_per_minute / 60.0 / fps  # Arrivals per frame
+        self.speed = self.generator.height * 1.2 / (cross_seconds * fps)  # Pixels per frame
+        self.scene = self.generator.background()
+        self.lanes = lanes
+        self.vehicles = []  # [sprite, mask, text, bbox, x, y, lane]
+        self.waiting = 0  # Arrivals queued for a free lane
+        self.frame_number = 0
+        self.seen = set()  # Plates that were fully visible at least once
+
+    def frame(self):
+        gen = self.generator
+        self.frame_number += 1
+        if self.rate > 0 and gen.rng.random() < self.rate:
+            self.waiting += 1
+
+        busy = {v[6] for v in self.vehicles if v[5] < 0}  # Lanes whose last vehicle is still entering
+        free = [lane for lane in range(self.lanes) if lane not in busy]
+        while self.waiting and free:
+            lane = free.pop(gen.rng.randrange(len(free)))
+            sprite, mask, text, bbox = gen.vehicle()
+            x = gen.lane_x(lane, self.lanes, sprite.shape[1])
+            self.vehicles.append([sprite, mask, text, bbox, x, float(-sprite.shape[0]), lane])
+            self.waiting -= 1
+
+        image = self.scene.copy()
+        labels = []
+        for vehicle in self.vehicles:
+            sprite, mask, text, bbox, x, y, _ = vehicle
+            vehicle[5] = y + self.speed
+            visible = paste(image, sprite, mask, x, int(y), bbox)
+            if visible is not None:
+                labels.append({'plate': text, 'bbox': visible})
+                self.seen.add(text)
+        self.vehicles = [v for v in self.vehicles if v[5] < gen.height]
+        return degrade(image, gen.rng, blur=1.2, noise=5.0), labels
+
+
+class SyntheticCamera(CameraSource):
+    """Camera source backed by SyntheticTraffic, paced to its frame rate
+
+    realtime=False returns frames as fast as they are rendered; frames
+    (optional) ends the stream after that many frames. Ground truth of the
+    last frame is kept in self.labels.
+    """
+
+    def __init__(self, traffic=None, realtime=True, frames=None):
+        self.traffic = traffic or SyntheticTraffic()
+        self.realtime = realtime
+        self.frames = frames
+        self.labels = []
+        self._started = None
+        self._opened = True
+        print(f"✓ Synthetic camera: {self.traffic.generator.width}x{self.traffic.generator.height} "
+              f"@ {self.traffic.fps:g} fps")
+
+    def get_frame(self):
+        if self.frames is not None and self.traffic.frame_number >= self.frames:
+            self._opened = False
+            return None
+
+        if self.realtime:
+            if self._started is None:
+                self._started = time.monotonic()
+            delay = self.traffic.frame_number / self.traffic.fps - (time.monotonic() - self._started)
+            if delay > 0:
+                time.sleep(delay)
+
+        self.read_started_at = time.time()
+        frame, self.labels = self.traffic.frame()
+        self.captured_at = time.time()
+        if self.pool is not None:
+            buffer = self.pool.acquire(frame.shape)
+            np.copyto(buffer, frame)
+            frame = buffer
+        return frame
+
+    def release(self):
+        self._opened = False
+
+    def is_opened(self):
+        return self._opened
+
+
+def write_dataset(out_dir, count, generator=None):
+    """Render `count` labeled scenes into out_dir (images + labels.jsonl)"""
+    generator = generator or SceneGenerator()
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'labels.jsonl'), 'w', encoding='utf-8') as labels_file:
+        for i in range(count):
+            image, labels = generator.scene(vehicles=generator.rng.choice((1, 1, 1, 2)))
+            name = f"scene_{i:05d}.jpg"
+            cv2.imwrite(os.path.join(out_dir, name), image)
+            labels_file.write(json.dumps({'image': name, 'plates': [l for l in labels if l['bbox']]}) + '\n')
+    print(f"✓ {count} scenes written to {out_dir}")
+
+
+def write_video(path, seconds, traffic=None):
+    traffic = traffic or SyntheticTraffic()
+    gen = traffic.generator
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), traffic.fps, (gen.width, gen.height))
+    for _ in range(int(seconds * traffic.fps)):
+        writer.write(traffic.frame()[0])
+    writer.release()
+    print(f"✓ {seconds}s of traffic ({len(traffic.seen)} plates) written to {path}")
+
+
+def evaluate(dataset_dir, limit=None):
+    """Run LicensePlateDetector over a dataset: detection recall, read accuracy, throughput"""
+    from detector import LicensePlateDetector
+    from frame_context import FrameContext
+    from quality import iou
+    from config import RESIZE_WIDTH
+
+    detector = LicensePlateDetector()
+    with open(os.path.join(dataset_dir, 'labels.jsonl'), encoding='utf-8') as f:
+        records = [json.loads(line) for line in f][:limit]
+
+    plates = found = read = 0
+    detect_seconds = ocr_seconds = 0.0
+    for record in records:
+        ctx = FrameContext(cv2.imread(os.path.join(dataset_dir, record['image'])))
+        work = ctx.working(RESIZE_WIDTH)
+
+        started = time.perf_counter()
+        detections = detector.detect_plates(work)
+        detect_seconds += time.perf_counter() - started
+
+        boxes = [work.to_source(d['bbox']) for d in detections]
+        for label in record['plates']:
+            plates += 1
+            matches = [box for box in boxes if iou(box, label['bbox']) > 0.3]
+            if not matches:
+                continue
+            found += 1
+            box = max(matches, key=lambda b: iou(b, label['bbox']))
+            started = time.perf_counter()
+            text = detector.extract_text(ctx.crop(box), ctx.gray_crop(box))
+            ocr_seconds += time.perf_counter() - started
+            read += text == label['plate']
+
+    images = max(len(records), 1)
+    print(f"Scenes: {len(records)} | plates: {plates}")
+    print(f"Detection recall: {found}/{plates} ({100.0 * found / max(plates, 1):.1f}%)")
+    print(f"Exact reads: {read}/{plates} ({100.0 * read / max(plates, 1):.1f}%) | "
+          f"of detected: {100.0 * read / max(found, 1):.1f}%")
+    print(f"Detection: {1000 * detect_seconds / images:.1f} ms/scene | "
+          f"OCR: {1000 * ocr_seconds / max(found, 1):.1f} ms/plate")
+    if detector.remote_ocr is not None:
+        detector.remote_ocr.close()
+    return {'plates': plates, 'found': found, 'read': read}
+
+
+def _option(argv, name, default):
+    if name in argv:
+        i = argv.index(name)
+        value = argv[i + 1]
+        del argv[i:i + 2]
+        return value
+    return default
+
+
+def main(argv):
+    argv = list(argv)
+    backgrounds = _option(argv, '--backgrounds', SYNTH_BACKGROUNDS_DIR)
+    fonts = _option(argv, '--fonts', SYNTH_FONTS_DIR)
+    rate = float(_option(argv, '--rate', SYNTH_VEHICLES_PER_MINUTE))
+
+    if len(argv) >= 2 and argv[0] == 'dataset':
+        count = int(argv[2]) if len(argv) > 2 else 200
+        write_dataset(argv[1], count, SceneGenerator(backgrounds_dir=backgrounds, fonts_dir=fonts))
+        return 0
+
+    if len(argv) >= 2 and argv[0] == 'video':
+        seconds = float(argv[2]) if len(argv) > 2 else 60
+        generator = SceneGenerator(backgrounds_dir=backgrounds, fonts_dir=fonts)
+        write_video(argv[1], seconds, SyntheticTraffic(generator, vehicles_per_minute=rate))
+        return 0
+
+    if len(argv) >= 2 and argv[0] == 'eval':
+        evaluate(argv[1], int(argv[2]) if len(argv) > 2 else None)
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
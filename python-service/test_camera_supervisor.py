@@ -0,0 +1,156 @@
+"""Exercise the camera supervisor with simulated camera failures
+
+No camera needed: a fake source delivers frames, then freezes or closes
+like a rebooting IP camera, and refuses connections for a while.
+
+Usage: python test_camera_supervisor.py   (or python -m pytest)
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from camera_sources import CameraSource
+from camera_supervisor import CameraSupervisor
+from frame_pool import FramePool
+
+
+class FakeCamera(CameraSource):
+    """Delivers `frames` frames at ~100 fps, then stalls ('freeze') or closes ('close')
+
+    A frozen read blocks like an RTSP read on a dead camera: until the
+    backend's own timeout (1 s here) gives up.
+    """
+
+    def __init__(self, frames, failure):
+        self.remaining = frames
+        self.failure = failure
+        self.opened = True
+        self.released = threading.Event()
+
+    def get_frame(self):
+        time.sleep(0.01)
+        if self.remaining > 0:
+            self.remaining -= 1
+            self.read_started_at = self.captured_at = time.time()
+            frame = self.pool.acquire((48, 64, 3)) if self.pool is not None else np.empty((48, 64, 3), np.uint8)
+            frame[:] = 0
+            return frame
+        if self.failure == 'freeze':
+            time.sleep(1.0)
+        self.opened = False
+        return None
+
+    def release(self):
+        self.opened = False
+        self.released.set()
+
+    def is_opened(self):
+        return self.opened
+
+
+class FakeCameraFactory:
+    """Each connection fails with `failure`; the first `refuse` reconnects are refused"""
+
+    def __init__(self, frames, failure, refuse):
+        self.frames = frames
+        self.failure = failure
+        self.refuse = refuse
+        self.attempts = 0
+        self.cameras = []
+
+    def __call__(self):
+        self.attempts += 1
+        if 1 < self.attempts <= 1 + self.refuse:
+            raise ConnectionError("connection refused")
+        camera = FakeCamera(self.frames, self.failure)
+        self.cameras.append(camera)
+        return camera
+
+
+def consume(supervisor, seconds):
+    frames = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        frame = supervisor.get_frame()
+        if frame is not None:
+            frames += 1
+            supervisor.release_frame(frame)
+    return frames
+
+
+def check(name, condition):
+    print(f"  {'✓' if condition else '❌'} {name}")
+    return condition
+
+
+def main():
+    ok = True
+    print("📷 Camera supervisor vs simulated failures")
+    print("=" * 60)
+
+    # Stream freezes: stall detected, capture reopened after refused attempts
+    pool = FramePool()
+    factory = FakeCameraFactory(frames=30, failure='freeze', refuse=2)
+    supervisor = CameraSupervisor(factory, pool=pool, stall_timeout=0.5,
+                                  reconnect_min=0.1, reconnect_max=0.4, frame_wait=0.2)
+    frames = consume(supervisor, 3.0)
+    stats = supervisor.stats()
+    ok &= check("frames keep coming after freezes", frames > 45 and factory.attempts >= 4)
+    ok &= check("outages recorded", stats['outages'] >= 1 and 'stalled' in supervisor.outages[0]['reason'])
+    ok &= check("recovery within seconds", stats['longest_outage_s'] < 2.0)
+    supervisor.release()
+    ok &= check("release() stops the supervisor", not supervisor.is_opened())
+    time.sleep(1.2)
+    ok &= check("frozen captures released once their read returns",
+                all(c.released.is_set() for c in factory.cameras))
+
+    # Stream closes: reconnect without waiting for the stall timeout
+    factory = FakeCameraFactory(frames=20, failure='close', refuse=0)
+    supervisor = CameraSupervisor(factory, stall_timeout=5, reconnect_min=0.05, frame_wait=0.2)
+    consume(supervisor, 1.5)
+    stats = supervisor.stats()
+    ok &= check("closed stream reopened immediately",
+                stats['outages'] >= 2 and stats['longest_outage_s'] < 1.0)
+    supervisor.release()
+
+    # Idle lane: an outage ends when drained frames flow again, not at the next kept frame
+    factory = FakeCameraFactory(frames=1000, failure='close', refuse=1)
+    supervisor = CameraSupervisor(factory, reconnect_min=0.2, frame_wait=0.2)
+    supervisor.idle = True
+    time.sleep(0.5)
+    factory.cameras[0].remaining = 0  # Closes while idle; the reconnect is refused once
+    time.sleep(1.0)
+    stats = supervisor.stats()
+    ok &= check("outage ends while idle", supervisor.connected and stats['outages'] == 1
+                and stats['longest_outage_s'] < 0.8)
+    supervisor.release()
+
+    # Slow consumer: only the newest frame is kept, older ones go back to the pool
+    pool = FramePool()
+    factory = FakeCameraFactory(frames=1000, failure='close', refuse=0)
+    supervisor = CameraSupervisor(factory, pool=pool, frame_wait=0.5)
+    time.sleep(0.5)
+    frame = supervisor.get_frame()
+    ok &= check("slow consumer gets the latest frame", frame is not None and supervisor.dropped > 10)
+    ok &= check("dropped frames are reused", pool.stats()['reuses'] > 10)
+    supervisor.release_frame(frame)
+    supervisor.release()
+
+    print("=" * 60)
+    print("✓ All checks passed" if ok else "❌ Some checks failed")
+    return 0 if ok else 1
+
+
+def test_camera_supervisor():
+    """Entry point for pytest (pytest.ini collects this script)"""
+    assert main() == 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
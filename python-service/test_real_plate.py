@@ -119,9 +119,13 @@ def main():
     frame_count = 0
     last_detection_time = 0
     
+    # Capture and display buffers are reused across frames
+    frame = None
+    display_resized = np.empty((540, 960, 3), dtype=np.uint8)
+    
     try:
         while True:
-            ret, frame = cap.read()
+            ret, frame = cap.read(frame)
             
             if not ret:
                 print("[WARNING] Cannot read frame")
@@ -185,8 +189,8 @@ def main():
                     # Draw all potential plate regions (for debugging)
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 255), 2)
             
-            # Display frame
-            display = frame.copy()
+            # Display frame (drawn in place - the buffer is refilled next read)
+            display = frame
             
             # Add info overlay
             cv2.putText(display, f"Detections: {detection_count}", (10, 30), 
@@ -203,7 +207,7 @@ def main():
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
             
             # Resize for display
-            display_resized = cv2.resize(display, (960, 540))
+            display_resized = cv2.resize(display, (960, 540), dst=display_resized)
             cv2.imshow('License Plate Detection - Point at Real Plate', display_resized)
             
             if cv2.waitKey(1) & 0xFF == ord('q'):
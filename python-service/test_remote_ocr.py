@@ -0,0 +1,175 @@
+"""Exercise the remote OCR client against a local stub HTTP server
+
+No API keys or network needed: the stub answers like OCR.space and Plate
+Recognizer, and can be told to be slow or to fail.
+
+Usage: python test_remote_ocr.py   (or python -m pytest)
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from remote_ocr import RemoteOCRClient, OCRSpaceProvider, PlateRecognizerProvider
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """POST /ocrspace or /platerecognizer; behaviour set on the server"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.calls += 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.server.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.path.startswith('/platerecognizer'):
+            body = {'results': [{'plate': 'nbc1234'}]}
+            status = 201
+        else:
+            body = {'ParsedResults': [{'ParsedText': 'NBC 1234\n'}]}
+            status = 200
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up at its deadline
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.calls = 0
+    server.delay = 0
+    server.fail = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for_results(client, expected, timeout=5):
+    results = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        results.extend(client.poll())
+        if len(results) >= expected or client.stats()['pending'] == 0:
+            break
+        time.sleep(0.02)
+    return results
+
+
+def check(name, condition):
+    print(f"  {'✓' if condition else '❌'} {name}")
+    return condition
+
+
+def main():
+    server = start_stub()
+    base = f"http://127.0.0.1:{server.server_port}"
+    crop = np.full((40, 160, 3), 255, dtype=np.uint8)
+    ok = True
+
+    print("🌐 Remote OCR client vs stub server")
+    print("=" * 60)
+
+    # Happy path through both providers
+    client = RemoteOCRClient([OCRSpaceProvider('key', f"{base}/ocrspace")], timeout=2)
+    client.submit(crop, context='a')
+    results = wait_for_results(client, 1)
+    ok &= check("OCR.space read returned asynchronously", results == [('a', 'NBC 1234\n')])
+    client.close()
+
+    client = RemoteOCRClient([PlateRecognizerProvider('token', f"{base}/platerecognizer")], timeout=2)
+    client.submit(crop, context='b')
+    ok &= check("Plate Recognizer read returned", wait_for_results(client, 1) == [('b', 'NBC1234')])
+    client.close()
+
+    # Submitting never blocks, even when the server is slow
+    server.delay = 1.5
+    client = RemoteOCRClient([OCRSpaceProvider('key', f"{base}/ocrspace")], timeout=0.5, max_concurrency=1)
+    started = time.time()
+    client.submit(crop, context='slow')
+    ok &= check("submit() returns immediately", time.time() - started < 0.2)
+    results = wait_for_results(client, 1, timeout=3)
+    ok &= check("slow call dropped at its deadline", results == [])
+    client.close()
+
+    # Concurrency cap and pending limit
+    client = RemoteOCRClient([OCRSpaceProvider('key', f"{base}/ocrspace")], timeout=3,
+                             max_concurrency=1, max_pending=2)
+    accepted = [client.submit(crop) for _ in range(4)]
+    ok &= check("pending limit rejects extra crops", accepted == [True, True, False, False])
+    client.close()
+    server.delay = 0
+    time.sleep(3.5)  # Let the stub finish the abandoned slow calls
+
+    # Circuit breaker
+    server.fail = True
+    server.calls = 0
+    client = RemoteOCRClient([OCRSpaceProvider('key', f"{base}/ocrspace")], timeout=2, max_concurrency=1)
+    for breaker in client.breakers.values():
+        breaker.failures, breaker.cooldown = 2, 0.5
+    for _ in range(2):
+        client.submit(crop)
+        wait_for_results(client, 1, timeout=1)
+    ok &= check("breaker opens after repeated failures", client.stats()['breakers']['ocrspace'] == 'open')
+    ok &= check("open breaker stops calls", not client.submit(crop) and server.calls == 2)
+
+    server.fail = False
+    time.sleep(0.6)
+    client.submit(crop, context='retry')
+    ok &= check("half-open trial succeeds and closes breaker",
+                wait_for_results(client, 1) == [('retry', 'NBC 1234\n')]
+                and client.stats()['breakers']['ocrspace'] == 'closed')
+    client.close()
+
+    # Hourly budget
+    client = RemoteOCRClient([OCRSpaceProvider('key', f"{base}/ocrspace")], hourly_budget=3)
+    accepted = [client.submit(crop) for _ in range(5)]
+    ok &= check("hourly budget caps calls", accepted.count(True) == 3 and client.stats()['over_budget'] == 2)
+    wait_for_results(client, 3)
+    client.close()
+
+    # Every provider call is billed, including fall-through to the next provider
+    dead = OCRSpaceProvider('key', 'http://127.0.0.1:9/ocrspace')  # Connection refused
+    client = RemoteOCRClient([dead, OCRSpaceProvider('key', f"{base}/ocrspace")], timeout=2, hourly_budget=3)
+    server.calls = 0
+    client.submit(crop, context='fallthrough')
+    ok &= check("fall-through read returned", wait_for_results(client, 1) == [('fallthrough', 'NBC 1234\n')])
+    ok &= check("each provider call is billed", client.stats()['calls_last_hour'] == 2)
+    client.submit(crop)
+    wait_for_results(client, 1)
+    ok &= check("spent budget refuses the next provider",
+                server.calls == 1 and client.stats()['calls_last_hour'] == 3 and client.stats()['over_budget'] == 1)
+    client.close()
+
+    server.shutdown()
+    print("=" * 60)
+    print("✓ All checks passed" if ok else "❌ Some checks failed")
+    return 0 if ok else 1
+
+
+def test_remote_ocr():
+    """Entry point for pytest (pytest.ini collects this script)"""
+    assert main() == 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""CPU thread budget and core affinity for the pipeline's libraries and threads
+
+OpenCV, Tesseract (OpenMP) and torch each size their thread pools to every
+core on the box, so a few pipelines (or OCR workers) side by side run many
+times more threads than there are cores. apply() caps them:
+
+    CPU_THREADS=2      OpenCV and torch use 2 threads, Tesseract 1
+    CPU_AFFINITY=capture=0 detect=1-2 ocr=3
+                       Capture, detection and OCR threads run on their own
+                       cores and each library is sized to its role's cores
+    CPU_AFFINITY=auto  The same, split over the cores this process may use
+
+Usage:
+    python thread_budget.py bench [processes] [seconds]
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from config import CPU_THREADS, CPU_AFFINITY
+
+ROLES = ('capture', 'detect', 'ocr')
+
+# Role -> set of cores, once apply() has parsed CPU_AFFINITY
+_profile = {}
+
+
+def parse_cores(text):
+    """'0,2-3' -> {0, 2, 3}"""
+    cores = set()
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-')
+            cores.update(range(int(first), int(last) + 1))
+        elif part:
+            cores.add(int(part))
+    return cores
+
+
+def parse_profile(text, available):
+    """Role -> cores from 'capture=0 detect=1-2 ocr=3' or 'auto'"""
+    if not text:
+        return {}
+    cores = sorted(available)
+    if text == 'auto':
+        if len(cores) < 3:
+            return {}  # Nothing to separate on one or two cores
+        ocr = max(1, (len(cores) - 1) // 3)
+        return {'capture': {cores[0]}, 'detect': set(cores[1:len(cores) - ocr]),
+                'ocr': set(cores[len(cores) - ocr:])}
+
+    profile = {}
+    for item in text.replace(';', ' ').split():
+        role, _, spec = item.partition('=')
+        if role not in ROLES:
+            raise ValueError(f"Unknown CPU_AFFINITY role '{role}' (expected {', '.join(ROLES)})")
+        profile[role] = parse_cores(spec) & set(cores)
+        if not profile[role]:
+            raise ValueError(f"CPU_AFFINITY gives '{role}' no usable cores: {spec}")
+    return profile
+
+
+def apply(threads=CPU_THREADS, affinity=CPU_AFFINITY):
+    """Cap library thread pools and load the affinity profile; returns a summary"""
+    global _profile
+    can_pin = hasattr(os, 'sched_setaffinity')
+    available = os.sched_getaffinity(0) if can_pin else set(range(os.cpu_count() or 1))
+    if affinity and not can_pin:
+        print("⚠ CPU_AFFINITY needs Linux; ignoring it")
+        affinity = ''
+    _profile = parse_profile(affinity, available)
+
+    # Each library gets the cores of the role it serves, or the flat budget
+    detect_threads = len(_profile['detect']) if 'detect' in _profile else threads
+    ocr_threads = len(_profile['ocr']) if 'ocr' in _profile else (1 if threads else 0)
+    summary = {}
+
+    if detect_threads:
+        cv2.setNumThreads(detect_threads)
+        summary['opencv'] = detect_threads
+
+    if ocr_threads:
+        # Read by each Tesseract process when pytesseract starts it
+        os.environ['OMP_THREAD_LIMIT'] = str(ocr_threads)
+        summary['tesseract'] = ocr_threads
+
+    if detect_threads and _torch_installed():
+        try:
+            import torch
+            torch.set_num_threads(detect_threads)
+            summary['torch'] = detect_threads
+            torch.set_num_interop_threads(1)
+        except (ImportError, RuntimeError):
+            pass  # Interop threads can only be set before torch's first parallel call
+
+    if _profile:
+        # Affinity is per thread and new threads inherit their creator's, so
+        # the calling thread stays on the union of the roles: helpers it
+        # starts later (HTTP, recorder, writers, ...) get the union too. The
+        # frame loop narrows itself to the detect cores per stage with
+        # cpu_role(); capture and OCR worker threads pin() themselves.
+        os.sched_setaffinity(0, set().union(*_profile.values()))
+        summary['affinity'] = {role: _format_cores(cores) for role, cores in _profile.items()}
+
+    return summary
+
+
+def pin(role):
+    """Restrict the calling thread to the cores of role (no-op without a profile)"""
+    cores = _profile.get(role)
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+
+@contextmanager
+def cpu_role(role):
+    """Run a stage of the calling thread on a role's cores
+
+    Processes started inside (e.g. Tesseract) inherit those cores.
+    """
+    cores = _profile.get(role)
+    if not cores:
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cores)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def _torch_installed():
+    try:
+        import importlib.util
+        return importlib.util.find_spec('torch') is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _format_cores(cores):
+    return ','.join(str(core) for core in sorted(cores))
+
+
+def _bench_worker(threads, start, deadline, results):
+    """Detection-style OpenCV work on a 720p frame between start and deadline; reports frames done"""
+    if threads:
+        cv2.setNumThreads(threads)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    time.sleep(max(0.0, start - time.time()))
+    frames = 0
+    while time.time() < deadline:
+        small = cv2.resize(frame, (960, 540), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        filtered = cv2.bilateralFilter(gray, 11, 17, 17)
+        cv2.Canny(cv2.GaussianBlur(filtered, (5, 5), 0), 30, 200)
+        frames += 1
+    results.put(frames)
+
+
+def benchmark(processes, seconds, threads):
+    import multiprocessing as mp
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    start = time.time() + 3  # Spawned interpreters need a moment to start
+    workers = [ctx.Process(target=_bench_worker, args=(threads, start, start + seconds, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    frames = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return frames / seconds
+
+
+def main(argv):
+    if argv and argv[0] == 'bench':
+        processes = int(argv[1]) if len(argv) > 1 else os.cpu_count() or 1
+        seconds = float(argv[2]) if len(argv) > 2 else 10
+        print(f"{processes} pipeline processes on {os.cpu_count()} CPUs, {seconds:g}s each")
+        free = benchmark(processes, seconds, 0)
+        print(f"  default thread pools:    {free:7.1f} frames/s")
+        budget = max(1, (os.cpu_count() or 1) // processes)
+        capped = benchmark(processes, seconds, budget)
+        print(f"  {budget} thread(s) per process: {capped:7.1f} frames/s ({capped / free - 1:+.0%})")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
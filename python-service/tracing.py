@@ -0,0 +1,179 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from itertools import count
+
+from config import (
+    TRACE_ENABLED,
+    TRACE_FILE,
+    TRACE_MAX_EVENTS,
+    TRACE_MAX_FILES
+)
+
+
+class Tracer:
+    """Per-frame / per-plate spans written as Chrome trace JSON
+
+    Open the files in chrome://tracing or ui.perfetto.dev. Every frame and
+    every plate candidate gets a trace id; spans opened inside span() inherit
+    the current id of their thread, so OCR internals are attributed to the
+    candidate being read without passing ids around. Timestamps are wall
+    clock (time.time()) so capture times reported by the camera line up.
+
+    Events are buffered in memory; every max_events they are written to a
+    new file in the background and only the newest max_files are kept.
+    """
+
+    enabled = True
+
+    def __init__(self, path=TRACE_FILE, max_events=TRACE_MAX_EVENTS, max_files=TRACE_MAX_FILES):
+        self.path = path
+        self.max_events = max_events
+        self.max_files = max_files
+        self.pid = os.getpid()
+        self._ids = count(1)
+        self._events = []
+        self._named_threads = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writers = []
+        self._file_index = 0
+        self._session = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def new_id(self):
+        return next(self._ids)
+
+    @property
+    def current_id(self):
+        return getattr(self._local, 'trace_id', None)
+
+    @contextmanager
+    def span(self, name, trace_id=None, **args):
+        """Time the enclosed block; nested spans inherit trace_id"""
+        parent = self.current_id
+        if trace_id is None:
+            trace_id = parent
+        self._local.trace_id = trace_id
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._local.trace_id = parent
+            self.add_span(name, start, time.time(), trace_id, **args)
+
+    def add_span(self, name, start, end, trace_id=None, **args):
+        """Record a span timed elsewhere (e.g. the camera read)"""
+        self._record({'name': name, 'ph': 'X', 'ts': int(start * 1e6),
+                      'dur': max(0, int((end - start) * 1e6)), 'args': self._args(trace_id, args)})
+
+    def add_flow(self, name, start, end, trace_id, **args):
+        """Record an async span on its own track, e.g. capture to API ack of one plate"""
+        args = self._args(trace_id, args)
+        self._record({'name': name, 'cat': 'plate', 'ph': 'b', 'id': trace_id,
+                      'ts': int(start * 1e6), 'args': args})
+        self._record({'name': name, 'cat': 'plate', 'ph': 'e', 'id': trace_id,
+                      'ts': int(end * 1e6), 'args': {}})
+
+    def instant(self, name, trace_id=None, **args):
+        if trace_id is None:
+            trace_id = self.current_id
+        self._record({'name': name, 'ph': 'i', 's': 't', 'ts': int(time.time() * 1e6),
+                      'args': self._args(trace_id, args)})
+
+    @staticmethod
+    def _args(trace_id, args):
+        if trace_id is not None:
+            args['trace_id'] = trace_id
+        return args
+
+    def _record(self, event):
+        thread = threading.current_thread()
+        event['pid'] = self.pid
+        event['tid'] = thread.ident
+        with self._lock:
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)
+                self._events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                                     'tid': thread.ident, 'args': {'name': thread.name}})
+            self._events.append(event)
+            if len(self._events) < self.max_events:
+                return
+            events, self._events = self._events, []
+            self._named_threads = set()
+        self._write_async(events)
+
+    def _write_async(self, events):
+        writer = threading.Thread(target=self._write, args=(events,), name='trace-writer', daemon=True)
+        self._writers = [w for w in self._writers if w.is_alive()] + [writer]
+        writer.start()
+
+    def _write(self, events):
+        with self._lock:
+            self._file_index += 1
+            index = self._file_index
+        stem, ext = os.path.splitext(self.path)
+        path = f"{stem}_{self._session}_{index:04d}{ext or '.json'}"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+        # Rolling retention across sessions
+        files = sorted(glob.glob(f"{stem}_*{ext or '.json'}"), key=os.path.getmtime)
+        for old in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def close(self):
+        """Write buffered events and wait for pending writes"""
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            self._write(events)
+        for writer in self._writers:
+            writer.join()
+
+
+class NullTracer:
+    """Tracing disabled: every call is a no-op"""
+
+    enabled = False
+    current_id = None
+    _span = nullcontext()
+
+    def new_id(self):
+        return None
+
+    def span(self, name, trace_id=None, **args):
+        return self._span
+
+    def add_span(self, name, start, end, trace_id=None, **args):
+        pass
+
+    def add_flow(self, name, start, end, trace_id, **args):
+        pass
+
+    def instant(self, name, trace_id=None, **args):
+        pass
+
+    def close(self):
+        pass
+
+
+_tracer = None
+
+
+def get_tracer():
+    """The process-wide tracer (a NullTracer unless TRACE_ENABLED)"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer() if TRACE_ENABLED else NullTracer()
+    return _tracer
@@ -0,0 +1,311 @@
+"""Vehicle-presence triggers (induction loops, IR beams) that drive burst processing
+
+Between triggers the scanner idles: the stream is only drained, and at
+most TRIGGER_IDLE_FPS frames per second go through the pipeline. A trigger
+starts (or extends) a burst of TRIGGER_BURST_SECONDS in which every
+TRIGGER_BURST_FRAME_SKIP-th frame is processed, and reads made during the
+burst carry the trigger id.
+
+A trigger message is the trigger id as plain text, or JSON such as
+{"id": "loop-17", "gate": "gate_01"}; messages for another gate are
+ignored, an empty message gets a generated id. It can arrive as:
+
+    UDP datagram              TRIGGER_UDP_PORT
+    HTTP POST /trigger        TRIGGER_HTTP_PORT   (GET /status for state)
+    Unix datagram socket      TRIGGER_SOCKET
+
+The UDP and HTTP listeners bind to TRIGGER_HOST (loopback by default). With
+TRIGGER_TOKEN set, HTTP requests need "Authorization: Bearer <token>" and
+datagrams must be JSON carrying {"token": "<token>"}; anything else is
+rejected. Set it before exposing the listeners beyond loopback.
+
+Usage (simulator):
+    python trigger_input.py send [id] [--udp host:port | --http url | --socket path]
+    python trigger_input.py simulate [interval_seconds] [count] [--udp ... | --http ... | --socket ...]
+"""
+import hmac
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+
+from config import (
+    GATE_IDENTIFIER,
+    TRIGGER_HOST,
+    TRIGGER_TOKEN,
+    TRIGGER_UDP_PORT,
+    TRIGGER_HTTP_PORT,
+    TRIGGER_SOCKET,
+    TRIGGER_BURST_SECONDS,
+    TRIGGER_IDLE_FPS
+)
+
+
+class TriggerInput:
+    """Receives triggers and tracks the current burst window"""
+
+    def __init__(self, udp_port=TRIGGER_UDP_PORT, http_port=TRIGGER_HTTP_PORT, socket_path=TRIGGER_SOCKET,
+                 burst_seconds=TRIGGER_BURST_SECONDS, idle_fps=TRIGGER_IDLE_FPS, gate_id=GATE_IDENTIFIER,
+                 host=TRIGGER_HOST, token=TRIGGER_TOKEN):
+        self.burst_seconds = burst_seconds
+        self.token = token
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else None
+        self.gate_id = gate_id
+        self.listeners = []  # Called with each accepted trigger dict
+
+        self.triggers = 0
+        self.ignored = 0
+        self.rejected = 0  # Messages without the right token
+        self.time_to_read = []  # Seconds from trigger to its first read
+        self._current = None  # {'id', 'at', 'until', 'source', 'read'}
+        self._next_idle_frame = 0.0
+        self._counter = itertools.count(1)
+        self._fired = threading.Event()
+        self._lock = threading.Lock()
+        self._closers = []
+
+        if udp_port:
+            self._serve_datagrams(socket.socket(socket.AF_INET, socket.SOCK_DGRAM), (host, udp_port), 'udp')
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self._serve_datagrams(socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM), socket_path, 'socket')
+            self._closers.append(lambda: os.path.exists(socket_path) and os.remove(socket_path))
+        if http_port:
+            self._serve_http(host, http_port)
+
+        inputs = [name for name, on in (('udp', udp_port), ('http', http_port), ('socket', socket_path)) if on]
+        print(f"✓ Trigger input: {', '.join(inputs) or 'none (fire() only)'} on {host} | burst {burst_seconds:g}s | "
+              f"idle {f'{idle_fps:g} fps' if idle_fps > 0 else 'paused'}{' | token required' if token else ''}")
+
+    @property
+    def active(self):
+        """The trigger whose burst is running, or None while idle"""
+        current = self._current
+        if current is not None and time.monotonic() < current['until']:
+            return current
+        return None
+
+    @property
+    def current_id(self):
+        current = self.active
+        return current['id'] if current else None
+
+    def fire(self, trigger_id=None, source='local', gate=None):
+        """Start or extend a burst; returns the trigger id (None if meant for another gate)"""
+        if gate and gate != self.gate_id:
+            self.ignored += 1
+            return None
+        trigger_id = trigger_id or f"{self.gate_id}-{int(time.time())}-{next(self._counter)}"
+        now = time.monotonic()
+        trigger = {'id': trigger_id, 'at': now, 'wall_at': time.time(), 'until': now + self.burst_seconds,
+                   'source': source, 'read': False}
+        with self._lock:
+            self._current = trigger
+            self.triggers += 1
+        self._fired.set()
+        for listener in self.listeners:
+            listener(trigger)
+        return trigger_id
+
+    def wait(self, timeout):
+        """Sleep until a trigger fires or timeout passes; True if one fired"""
+        fired = self._fired.wait(timeout)
+        self._fired.clear()
+        return fired
+
+    def idle_frame_due(self):
+        """Whether an idle-mode frame should go through the pipeline now"""
+        if self.idle_interval is None:
+            return False
+        now = time.monotonic()
+        if now < self._next_idle_frame:
+            return False
+        self._next_idle_frame = now + self.idle_interval
+        return True
+
+    def seconds_to_idle_frame(self):
+        if self.idle_interval is None:
+            return 1.0
+        return max(0.0, self._next_idle_frame - time.monotonic())
+
+    def record_read(self, trigger_id):
+        """Note a read made during a burst (time-to-read counts the first one)"""
+        with self._lock:
+            current = self._current
+            if current is not None and current['id'] == trigger_id and not current['read']:
+                current['read'] = True
+                self.time_to_read.append(time.monotonic() - current['at'])
+
+    def stats(self):
+        latencies = np.array(self.time_to_read) * 1000.0
+        stats = {'triggers': self.triggers, 'with_read': len(self.time_to_read), 'ignored': self.ignored,
+                 'rejected': self.rejected}
+        if latencies.size:
+            stats['time_to_read_ms'] = {'p50': round(float(np.percentile(latencies, 50))),
+                                        'p95': round(float(np.percentile(latencies, 95)))}
+        return stats
+
+    def close(self):
+        for close in self._closers:
+            close()
+
+    def handle_message(self, payload, source, authorized=False):
+        """Fire a trigger from a raw message (text id or JSON)
+
+        With a token set, the message must carry it unless the transport
+        already checked it (authorized). Returns the trigger id, or None.
+        """
+        text = payload.decode('utf-8', errors='replace').strip() if isinstance(payload, bytes) else payload.strip()
+        trigger_id, gate, token = text or None, None, None
+        if text.startswith('{'):
+            try:
+                message = json.loads(text)
+                trigger_id, gate, token = message.get('id'), message.get('gate'), message.get('token')
+            except (ValueError, AttributeError):
+                pass
+        if not (authorized or self.check_token(token)):
+            self.rejected += 1
+            return None
+        return self.fire(trigger_id and str(trigger_id)[:64], source, gate)
+
+    def check_token(self, token):
+        """True if no token is configured or `token` matches it"""
+        return not self.token or (isinstance(token, str) and hmac.compare_digest(token, self.token))
+
+    def _serve_datagrams(self, sock, address, source):
+        sock.bind(address)
+        self._closers.append(sock.close)
+
+        def serve():
+            while True:
+                try:
+                    payload, _ = sock.recvfrom(1024)
+                except OSError:
+                    return  # Closed
+                self.handle_message(payload, source)
+
+        threading.Thread(target=serve, name=f'trigger-{source}', daemon=True).start()
+
+    def _serve_http(self, host, port):
+        trigger_input = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != '/trigger':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                if not self._authorized():
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                query_id = parse_qs(url.query).get('id', [''])[0]
+                trigger_id = trigger_input.handle_message(body or query_id.encode(), 'http', authorized=True)
+                self._reply(202 if trigger_id else 409, {'id': trigger_id})
+
+            def do_GET(self):
+                if urlparse(self.path).path != '/status':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                if not self._authorized():
+                    return
+                current = trigger_input.active
+                self._reply(200, {'mode': 'burst' if current else 'idle',
+                                  'trigger': current['id'] if current else None,
+                                  **trigger_input.stats()})
+
+            def _authorized(self):
+                scheme, _, token = (self.headers.get('Authorization') or '').partition(' ')
+                if trigger_input.check_token(token if scheme == 'Bearer' else None):
+                    return True
+                trigger_input.rejected += 1
+                self._reply(401, {'error': 'unauthorized'})
+                return False
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        self._closers.append(server.shutdown)
+        threading.Thread(target=server.serve_forever, name='trigger-http', daemon=True).start()
+
+
+def send(trigger_id, target):
+    """Send one trigger message to a running scanner"""
+    kind, address = target
+    message = {'id': trigger_id, 'gate': GATE_IDENTIFIER}
+    if kind == 'http':
+        headers = {'Authorization': f'Bearer {TRIGGER_TOKEN}'} if TRIGGER_TOKEN else {}
+        requests.post(address, data=json.dumps(message).encode(), headers=headers, timeout=2).raise_for_status()
+        return
+    if TRIGGER_TOKEN:
+        message['token'] = TRIGGER_TOKEN
+    message = json.dumps(message).encode()
+    if kind == 'socket':
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message, address)
+    else:
+        host, _, port = address.rpartition(':')
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message, (host or '127.0.0.1', int(port)))
+
+
+def _target(argv):
+    for flag, kind in (('--http', 'http'), ('--socket', 'socket'), ('--udp', 'udp')):
+        if flag in argv:
+            return kind, argv[argv.index(flag) + 1]
+    host = '127.0.0.1' if TRIGGER_HOST in ('0.0.0.0', '') else TRIGGER_HOST
+    if TRIGGER_UDP_PORT:
+        return 'udp', f'{host}:{TRIGGER_UDP_PORT}'
+    if TRIGGER_HTTP_PORT:
+        return 'http', f'http://{host}:{TRIGGER_HTTP_PORT}/trigger'
+    return 'socket', TRIGGER_SOCKET
+
+
+def main(argv):
+    target = _target(argv)
+    args = [arg for i, arg in enumerate(argv)
+            if not arg.startswith('--') and (i == 0 or not argv[i - 1].startswith('--'))]
+
+    if args and args[0] == 'send':
+        trigger_id = args[1] if len(args) > 1 else f"sim-{int(time.time())}"
+        send(trigger_id, target)
+        print(f"→ Trigger {trigger_id} sent via {target[0]} to {target[1]}")
+        return 0
+
+    if args and args[0] == 'simulate':
+        # Cars arrive at random (exponential gaps) around the given mean interval
+        interval = float(args[1]) if len(args) > 1 else 10
+        count = int(args[2]) if len(args) > 2 else 0
+        for n in itertools.count(1):
+            time.sleep(random.expovariate(1.0 / interval))
+            send(f"sim-{n}", target)
+            print(f"→ Trigger sim-{n} sent via {target[0]}")
+            if count and n >= count:
+                break
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,302 @@
+"""Edge-side watchlist / allowlist matching
+
+Usage:
+    python watchlist.py check <list_file> <plate> [...]
+    python watchlist.py bench [size ...]
+
+bench builds indexes of random plates (default 1000, 100000 and 500000)
+and reports p50 / p99 lookup latency for exact, confusable, fuzzy and
+missing reads against the 1 ms budget.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    WATCHLIST_FILE,
+    ALLOWLIST_FILE,
+    LIST_RELOAD_INTERVAL,
+    LIST_FUZZY_MATCHING,
+    MATCH_EVENT_LOG,
+    GATE_IDENTIFIER
+)
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Confusable characters collapse to one canonical form, so O/0, I/1, B/8 ... compare equal
+CANONICAL = str.maketrans({'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1', 'B': '8',
+                           'S': '5', 'Z': '2', 'G': '6'})
+CANONICAL_ALPHABET = sorted(set(ALPHABET.translate(CANONICAL)))
+
+
+def canonical(plate):
+    return plate.upper().translate(CANONICAL)
+
+
+class PlateIndex:
+    """In-memory plate set with exact, confusable and edit-distance-1 lookups
+
+    Entries are keyed by plate and by their canonical (confusable-folded)
+    form. Fuzzy lookups enumerate the query's one-edit neighbourhood (a few
+    hundred dict probes for a 7-character plate, skipping lengths no entry
+    has), so lookup cost does not grow with list size.
+    add() and remove() are single dict updates and safe to call while
+    another thread is looking up.
+    """
+
+    def __init__(self):
+        self.entries = {}  # plate -> label
+        self._canonical = {}  # canonical form -> tuple of plates
+        self._lengths = {}  # plate length -> number of entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, plate, label=''):
+        plate = plate.upper()
+        if plate not in self.entries:
+            key = canonical(plate)
+            self._canonical[key] = self._canonical.get(key, ()) + (plate,)
+            self._lengths[len(plate)] = self._lengths.get(len(plate), 0) + 1
+        self.entries[plate] = label
+
+    def remove(self, plate):
+        plate = plate.upper()
+        if plate not in self.entries:
+            return
+        del self.entries[plate]
+        if self._lengths.get(len(plate), 0) > 1:
+            self._lengths[len(plate)] -= 1
+        else:
+            self._lengths.pop(len(plate), None)
+
+        key = canonical(plate)
+        remaining = tuple(p for p in self._canonical.get(key, ()) if p != plate)
+        if remaining:
+            self._canonical[key] = remaining
+        else:
+            self._canonical.pop(key, None)
+
+    def lookup(self, text, fuzzy=True):
+        """Return (plate, label, kind) for the best match, or None
+
+        kind is 'exact', 'confusable' (same plate up to O/0, I/1, ...) or
+        'fuzzy' (one character inserted, dropped or substituted).
+        """
+        if text in self.entries:
+            return text, self.entries[text], 'exact'
+
+        key = canonical(text)
+        plates = self._canonical.get(key)
+        if plates:
+            return plates[0], self.entries.get(plates[0], ''), 'confusable'
+
+        if not fuzzy:
+            return None
+
+        for neighbour in self._neighbours(key, self._lengths):
+            plates = self._canonical.get(neighbour)
+            if plates:
+                return plates[0], self.entries.get(plates[0], ''), 'fuzzy'
+        return None
+
+    @staticmethod
+    def _neighbours(key, lengths):
+        """Strings one deletion, substitution or insertion away from key (of lengths in use)"""
+        if len(key) - 1 in lengths:
+            for i in range(len(key)):
+                yield key[:i] + key[i + 1:]
+        if len(key) in lengths:
+            for i in range(len(key)):
+                head, tail = key[:i], key[i + 1:]
+                for c in CANONICAL_ALPHABET:
+                    if c != key[i]:
+                        yield head + c + tail
+        if len(key) + 1 in lengths:
+            for i in range(len(key) + 1):
+                head, tail = key[:i], key[i:]
+                for c in CANONICAL_ALPHABET:
+                    yield head + c + tail
+
+
+def read_list_file(path):
+    """Parse a list file: one plate per line, optional ",label"; # starts a comment"""
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            plate, _, label = line.partition(',')
+            plate = ''.join(ch for ch in plate.upper() if ch.isalnum())
+            if plate:
+                entries[plate] = label.strip()
+    return entries
+
+
+class PlateListMatcher:
+    """Watchlist / allowlist matching at the edge
+
+    Lists are loaded from files and reloaded in the background when they
+    change: only the difference is applied to the live index, so detection
+    keeps running during a reload. check() is synchronous and emits a match
+    event to every registered listener (and the optional JSONL event log).
+    """
+
+    def __init__(self, lists=None, fuzzy=LIST_FUZZY_MATCHING, reload_interval=LIST_RELOAD_INTERVAL,
+                 event_log=MATCH_EVENT_LOG, gate_id=GATE_IDENTIFIER):
+        if lists is None:
+            lists = {'watchlist': WATCHLIST_FILE, 'allowlist': ALLOWLIST_FILE}
+        self.paths = {name: path for name, path in lists.items() if path}
+        self.indexes = {name: PlateIndex() for name in self.paths}
+        self.fuzzy = fuzzy
+        self.event_log = event_log
+        self.gate_id = gate_id
+        self.listeners = []
+        self._mtimes = {}
+
+        for name in self.paths:
+            self.reload(name)
+
+        self._stop = threading.Event()
+        if reload_interval > 0 and self.paths:
+            threading.Thread(target=self._watch, args=(reload_interval,),
+                             name='list-reload', daemon=True).start()
+
+    def reload(self, name):
+        """Apply changes in a list file to its live index; returns (added, removed)"""
+        path = self.paths[name]
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return 0, 0
+        if self._mtimes.get(name) == mtime:
+            return 0, 0
+
+        entries = read_list_file(path)
+        index = self.indexes[name]
+        removed = [plate for plate in index.entries if plate not in entries]
+        for plate in removed:
+            index.remove(plate)
+
+        added = 0
+        for plate, label in entries.items():
+            if index.entries.get(plate) != label:
+                index.add(plate, label)
+                added += 1
+
+        self._mtimes[name] = mtime
+        print(f"✓ {name}: {len(index)} plates (+{added} / -{len(removed)})")
+        return added, len(removed)
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            for name in self.paths:
+                try:
+                    self.reload(name)
+                except Exception as e:
+                    print(f"⚠ {name} reload failed: {e}")
+
+    def check(self, plate_text, **details):
+        """Look a read up in every list; emits and returns the match events"""
+        events = []
+        for name, index in self.indexes.items():
+            match = index.lookup(plate_text, fuzzy=self.fuzzy)
+            if match is None:
+                continue
+            plate, label, kind = match
+            event = {
+                'list': name,
+                'read': plate_text,
+                'plate': plate,
+                'label': label,
+                'match': kind,
+                'gateId': self.gate_id,
+                'timestamp': datetime.now().isoformat(),
+            }
+            event.update(details)
+            events.append(event)
+
+        for event in events:
+            self._emit(event)
+        return events
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+        if self.event_log:
+            with open(self.event_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event) + '\n')
+
+    def close(self):
+        self._stop.set()
+
+
+def random_plate(rng):
+    letters = ''.join(rng.choice(ALPHABET[:26]) for _ in range(3))
+    return letters + ''.join(rng.choice(ALPHABET[26:]) for _ in range(4))
+
+
+def benchmark(size, queries=2000, budget_ms=1.0, seed=0):
+    """Time lookups against an index of `size` random plates; returns True within budget"""
+    rng = random.Random(seed)
+    index = PlateIndex()
+    while len(index) < size:
+        index.add(random_plate(rng))
+    plates = list(index.entries)
+
+    def confusable(plate):
+        return plate.replace('0', 'O').replace('1', 'I').replace('8', 'B')
+
+    def one_edit(plate):
+        i = rng.randrange(len(plate))
+        return plate[:i] + plate[i + 1:]
+
+    kinds = {
+        'exact': [rng.choice(plates) for _ in range(queries)],
+        'confusable': [confusable(rng.choice(plates)) for _ in range(queries)],
+        'fuzzy': [one_edit(rng.choice(plates)) for _ in range(queries)],
+        'miss': ['ZZZ' + plate[3:] for plate in rng.sample(plates, min(queries, size))],
+    }
+
+    ok = True
+    print(f"Index: {size} plates")
+    for kind, texts in kinds.items():
+        timings = []
+        for text in texts:
+            started = time.perf_counter()
+            index.lookup(text)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        p50 = 1000 * timings[len(timings) // 2]
+        p99 = 1000 * timings[int(len(timings) * 0.99)]
+        passed = p99 < budget_ms
+        ok &= passed
+        print(f"  {'✓' if passed else '❌'} {kind:<10} p50 {p50:.3f} ms | p99 {p99:.3f} ms")
+    return ok
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == 'check':
+        matcher = PlateListMatcher({'list': argv[1]}, reload_interval=0, event_log='')
+        for plate in argv[2:]:
+            events = matcher.check(plate.upper())
+            print(f"{plate}: {events[0]['plate'] + ' (' + events[0]['match'] + ')' if events else 'no match'}")
+        return 0
+
+    if argv and argv[0] == 'bench':
+        sizes = [int(size) for size in argv[1:]] or [1000, 100000, 500000]
+        ok = all([benchmark(size) for size in sizes])
+        print("✓ All lookups under 1 ms" if ok else "❌ Lookup budget exceeded")
+        return 0 if ok else 1
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))